@@ -1,7 +1,23 @@
+"""Tkinter window for browsing and editing the media library.
+
+   Importing this module imports tkinter, as MainApp is a tk.Frame, but builds
+   no window: that happens in main(). For batch jobs and machines without a
+   display, use MediaCLI.py, which is built on MediaClasses and never imports
+   tkinter.
+"""
+
 import os
 
+import queue
+
+import shlex
+
 import sys
 
+import threading
+
+import time
+
 import tkinter as tk
 
 from tkinter import messagebox, filedialog, ttk
@@ -40,19 +56,56 @@ class MainApp(tk.Frame):
         self.viewer_colour = "alice blue"
         self.entry_colour = "Wheat1"
 
+        # Library view is virtualised. Only rows for the visible window (plus a small
+        # margin) exist in the tree, and they are refilled from view_collection on scroll.
+        self.tree_row_height = 20
+        self.tree_margin_rows = 5
+        self.visible_tree_rows = 20
+        self.view_collection = self.get_library
+        self.view_offset = 0
+
+        # Tree rows are reused as the window scrolls, so each row's media ID is kept here.
+        # The selection is a media ID, which stays valid as items are added and removed.
+        self.tree_row_ids = {}
+
+        # Clicking the Title or Length heading sorts the library view by that column.
+        # tree_sort is the (field, descending) the view is sorted by, or None.
+        self.sort_fields = {"Title" : "title", "Length" : "length"}
+        self.tree_sort = None
+
+        # With the Search filter selected, the library view is searched as the user types.
+        # A search runs once typing pauses for search_delay milliseconds, and narrows the
+        # last results (text, items and whether they were cut short, in last_search) when
+        # more is typed. At most search_limit results are shown, so a short prefix that
+        # matches much of the library does not hold up typing.
+        self.search_delay = 150
+        self.search_after_id = None
+        self.last_search = None
+        self.search_limit = 1000
+
+        # Files are read and written on worker threads. Results are handed back to the
+        # Tk loop in batches through after() polling, so the window stays responsive.
+        self.load_chunk_size = 2000
+        self.poll_interval = 50
+        self.poll_time_budget = 0.05
+        self.background_task = None
+
         # Create widgets for window.
         self.create_main_widgets()
 
+        # Library and playlist views are patched as changes are made, rather than rebuilt.
+        self.library.subscribe(self.on_library_change)
+        self.playlist.subscribe(self.on_playlist_change)
+
         # This will load in a file upon opening of form and add media items from file
         # to main library view within the window. This assumes file structure remains the 
-        # same as it was provided. User can save current library contents 
-        # to this file upon quitting the application if save checkbox is selected.
-        try:
-            self.init_items = os.path.dirname(sys.argv[0])+'/init_library.csv'
-            self.library.read_items_from_file(self.init_items)
-            self.update_tree(self.get_library)
-        except Exception:
-            pass
+        # same as it was provided. Changes saved on exit are kept in a journal next to
+        # this file, which is replayed on top of it here. User can save current library 
+        # changes upon quitting the application if save checkbox is selected. Loading
+        # happens in the background; the journal is attached once it has finished.
+        self.init_items = os.path.dirname(sys.argv[0])+'/init_library.csv'
+        self.journal = LibraryJournal(self.init_items)
+        self.start_background_read(None)
 
     def create_main_widgets(self):
         """Sets up all application widgets
@@ -67,12 +120,12 @@ class MainApp(tk.Frame):
         style.configure("Treeview", background = self.viewer_colour, 
                         fieldbackground = self.viewer_colour, 
                         borderwidth = 10, highlightthickness = 5,
-                        font = (None, 8))
+                        font = (None, 8), rowheight = self.tree_row_height)
 
         # String and Integer variable storage.
         self.filter_text = tk.StringVar()
         self.features_name = tk.StringVar()
-        self.filter_var = tk.IntVar(); self.filter_names = ("Language", "Format")
+        self.filter_var = tk.IntVar(); self.filter_names = ("Language", "Format", "Artist", "Query", "Search")
         self.media_type_var = tk.IntVar() ; self.types = ("Song", "Video")
         self.move_to_position = tk.IntVar()
         self.filter_label_text = tk.StringVar()
@@ -89,7 +142,10 @@ class MainApp(tk.Frame):
                         "Song" : [1, 1, self.media_type_var, 0],
                         "Video" : [2, 1, self.media_type_var, 1],
                         "Language" : [4, 1, self.filter_var, 0],
-                        "Format" : [5, 1, self.filter_var, 1]
+                        "Format" : [5, 1, self.filter_var, 1],
+                        "Artist" : [6, 1, self.filter_var, 2],
+                        "Query" : [7, 1, self.filter_var, 3],
+                        "Search" : [8, 1, self.filter_var, 4]
                         }
                 
         # Format - text : [row, column, command, rowspan]
@@ -138,6 +194,7 @@ class MainApp(tk.Frame):
                                      justify = "center", bg = self.entry_colour, 
                                      relief = "ridge")
         self.filter_entry.grid(row = 3, column = 1)
+        self.filter_text.trace_add("write", self.on_filter_text_change)
 
         # Set up library view widgets.
         tree_titles = ("Title", "Format", "Language", "Length", 
@@ -145,15 +202,35 @@ class MainApp(tk.Frame):
 
         self.tree = ttk.Treeview(self)
         self.tree.bind("<<TreeviewSelect>>", self.on_tree_view_select)
+        self.tree.bind("<Configure>", self.on_tree_resize)
+        for wheel_event in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(wheel_event, self.on_tree_mouse_wheel)
         self.tree.grid(row = 1, column = 2, columnspan = 5, rowspan = 13, 
                        sticky = "nsew", pady = 6, padx = 6)
+        self.tree_scrollbar = ttk.Scrollbar(self, orient = "vertical", command = self.on_tree_scroll)
+        self.tree_scrollbar.grid(row = 1, column = 7, rowspan = 13, sticky = "ns", pady = 6)
         self.tree["columns"] = tree_titles
         self.tree.column("#0", width = 50)
         self.tree.heading("#0", text = "Pos")
         for index in range(len(tree_titles)):
             self.tree.column(index, width = 90, anchor = "center")
             self.tree.heading(index, text = tree_titles[index])
+        for title, field in self.sort_fields.items():
+            self.tree.heading(title, command = lambda field = field: self.sort_tree_click(field))
         
+        # Set up progress area for background file reads and writes. Hidden until needed.
+        self.progress_text = tk.StringVar()
+        self.progress_frame = tk.Frame(self)
+        self.progress_frame.grid(row = 13, column = 0, columnspan = 2, sticky = "ew", padx = 6, pady = 6)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode = "indeterminate", length = 100)
+        self.progress_bar.pack(side = "top", fill = "x")
+        self.progress_label = tk.Label(self.progress_frame, textvariable = self.progress_text)
+        self.progress_label.pack(side = "left")
+        self.cancel_button = tk.Button(self.progress_frame, text = "Cancel", 
+                                       command = self.cancel_background_task_click)
+        self.cancel_button.pack(side = "right")
+        self.progress_frame.grid_remove()
+
         # Set up save on exit check button.
         self.save_checkbutton = tk.Checkbutton(self, text = "Save on Exit", variable = self.save_var, value = None)
         self.save_checkbutton.grid(row = 12, column = 1)
@@ -187,6 +264,9 @@ class MainApp(tk.Frame):
            calls Method to set up widgets. Purpose of new window is to 
            add new media items to library view.
         """
+        if self.is_busy():
+            return
+
         self.media_window = tk.Toplevel(self.master)
         self.media_window.title("Add Media")
         self.media_window.grab_set()
@@ -237,37 +317,37 @@ class MainApp(tk.Frame):
         self.add_button.pack(padx = 5, pady = 5, side = "right")
 
     def read_from_file_click(self):
-        """Read from selected CSV file
+        """Read from selected CSV files
         
-           Method prompts user to select a csv file. If selected, and valid, calls library's 
-           read_items_from_file method. Once complete and items are added to library, library view
-           is refreshed to accommodate new items.
+           Method prompts user to select one or more csv files. If selected, files are parsed in
+           the background (several files in parallel) and items are added to the library in
+           batches as they arrive. If a file is invalid, or the read is cancelled, items
+           added by the read are removed again.
         """
-        file_name = filedialog.askopenfilename(title = "Select File", filetypes = (("CSV Files","*.csv"),))
-        if not file_name:
+        if self.is_busy():
             return
 
-        try:
-            read_file_error = self.library.read_items_from_file(file_name)
-        except:
-            messagebox.showerror("Problem", "Issue reading file. Please ensure CSV "
-                                 "is in correct format as specified in user guide."); return
-            
-        self.update_tree(self.get_library)
-        self.set_filter(False)
+        file_names = filedialog.askopenfilenames(title = "Select Files", filetypes = (("CSV Files","*.csv"),))
+        if not file_names:
+            return
+
+        self.start_background_read(file_names)
  
     def write_to_file_button_click(self):
         """Writes library view items to specified CSV file.
         
            Method prompts specify a CSV file, then calls library's write_items_to_file
-           method in order to save all library view items down.
+           method on a worker thread in order to save all library view items down.
         """
+        if self.is_busy():
+            return
+
         file_name = filedialog.asksaveasfilename(title = "Select file",filetypes = (("CSV Files","*.csv"),), 
                                              defaultextension= "csv")
         if not file_name:
             return
 
-        self.library.write_items_to_file(file_name)
+        self.start_background_write(file_name)
         
     def features_artist_button_click(self):
         """Checks if specified artist features in library view media item.
@@ -288,7 +368,7 @@ class MainApp(tk.Frame):
             messagebox.showerror("Problem", "Please ensure you have selected an item "
                                 "from the library view"); return
 
-        artist_in_media = media_item.get_media_with_artist(user_entry)
+        artist_in_media = self.library.media_has_artist(media_item, user_entry)
 
         if artist_in_media:
             text = f"The media '{media_item.get_media_title()}' features the artist '{user_entry}'"
@@ -299,15 +379,18 @@ class MainApp(tk.Frame):
         self.feautures_artist_entry.delete(0, 'end')
     
     def filter_button_click(self):
-        """Filters library view by format or language.
+        """Filters library view by format, language, artist, a compound query or a search.
     
-           Method determines what filter type is selected (language or format), what user
+           Method determines what filter type is selected (language, format, artist, query or search), what user
            would like to filter by, and invokes library method to return filtered collection.
            This collection is used to update tree.
         """   
         self.filter_type = self.filter_names[self.filter_var.get()]
         filter_pattern = self.filter_text.get()
 
+        if self.filter_type == "Search":
+            self.run_search(); return
+
         if filter_pattern == "":
             messagebox.showerror("Problem", "You have not entered anything into "
                                  "the entry box. Please try again."); return
@@ -319,9 +402,98 @@ class MainApp(tk.Frame):
         elif self.filter_type == "Format":
             self.filter_list = self.library.get_media_of_format(filter_pattern)
 
+        elif self.filter_type == "Artist":
+            self.filter_list = self.library.get_media_with_artist(filter_pattern)
+
+        elif self.filter_type == "Query":
+            try:
+                self.filter_list = self.library.query(**self.parse_filter_query(filter_pattern))
+            except ValueError as error:
+                messagebox.showerror("Problem", f"{error}\n\nUse terms such as: type:song "
+                                     "language:english format:mp3 length:180-300 "
+                                     "title:rain artist:\"Al Pacino\""); return
+
         self.update_tree(self.filter_list)
         self.set_filter(True, self.filter_type, filter_pattern)
 
+    def on_filter_text_change(self, *trace_details):
+        """Schedule a search when the filter entry changes with the Search filter selected.
+
+           Any search already scheduled is cancelled, so only one search runs
+           once the user pauses typing.
+        """
+        if self.filter_names[self.filter_var.get()] != "Search":
+            return
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(self.search_delay, self.run_search)
+
+    def run_search(self):
+        """Show library items matching the text in the filter entry.
+
+           If the text extends the last search, the last results are narrowed
+           rather than searching the whole library again, unless they were cut
+           short at search_limit and so may be missing matches. The filter entry
+           is left as it is, so the user can keep typing. Clearing the entry shows
+           the whole library.
+        """
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        text = self.filter_text.get()
+        if not text.strip():
+            self.last_search = None
+            if self.filter_on:
+                self.update_tree(self.get_library, clear_entry = False)
+            return
+
+        within = None
+        if self.last_search and text.startswith(self.last_search[0]) and not self.last_search[2]:
+            within = self.last_search[1]
+        self.filter_list = self.library.search(text, within, self.search_limit)
+        limited = len(self.filter_list) >= self.search_limit
+        self.last_search = (text, self.filter_list, limited)
+        self.update_tree(self.filter_list, clear_entry = False)
+        self.filter_type = "Search"
+        if limited:
+            text = f"{text} (first {self.search_limit:,} matches)"
+        self.set_filter(True, self.filter_type, text)
+
+    def parse_filter_query(self, text):
+        """Returns Library.query arguments for a compound filter such as
+           'type:song language:english length:180-300 artist:"Freddy Mercury"'
+
+           Terms are field:value pairs separated by spaces, and values containing
+           spaces are quoted. Length takes a minimum, a maximum or both, e.g.
+           length:180-300, length:180- or length:-300. A ValueError is raised
+           for a term that cannot be understood.
+
+           Main Args:
+                text: The compound filter entered by the user
+        """
+        fields = {"type" : "media_type", "language" : "language", "format" : "media_format",
+                  "title" : "title", "artist" : "artist"}
+        arguments = {}
+        for term in shlex.split(text):
+            field, separator, value = term.partition(":")
+            field = field.lower()
+            if not separator or not value:
+                raise ValueError(f"'{term}' is not a field:value term.")
+            if field == "length":
+                low, dash, high = value.partition("-")
+                try:
+                    arguments["min_length"] = int(low) if low else None
+                    arguments["max_length"] = (int(high) if high else None) if dash else arguments["min_length"]
+                except ValueError:
+                    raise ValueError(f"'{value}' is not a length range.") from None
+            elif field in fields:
+                arguments[fields[field]] = value
+            else:
+                raise ValueError(f"'{field}' is not a field that can be filtered on.")
+        if not arguments:
+            raise ValueError("The query has no terms.")
+        return arguments
+
     def get_info_library_click(self):
         """Show details associated with selected item from library view.
     
@@ -337,39 +509,144 @@ class MainApp(tk.Frame):
         messagebox.showinfo("Info", f"{media_item.get_class_name()}\n\n"
                                     f"{str(media_item)}")
 
-    def update_tree(self, media_collection):
+    def update_tree(self, media_collection, clear_entry = True):
         """Update library view with relevant media items.
 
-           Method deletes all items within the library view, before re-adding
-           media items from specified collection. Method will either add items from the main
-           library collection, or a returned filter collection.
+           Method sets the collection shown in the library view and scrolls back to
+           the top. Method will either show items from the main library collection,
+           or a returned filter collection. Only the visible rows are filled in.
     
            Main Args:
                 media_collection = This will either be the main collection from the library 
                                    object or collection returned if filter is set to ON.
+                clear_entry = Whether to empty the filter entry, which is kept while searching.
         """   
-        self.tree.delete(*self.tree.get_children())
+        self.view_collection = media_collection
+        self.view_offset = 0
+        self.set_tree_sort(None)
+        self.render_tree_window()
 
-        for index, media_item in enumerate(media_collection):
-            obj_type = media_item.get_class_name()
+        if media_collection == self.get_library:
+            self.set_filter(False)
+        if clear_entry:
+            self.filter_entry.delete(0, 'end')
 
-            if obj_type == "Song":
-                performers = ",".join(media_item.get_performer_names())
-                self.tree.insert("", "end", text = index, 
-                                values = (media_item.get_media_title(), media_item.get_media_format(), 
-                                          media_item.get_media_language(), media_item.get_play_length(), 
-                                          performers, "---", "---"))
+    def sort_tree_click(self, field):
+        """Sort library view by a column, in response to a heading click.
 
-            elif obj_type == "Video":
-                actors = ",".join(media_item.get_actors())
-                self.tree.insert("", "end", text = index, 
-                                values = (media_item.get_media_title(), media_item.get_media_format(), 
-                                          media_item.get_media_language(), media_item.get_play_length(), 
-                                          "---", media_item.get_director_name(), actors))
+           The first click on a heading sorts ascending and the next descending.
+           The whole library is shown through a sorted view kept by the library,
+           so nothing is sorted when the heading is clicked. A filtered view is
+           sorted directly, as it is usually much smaller.
 
-        if media_collection == self.get_library:
-            self.set_filter(False)
-        self.filter_entry.delete(0, 'end')
+           Main Args:
+                field: "title" or "length"
+        """
+        descending = self.tree_sort == (field, False)
+        if self.filter_on:
+            sort_keys = {"title" : lambda media_item: media_item.get_media_title().casefold(),
+                         "length" : lambda media_item: media_item.get_play_length()}
+            self.view_collection = sorted(self.filter_list, key = sort_keys[field], reverse = descending)
+        else:
+            self.view_collection = self.library.sorted_media(field, descending)
+        self.view_offset = 0
+        self.set_tree_sort((field, descending))
+        self.render_tree_window()
+
+    def set_tree_sort(self, tree_sort):
+        """Records what library view is sorted by, and marks that heading with an arrow
+
+           Main Args:
+                tree_sort: (field, descending) the view is sorted by, or None if unsorted
+        """
+        self.tree_sort = tree_sort
+        for title, field in self.sort_fields.items():
+            arrow = ""
+            if tree_sort and tree_sort[0] == field:
+                arrow = " \u25bc" if tree_sort[1] else " \u25b2"
+            self.tree.heading(title, text = title + arrow)
+
+    def tree_row_values(self, media_item):
+        """Returns the library view column values for a media item"""
+        if media_item.get_class_name() == "Song":
+            performers = ",".join(media_item.get_performer_names())
+            return (media_item.get_media_title(), media_item.get_media_format(), 
+                    media_item.get_media_language(), media_item.get_play_length(), 
+                    performers, "---", "---")
+
+        actors = ",".join(media_item.get_actors())
+        return (media_item.get_media_title(), media_item.get_media_format(), 
+                media_item.get_media_language(), media_item.get_play_length(), 
+                "---", media_item.get_director_name(), actors)
+
+    def render_tree_window(self):
+        """Fill library view rows with the items in the current window.
+
+           Method creates or deletes tree rows so there is one per visible item plus
+           a small margin, then refills them from the view collection starting at
+           the view offset. Each row's text is the item's position in the collection,
+           and the media ID shown in each row is kept in tree_row_ids.
+        """
+        collection_length = len(self.view_collection)
+        max_offset = max(0, collection_length - self.visible_tree_rows)
+        self.view_offset = min(max(0, self.view_offset), max_offset)
+        row_count = min(self.visible_tree_rows + self.tree_margin_rows, 
+                        collection_length - self.view_offset)
+
+        rows = list(self.tree.get_children())
+        if len(rows) > row_count:
+            self.tree.delete(*rows[row_count:])
+            rows = rows[:row_count]
+        while len(rows) < row_count:
+            rows.append(self.tree.insert("", "end"))
+
+        self.tree.selection_remove(*self.tree.selection())
+        selection = getattr(self, "tree_view_selection", None)
+        self.tree_row_ids = {}
+        for row, index in zip(rows, range(self.view_offset, self.view_offset + row_count)):
+            media_item = self.view_collection[index]
+            self.tree.item(row, text = index, values = self.tree_row_values(media_item))
+            self.tree_row_ids[row] = media_item.get_media_id()
+            if self.tree_row_ids[row] == selection:
+                self.tree.selection_add(row)
+
+        if collection_length:
+            self.tree_scrollbar.set(self.view_offset / collection_length, 
+                                    min(1, (self.view_offset + self.visible_tree_rows) / collection_length))
+        else:
+            self.tree_scrollbar.set(0, 1)
+
+    def on_tree_scroll(self, action, amount, unit = None):
+        """Scroll the library view window in response to the scrollbar.
+
+           Main Args:
+                action: "moveto" with a fraction of the collection, or "scroll"
+                amount: The fraction, or the number of units / pages to scroll
+                unit: "units" or "pages" when scrolling
+        """
+        if action == "moveto":
+            self.view_offset = int(float(amount) * len(self.view_collection))
+        elif unit == "pages":
+            self.view_offset += int(amount) * self.visible_tree_rows
+        else:
+            self.view_offset += int(amount)
+        self.render_tree_window()
+
+    def on_tree_mouse_wheel(self, event):
+        """Scroll the library view window with the mouse wheel."""
+        if event.num == 4 or event.delta > 0:
+            self.on_tree_scroll("scroll", -3, "units")
+        else:
+            self.on_tree_scroll("scroll", 3, "units")
+        return "break"
+
+    def on_tree_resize(self, event):
+        """Recalculate how many rows fit in the library view when it is resized."""
+        heading_height = self.tree_row_height + 5
+        visible_tree_rows = max(1, (event.height - heading_height) // self.tree_row_height)
+        if visible_tree_rows != self.visible_tree_rows:
+            self.visible_tree_rows = visible_tree_rows
+            self.render_tree_window()
 
     def configure_media_object(self):
         """Take user entries from media window and create media object.
@@ -428,8 +705,8 @@ class MainApp(tk.Frame):
         if not media_object:
             return
         self.library.add_media(media_object)
-        self.update_tree(self.get_library)
-        self.set_filter(False)
+        if self.filter_on:
+            self.update_tree(self.get_library)
         self.quit_media_window()
         
     def move_media_click(self):
@@ -456,7 +733,6 @@ class MainApp(tk.Frame):
                                  "bounds. Try again!"); return
 
         self.playlist.move_song(index_of_item, move_to_position)
-        self.refresh_playlist()
 
     def get_info_playlist_click(self):
         """Reveal information associated with playlist item.
@@ -485,27 +761,24 @@ class MainApp(tk.Frame):
             messagebox.showerror("Problem", "Please ensure you have selected "
                                  "a playlist item."); return
 
-        self.playlist.remove_song(index_of_song)   
-        self.refresh_playlist() 
+        self.playlist.remove_song(index_of_song)
 
     def remove_from_library_click(self):
-        """Remove media based on position specified in library view.
+        """Remove media selected in library view.
 
-           Method determines index of selected library item, and
+           Method determines the media ID of the selected library item, and
            removes library item from library collection and updates library view.
+           Items can be removed whether or not a filter is set.
         """  
+        if self.is_busy():
+            return
+
         try:
-            if self.filter_on:
-                messagebox.showerror("Problem", "Please clear filter using the Refresh button before "
-                                     "removing library item.")
-                return
-            else:
-                removed_item = self.library.remove_media(self.tree_view_selection)
-                messagebox.showinfo("Info", f"'{removed_item.get_media_title()}' has been removed!")
-                self.update_tree(self.get_library)
-                return
-        except Exception:
+            removed_item = self.library.remove_media_by_id(self.tree_view_selection)
+        except (AttributeError, KeyError):
             messagebox.showerror("Problem", "Please ensure you have selected a library item to remove")
+            return
+        messagebox.showinfo("Info", f"'{removed_item.get_media_title()}' has been removed!")
         
     def return_playlist_length_click(self):
         """Reveals the runtime length of the playlist.
@@ -537,24 +810,18 @@ class MainApp(tk.Frame):
             messagebox.showerror("Problem", "You cannot add videos to playlist. Try adding a song!"); return
 
         self.playlist.add_song(media_item)
-        self.refresh_playlist()
 
     def get_item_from_library_view(self):
         """Get item from library view based on selection.
         
-           Checks if a filter is currently set or not in the library view. 
-           Once index position of the item is selected is determined, it's 
-           used pull the item from the source list at that index. Any issues and 
-           exception is returned.
+           The selected media ID is looked up in the library, so the same item is
+           found whether or not a filter is set. AttributeError is raised if no
+           item is selected, or the selected item is no longer in the library.
         """
-        try:
-            if self.filter_on:
-                media_item = self.filter_list[self.tree_view_selection]
-            else:
-                media_item = self.get_library[self.tree_view_selection]
-            return media_item
-        except:
-            raise Exception
+        media_item = self.library.get_media_by_id(getattr(self, "tree_view_selection", None))
+        if media_item is None:
+            raise AttributeError("No library item selected")
+        return media_item
 
     def refresh_playlist(self):
         """Refresh the Playlist view with the most up-to-date playlist collection.
@@ -566,6 +833,77 @@ class MainApp(tk.Frame):
         for index, item in enumerate(self.get_playlist):
             self.playlist_box.insert(tk.END, f" {index}: {item.get_media_title()}")
 
+    def renumber_playlist_lines(self, start, end):
+        """Rewrite playlist view lines from start up to (not including) end.
+
+           Lines show each song's position, so they are rewritten when songs
+           before them are inserted, moved or removed.
+        """
+        for index in range(start, min(end, len(self.get_playlist))):
+            self.playlist_box.delete(index)
+            self.playlist_box.insert(index, f" {index}: {self.get_playlist[index].get_media_title()}")
+
+    def on_playlist_change(self, event, *details):
+        """Patch the playlist view after a change to the playlist collection.
+
+           Only the lines whose position changed are rewritten. Bulk changes
+           refresh the whole view.
+
+           Main Args:
+                event: Name of the playlist change event
+                details: Positions (and song) affected by the change
+        """
+        if event == "inserted":
+            position = details[0]
+            self.playlist_box.insert(position, "")
+            self.renumber_playlist_lines(position, len(self.get_playlist))
+
+        elif event == "removed":
+            position = details[0]
+            self.playlist_box.delete(position)
+            self.renumber_playlist_lines(position, len(self.get_playlist))
+
+        elif event == "moved":
+            from_position, to_position = details
+            self.renumber_playlist_lines(min(from_position, to_position), 
+                                         max(from_position, to_position) + 1)
+            self.playlist_box.selection_clear(0, tk.END)
+            self.playlist_box.selection_set(to_position)
+
+        else:
+            self.refresh_playlist()
+
+    def on_library_change(self, event, *details):
+        """Patch the library view after a change to the library collection.
+
+           Insertions, removals and bulk changes only refill the rows of the
+           visible window. A removed item is also dropped from a filtered view,
+           and from the filter results it was sorted from.
+           The next search starts afresh, as the last results may be out of date.
+
+           Main Args:
+                event: Name of the library change event
+                details: Position and media item affected by the change
+        """
+        self.last_search = None
+        if event == "removed":
+            position, media_item = details
+            if media_item.get_media_id() == getattr(self, "tree_view_selection", None):
+                del self.tree_view_selection
+            if self.view_collection is self.get_library:
+                if position < self.view_offset:
+                    self.view_offset -= 1
+            elif isinstance(self.view_collection, list) and media_item in self.view_collection:
+                self.view_collection.remove(media_item)
+            # A filtered view sorted by a heading is a sorted copy of filter_list, which
+            # is sorted again on the next click, so the item must leave both lists.
+            filter_list = getattr(self, "filter_list", None)
+            if (isinstance(filter_list, list) and filter_list is not self.view_collection
+                    and media_item in filter_list):
+                filter_list.remove(media_item)
+
+        self.render_tree_window()
+
     def set_filter(self, option, filter_type = None, filter_pattern = None):
         """Updates filter label and toggles filter variable on / off
         
@@ -586,22 +924,32 @@ class MainApp(tk.Frame):
         self.filter_label_text.set(text)
     
     def on_tree_view_select(self, event):
-        """Return selected item position in library view.
+        """Return selected item media ID in library view.
 
-           Method sets the index of item selected in library view.
+           Method sets the media ID of item selected in library view.
         """  
         for item in self.tree.selection():
-            self.tree_view_selection = self.tree.item(item, "text")
+            self.tree_view_selection = self.tree_row_ids[item]
 
     def quit_window_click(self):
         """Close the main window down.
         
-           Method is used to destroy the main window. Method will also attempt to save contents of library
-           if checkbox is selected before closing.
+           Method is used to destroy the main window. Method will also attempt to save changes made to
+           library if checkbox is selected before closing. Only the changes are appended to the journal;
+           a full rewrite of the library file happens in the background once the journal grows large.
+           Nothing is saved if the startup library did not finish loading.
         """
-        if self.save_var.get() == 1:
+        if self.background_task == "read":
+            self.cancel_background_task_click()
+
+        if self.save_var.get() == 1 and self.library.get_journal() is not self.journal:
+            # The startup library never finished loading, so saving would overwrite
+            # it with a partial library, or record changes against the wrong items.
+            messagebox.showwarning("Not saved", "The library did not finish loading, "
+                                   "so changes cannot be saved. Window will close.")
+        elif self.save_var.get() == 1:
             try:
-                self.library.write_items_to_file(self.init_items)
+                self.journal.save(self.library)
                 message = "Any new changes made have been saved!"
                 messagebox.showinfo("Success", message)
             except Exception:
@@ -609,6 +957,209 @@ class MainApp(tk.Frame):
                 file_save_issue = messagebox.showerror("Problem", message)
         self.master.destroy()
 
+    def is_busy(self):
+        """Returns True, and tells the user, if a background read or write is running.
+
+           Changes to the library are not allowed while a file is being read or written.
+        """
+        if self.background_task:
+            messagebox.showerror("Problem", "Please wait for the current file to finish "
+                                 "loading or saving, or cancel it.")
+            return True
+        return False
+
+    def show_progress(self, text, can_cancel):
+        """Show the progress area with a message and a running progress bar."""
+        self.progress_text.set(text)
+        self.cancel_button.config(state = "normal" if can_cancel else "disabled")
+        self.progress_frame.grid()
+        self.progress_bar.start()
+
+    def hide_progress(self):
+        """Hide the progress area."""
+        self.progress_bar.stop()
+        self.progress_frame.grid_remove()
+
+    def start_background_read(self, file_names):
+        """Start reading items on a worker thread.
+
+           Method starts a worker thread which parses the files and queues batches
+           of items, and schedules polling to add those batches to the library.
+
+           Main Args:
+                file_names: Files to read, or None to load the startup library
+        """
+        self.background_task = "read"
+        self.read_queue = queue.Queue(maxsize = 4)
+        self.read_cancel = threading.Event()
+        self.read_is_startup = file_names is None
+        self.read_start_length = len(self.get_library)
+        self.read_count = 0
+        self.read_duplicates = 0
+        worker = threading.Thread(target = self.background_read_worker, 
+                                  args = (file_names, self.read_queue, self.read_cancel), daemon = True)
+        worker.start()
+        # The startup load cannot be cancelled, as changes can only be saved once
+        # the whole startup library has loaded.
+        if self.read_is_startup:
+            self.show_progress("Loading library...", False)
+        else:
+            self.show_progress("Reading files...", True)
+        self.after(self.poll_interval, self.poll_background_read)
+
+    def background_read_worker(self, file_names, results, cancel):
+        """Parse files and queue batches of items. Runs on a worker thread.
+
+           The worker never touches the library or any widget. The startup library
+           is read into a plain list of items, with the journal replayed on it, then
+           handed over in batches, so each item is indexed once, by the app's library.
+
+           Main Args:
+                file_names: Files to read, or None to load the startup library
+                results: Queue the batches of items are put on
+                cancel: Event set when the read is cancelled
+        """
+        try:
+            if file_names is None:
+                media_items = self.journal.load_items(write_binary = True)
+                chunks = (media_items[start : start + self.load_chunk_size] 
+                          for start in range(0, len(media_items), self.load_chunk_size))
+            elif len(file_names) == 1:
+                chunks = self.library.iter_chunks_from_file(file_names[0], self.load_chunk_size)
+            else:
+                chunks = (media_items[start : start + self.load_chunk_size]
+                          for _, media_items in self.library.iter_items_from_files(file_names)
+                          for start in range(0, len(media_items), self.load_chunk_size))
+
+            for chunk in chunks:
+                if not self.queue_read_result(results, cancel, "items", chunk):
+                    return
+            self.queue_read_result(results, cancel, "done", None)
+        except Exception as error:
+            self.queue_read_result(results, cancel, "error", error)
+
+    def queue_read_result(self, results, cancel, kind, value):
+        """Queue a result for the Tk loop, waiting while the queue is full.
+
+           Returns False without queueing if the read has been cancelled.
+        """
+        while not cancel.is_set():
+            try:
+                results.put((kind, value), timeout = 0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def poll_background_read(self):
+        """Add queued batches of items to the library.
+
+           Method runs on the Tk loop. It handles queued results for a short time
+           budget, so the window stays responsive, then schedules itself again.
+        """
+        if self.background_task != "read":
+            return
+
+        deadline = time.perf_counter() + self.poll_time_budget
+        while time.perf_counter() < deadline:
+            try:
+                kind, value = self.read_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "items":
+                # Files read by the user skip items already in the library; the
+                # startup library is loaded exactly as it was saved.
+                duplicates = self.library.add_media_items(value, skip_duplicates = not self.read_is_startup)
+                self.read_count += len(value) - duplicates
+                self.read_duplicates += duplicates
+                self.progress_text.set(f"Loaded {self.read_count:,} items")
+            else:
+                self.finish_background_read(value if kind == "error" else None)
+                return
+
+        self.after(self.poll_interval, self.poll_background_read)
+
+    def finish_background_read(self, error = None, cancelled = False):
+        """Tidy up after a background read has finished, failed or been cancelled.
+
+           Items added by a failed or cancelled read are removed again. The journal
+           is only attached once the startup library has loaded completely, so
+           that saved changes always apply to the full startup library. The search
+           index is then built on a worker thread, so the first search after a
+           load does not have to build it.
+        """
+        self.read_cancel.set()
+        self.background_task = None
+        self.hide_progress()
+
+        if error or cancelled:
+            self.library.truncate(self.read_start_length)
+        elif self.read_is_startup:
+            self.library.attach_journal(self.journal)
+
+        if error and self.read_is_startup:
+            messagebox.showerror("Problem", f"Issue loading the library from {self.init_items}: {error}\n"
+                                 "Changes made in this session cannot be saved on exit.")
+        elif error:
+            messagebox.showerror("Problem", "Issue reading file. Please ensure CSV "
+                                 "is in correct format as specified in user guide.")
+        elif not (cancelled or self.read_is_startup) and self.read_duplicates:
+            messagebox.showinfo("Info", f"Added {self.read_count:,} items. Skipped {self.read_duplicates:,} "
+                                "items already in the library.")
+        self.library.start_search_index()
+        self.update_tree(self.get_library)
+
+    def start_background_write(self, file_name):
+        """Start writing the library to a file on a worker thread.
+
+           The worker writes a copy of the library list, so the library can still be
+           viewed while it is saved. The thread is not a daemon, so a save in progress
+           completes even if the window is closed.
+
+           Main Args:
+                file_name: File where library items will be saved
+        """
+        self.background_task = "write"
+        media_items = list(self.get_library)
+        results = queue.Queue()
+        worker = threading.Thread(target = self.background_write_worker, 
+                                  args = (file_name, media_items, results))
+        worker.start()
+        self.show_progress(f"Saving {len(media_items):,} items...", False)
+        self.after(self.poll_interval, self.poll_background_write, results)
+
+    def background_write_worker(self, file_name, media_items, results):
+        """Write media items to a file and queue the outcome. Runs on a worker thread."""
+        try:
+            results.put(("done", self.library.write_items_to_file(file_name, media_items)))
+        except Exception as error:
+            results.put(("error", error))
+
+    def poll_background_write(self, results):
+        """Report the outcome of a background write once it has finished."""
+        try:
+            kind, value = results.get_nowait()
+        except queue.Empty:
+            self.after(self.poll_interval, self.poll_background_write, results)
+            return
+
+        self.background_task = None
+        self.hide_progress()
+        if kind == "error":
+            messagebox.showerror("Problem", "Issue writing file. Please try again."); return
+
+        messagebox.showinfo("Success", f"Saved {value['rows']} items "
+                            f"({value['rows_per_second']:,.0f} rows per second)")
+
+    def cancel_background_task_click(self):
+        """Cancel the background read in progress.
+
+           Items it has already added to the library are removed again.
+        """
+        if self.background_task == "read":
+            self.finish_background_read(cancelled = True)
+
     def quit_media_window(self):
         """Quit media window.
 
@@ -618,11 +1169,24 @@ class MainApp(tk.Frame):
         self.media_window.grab_release()
         self.media_window.destroy()
 
-# Initialise library and playlist.
-library = Library()
-playlist = PlayList()
+def main():
+    """Initialise library and playlist, and start the app.
+
+       Set MEDIAAPP_METRICS, MEDIAAPP_SLOW_MS or MEDIAAPP_PROFILE to time the app's
+       operations (see MediaInstrumentation), which is only imported if one is set.
+    """
+    if any(name.startswith("MEDIAAPP_") for name in os.environ):
+        import MediaInstrumentation
+        instrumentation = MediaInstrumentation.from_environment()
+        if instrumentation:
+            instrumentation.instrument_app(MainApp)
+
+    library = Library()
+    playlist = PlayList()
+
+    root = tk.Tk()
+    MainApp(library, playlist, root)
+    root.mainloop()
 
-# Start the app.
-root = tk.Tk()
-MainApp(library, playlist, root)
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""Aggregate statistics over a library, computed with NumPy.
+
+   LibraryAnalytics turns a library into column arrays (play lengths, and
+   codes for each item's type, language and format, plus an item/person
+   table for artists) and answers group-by questions with bincount and
+   histogram over those arrays rather than Python loops. The columns are built
+   on first use and then follow the library's changes: added items are
+   appended and removed items masked out, and the columns are only built
+   again once most of their rows are of removed items.
+
+   NumPy is optional for the rest of the app; it is only needed here.
+
+   Example:
+        analytics = LibraryAnalytics(library)
+        analytics.group_by("language")   # {"English" : {"count" : ..., "total_length" : ..., "mean_length" : ...}}
+        analytics.length_histogram(bins = 20, media_type = "Song")
+        analytics.artist_counts(top = 10)
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GROUP_FIELDS = ("type", "language", "format")
+
+class LibraryColumns:
+    """Represents a library as NumPy column arrays, one row per item
+
+       Languages, formats and people are grouped ignoring case, as they are by the
+       library's indexes, and each group is named by its first spelling seen since
+       the columns were built. Rows are kept in the order items were added. Items
+       added later are queued and appended to the arrays by update(), and removed
+       items only have their row marked as dead in live, so the columns follow a
+       changing library without being built again.
+
+       Attributes in constructor:
+            play_lengths: Play length of each row (int64 array)
+            media_ids: Media ID of each row (int64 array)
+            codes: Field name ("type", "language" or "format") mapped to the
+                   group code of each row (dict of int32 arrays)
+            names: Field name mapped to the name of each group code (dict of lists)
+            people_items: Row of each (item, person) pair (int64 array)
+            people_codes: Person code of each (item, person) pair (int32 array)
+            people_names: Name of each person code (list)
+            live: Whether each row's item is still in the library (boolean array)
+            dead_count: Number of rows whose item has been removed (integer)
+            rows: Media ID of each item in the library mapped to its row (dict)
+            pending: Items added since the arrays were last updated (list)
+            dead_rows: Rows of items removed since the arrays were last updated (list)
+    """
+
+    def __init__(self, media_items):
+        self._coders = {field : _GroupCoder() for field in GROUP_FIELDS}
+        self._person_code = _GroupCoder()
+        self.names = {field : coder.names for field, coder in self._coders.items()}
+        self.people_names = self._person_code.names
+        self.play_lengths = np.zeros(0, dtype = np.int64)
+        self.media_ids = np.zeros(0, dtype = np.int64)
+        self.codes = {field : np.zeros(0, dtype = np.int32) for field in GROUP_FIELDS}
+        self.people_items = np.zeros(0, dtype = np.int64)
+        self.people_codes = np.zeros(0, dtype = np.int32)
+        self.live = np.zeros(0, dtype = bool)
+        self.dead_count = 0
+        self._rows = {}
+        self._pending = []
+        self._dead_rows = []
+        self.append(media_items)
+        self.update()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def append(self, media_items):
+        """Queues items added to the end of the library, to be added by update()"""
+        row = len(self.play_lengths) + len(self._pending)
+        for media in media_items:
+            self._rows[media.get_media_id()] = row
+            row += 1
+        self._pending.extend(media_items)
+
+    def remove(self, media):
+        """Marks the row of an item removed from the library as dead, once update() is called"""
+        row = self._rows.pop(media.get_media_id(), None)
+        if row is not None:
+            self._dead_rows.append(row)
+            self.dead_count += 1
+
+    def remove_last(self, count):
+        """Marks the rows of the last count items in the library as dead"""
+        self.update()
+        if count > 0:
+            rows = np.flatnonzero(self.live)[-count:]
+            self.live[rows] = False
+            self.dead_count += len(rows)
+            for media_id in self.media_ids[rows].tolist():
+                del self._rows[media_id]
+
+    def update(self):
+        """Adds rows for queued items, and marks the rows of removed items as dead"""
+        if self._pending:
+            media_items = self._pending
+            self._pending = []
+            count = len(media_items)
+            start = len(self.play_lengths)
+            self.play_lengths = np.concatenate((self.play_lengths, np.fromiter(
+                (media.get_play_length() for media in media_items), dtype = np.int64, count = count)))
+            self.media_ids = np.concatenate((self.media_ids, np.fromiter(
+                (media.get_media_id() for media in media_items), dtype = np.int64, count = count)))
+            for field, get_value in (("type", lambda media: media.get_class_name()),
+                                     ("language", lambda media: media.get_media_language()),
+                                     ("format", lambda media: media.get_media_format())):
+                group_code = self._coders[field]
+                self.codes[field] = np.concatenate((self.codes[field], np.fromiter(
+                    (group_code(get_value(media)) for media in media_items), dtype = np.int32, count = count)))
+
+            # An item counts once for each person in it, however many roles they have.
+            person_code = self._person_code
+            people_items = []
+            people_codes = []
+            for row, media in enumerate(media_items, start):
+                for code in {person_code(name) for name in media.get_people() if name}:
+                    people_items.append(row)
+                    people_codes.append(code)
+            self.people_items = np.concatenate((self.people_items, np.array(people_items, dtype = np.int64)))
+            self.people_codes = np.concatenate((self.people_codes, np.array(people_codes, dtype = np.int32)))
+            self.live = np.concatenate((self.live, np.ones(count, dtype = bool)))
+        if self._dead_rows:
+            self.live[self._dead_rows] = False
+            self._dead_rows = []
+
+    def mostly_dead(self):
+        """Returns True if over half the rows belong to removed items"""
+        return 2 * self.dead_count > len(self.play_lengths) + len(self._pending)
+
+class _GroupCoder:
+    """Callable giving each distinct case-folded string a code, in order of first use"""
+
+    def __init__(self):
+        self.names = []
+        self._codes = {}
+        self._folded_codes = {}
+
+    def __call__(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            key = value.casefold()
+            code = self._folded_codes.get(key)
+            if code is None:
+                code = self._folded_codes[key] = len(self.names)
+                self.names.append(value)
+            self._codes[value] = code
+        return code
+
+class LibraryAnalytics:
+    """Answers aggregate questions about a library using cached NumPy column arrays
+
+       The analytics subscribes to the library and passes each change on to its
+       columns, so answers always reflect the current library. Single items
+       are added and removed by their events. A bulk change adds the items
+       now past the end of the columns if the library has grown, as a batch
+       add appends them, or removes the columns' last items if it has shrunk,
+       as a truncation drops them. The columns are built again once over half
+       their rows are of removed items. Call close() to stop following the library.
+
+       Attributes in constructor:
+            library: The Library (or SQLiteLibrary) to analyse
+            columns: LibraryColumns of the library, or None until next needed
+    """
+
+    def __init__(self, library):
+        if np is None:
+            raise ImportError("library statistics need NumPy; install it with: pip install -r requirements-optional.txt")
+        self._library = library
+        self._columns = None
+        library.subscribe(self._on_library_change)
+
+    def close(self):
+        """Stops following changes to the library"""
+        self._library.unsubscribe(self._on_library_change)
+        self._columns = None
+
+    def _on_library_change(self, event, *details):
+        columns = self._columns
+        if columns is None:
+            return
+        if event == "inserted":
+            columns.append([details[1]])
+        elif event == "removed":
+            columns.remove(details[1])
+        elif event == "bulk_loaded":
+            media_items = self._library.get_all_media()
+            length = len(media_items)
+            if length > len(columns):
+                columns.append([media_items[position] for position in range(len(columns), length)])
+            else:
+                columns.remove_last(len(columns) - length)
+
+    def get_columns(self):
+        """Returns the LibraryColumns of the library, brought up to date with its changes"""
+        if self._columns is None or self._columns.mostly_dead():
+            self._columns = LibraryColumns(self._library.get_all_media())
+        else:
+            self._columns.update()
+        return self._columns
+
+    def _type_mask(self, columns, media_type):
+        """Returns a boolean array selecting the items still in the library, of a media
+           type if given, or None if that is every row
+
+           A ValueError is raised for a media type other than Song or Video, in any case.
+        """
+        mask = columns.live if columns.dead_count else None
+        if media_type is None:
+            return mask
+        folded_type = media_type.casefold()
+        if folded_type not in ("song", "video"):
+            raise ValueError(f"Unknown media type {media_type!r}; use Song or Video")
+        codes = [code for code, name in enumerate(columns.names["type"]) if name.casefold() == folded_type]
+        if not codes:
+            return np.zeros(len(columns.play_lengths), dtype = bool)
+        type_mask = columns.codes["type"] == codes[0]
+        return type_mask if mask is None else type_mask & mask
+
+    def _people_counted(self, columns, weights = None):
+        """Returns bincounts over person codes of the (item, person) pairs of items still in the library"""
+        people_codes = columns.people_codes
+        if columns.dead_count:
+            live = columns.live[columns.people_items]
+            people_codes = people_codes[live]
+            if weights is not None:
+                weights = weights[live]
+        return np.bincount(people_codes, weights = weights, minlength = len(columns.people_names))
+
+    def totals(self, media_type = None):
+        """Returns the count, total and mean play length of the library's items as a dict
+
+           Main Args:
+                media_type: "Song" or "Video", in any case, to only count that type, or None for all items
+        """
+        columns = self.get_columns()
+        play_lengths = columns.play_lengths
+        mask = self._type_mask(columns, media_type)
+        if mask is not None:
+            play_lengths = play_lengths[mask]
+        count = len(play_lengths)
+        total_length = int(play_lengths.sum())
+        return {"count" : count, "total_length" : total_length,
+                "mean_length" : total_length / count if count else 0.0}
+
+    def group_by(self, field, media_type = None):
+        """Returns the count, total and mean play length of each type, language or format
+
+           Groups are returned largest total play length first, as a dict of group
+           name to {"count", "total_length", "mean_length"}.
+
+           Main Args:
+                field: "type", "language" or "format"
+                media_type: "Song" or "Video", in any case, to only count that type, or None for all items
+        """
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"Cannot group by {field!r}; use one of {', '.join(GROUP_FIELDS)}")
+        columns = self.get_columns()
+        codes = columns.codes[field]
+        play_lengths = columns.play_lengths
+        mask = self._type_mask(columns, media_type)
+        if mask is not None:
+            codes = codes[mask]
+            play_lengths = play_lengths[mask]
+        names = columns.names[field]
+        counts = np.bincount(codes, minlength = len(names))
+        # Weighted sums are floats, which are exact for totals below 2**53 seconds.
+        total_lengths = np.bincount(codes, weights = play_lengths, minlength = len(names)).astype(np.int64)
+        groups = {}
+        for code in np.argsort(-total_lengths, kind = "stable"):
+            count = int(counts[code])
+            if count:
+                total_length = int(total_lengths[code])
+                groups[names[code]] = {"count" : count, "total_length" : total_length,
+                                       "mean_length" : total_length / count}
+        return groups
+
+    def length_histogram(self, bins = 10, media_type = None, length_range = None):
+        """Returns a histogram of play lengths as (counts, bin edges) lists
+
+           Main Args:
+                bins: Number of equal-width bins, or a list of bin edges
+                media_type: "Song" or "Video", in any case, to only count that type, or None for all items
+                length_range: (lowest, highest) play length covered by the bins, or
+                              None for the range of the items counted
+        """
+        columns = self.get_columns()
+        play_lengths = columns.play_lengths
+        mask = self._type_mask(columns, media_type)
+        if mask is not None:
+            play_lengths = play_lengths[mask]
+        counts, edges = np.histogram(play_lengths, bins = bins, range = length_range)
+        return counts.tolist(), edges.tolist()
+
+    def artist_counts(self, top = None):
+        """Returns (name, number of items) for each performer, actor and director, most items first
+
+           Main Args:
+                top: Number of artists to return, or None for all of them
+        """
+        columns = self.get_columns()
+        counts = self._people_counted(columns)
+        # Artists with the same count are listed in the order they first appear.
+        codes = np.lexsort((np.arange(len(counts)), -counts))[:np.count_nonzero(counts)][:top]
+        return [(columns.people_names[code], int(counts[code])) for code in codes]
+
+    def artist_lengths(self, top = None):
+        """Returns (name, total play length) for each artist, longest total first
+
+           Main Args:
+                top: Number of artists to return, or None for all of them
+        """
+        columns = self.get_columns()
+        counts = self._people_counted(columns)
+        total_lengths = self._people_counted(columns, columns.play_lengths[columns.people_items]).astype(np.int64)
+        codes = np.lexsort((np.arange(len(total_lengths)), -total_lengths, counts == 0))
+        return [(columns.people_names[code], int(total_lengths[code]))
+                for code in codes[:np.count_nonzero(counts)][:top]]
+
+    def report(self, bins = 10, top = 10):
+        """Returns every statistic in one dict, e.g. to print or save as JSON
+
+           Main Args:
+                bins: Number of bins in each play length histogram
+                top: Number of artists listed
+        """
+        report = {"totals" : self.totals()}
+        for field in GROUP_FIELDS:
+            report[f"by_{field}"] = self.group_by(field)
+        report["length_histograms"] = {}
+        for media_type in self.group_by("type"):
+            counts, edges = self.length_histogram(bins, media_type)
+            report["length_histograms"][media_type] = {"counts" : counts, "edges" : edges}
+        report["top_artists"] = [{"name" : name, "count" : count} for name, count in self.artist_counts(top)]
+        return report
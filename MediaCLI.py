@@ -0,0 +1,207 @@
+"""Command line interface to the media library, without the GUI.
+
+   Library files are CSV files in the Library.FIELDS format. Any journal of
+   changes saved by the app next to a library file is replayed when it is read.
+
+   Examples:
+        python MediaCLI.py import library.csv Media.csv exports/
+        python MediaCLI.py export init_library.csv backup.csv
+        python MediaCLI.py filter library.csv --language English --format MP3
+        python MediaCLI.py filter library.csv --type Song --min-length 180 --max-length 300
+        python MediaCLI.py artist library.csv "Al Pacino"
+        python MediaCLI.py runtime playlist.csv
+        python MediaCLI.py stats library.csv --bins 20 --top 5
+        python MediaCLI.py --metrics metrics.json --slow-ms 50 import library.csv exports/
+"""
+
+import argparse
+
+import csv
+
+import errno
+
+import json
+
+import os
+
+import sys
+
+import time
+
+from MediaClasses import Library, LibraryJournal, PlayList
+
+def load_library(file_name, must_exist = True):
+    """Returns a Library holding the items in a library file and its journal
+
+       Main Args:
+            file_name: Library CSV file to read
+            must_exist: Whether to raise FileNotFoundError if the file is missing,
+                        rather than returning an empty library
+    """
+    if must_exist and not os.path.exists(file_name):
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), file_name)
+    library = Library()
+    LibraryJournal(file_name).load(library)
+    return library
+
+def write_items(media_items, output):
+    """Writes media items to an open text file as CSV rows"""
+    writer = csv.DictWriter(output, fieldnames = Library.FIELDS, lineterminator = "\n")
+    writer.writeheader()
+    writer.writerows(media.to_dict() for media in media_items)
+
+def import_command(arguments):
+    """Adds items from CSV files and directories to a library file, creating it if needed
+
+       Items already in the library, or earlier in the sources, are skipped
+       unless --keep-duplicates is given.
+    """
+    library = load_library(arguments.library, must_exist = False)
+    skip_duplicates = not arguments.keep_duplicates
+    added = duplicates = 0
+    for source in arguments.sources:
+        if os.path.isdir(source):
+            summary = library.read_items_from_files(source, workers = arguments.workers,
+                                                    skip_duplicates = skip_duplicates)
+        else:
+            summary = library.read_items_from_file(source, skip_duplicates = skip_duplicates)
+        added += summary["added"]
+        duplicates += summary["duplicates"]
+    save_stats = library.write_items_to_file(arguments.library)
+    print(f"Imported {added} items, skipped {duplicates} duplicates; "
+          f"{arguments.library} now holds {save_stats['rows']} items", file = sys.stderr)
+
+def export_command(arguments):
+    """Writes a library file, with its journal applied, to a new CSV file"""
+    library = load_library(arguments.library)
+    save_stats = library.write_items_to_file(arguments.output)
+    print(f"Exported {save_stats['rows']} items "
+          f"({save_stats['rows_per_second']:,.0f} rows per second)", file = sys.stderr)
+
+def filter_command(arguments):
+    """Prints items matching every given condition as CSV"""
+    conditions = {"media_type" : arguments.type, "language" : arguments.language,
+                  "media_format" : arguments.format, "min_length" : arguments.min_length,
+                  "max_length" : arguments.max_length, "title" : arguments.title,
+                  "artist" : arguments.artist}
+    if all(value is None for value in conditions.values()):
+        sys.exit("filter: give at least one condition, e.g. --language or --artist")
+    library = load_library(arguments.library)
+    write_items(library.query(**conditions), sys.stdout)
+
+def artist_command(arguments):
+    """Prints all items featuring an artist as CSV"""
+    library = load_library(arguments.library)
+    write_items(library.get_media_with_artist(arguments.name), sys.stdout)
+
+def runtime_command(arguments):
+    """Prints the runtime in seconds of the songs in a playlist file"""
+    playlist = PlayList()
+    for media in Library().iter_items_from_file(arguments.playlist):
+        if media.get_class_name() == "Song":
+            playlist.add_song(media)
+    print(playlist.get_playlist_runtime())
+
+def stats_command(arguments):
+    """Prints play length totals by type, language and format, length histograms and top artists
+
+       Needs NumPy. With --json the whole report is printed as JSON.
+    """
+    library = load_library(arguments.library)
+    try:
+        from MediaAnalytics import LibraryAnalytics
+        analytics = LibraryAnalytics(library)
+    except ImportError as error:
+        sys.exit(f"stats: {error}")
+    report = analytics.report(bins = arguments.bins, top = arguments.top)
+    if arguments.json:
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+        return
+
+    totals = report["totals"]
+    print(f"{totals['count']:,} items, {totals['total_length']:,} seconds in total, "
+          f"{totals['mean_length']:,.1f} on average")
+    for field in ("type", "language", "format"):
+        print(f"\nBy {field}:")
+        print(f"  {'':<20} {'items':>10} {'total length':>14} {'mean length':>12}")
+        for name, group in report[f"by_{field}"].items():
+            print(f"  {name:<20} {group['count']:>10,} {group['total_length']:>14,} {group['mean_length']:>12,.1f}")
+    for media_type, histogram in report["length_histograms"].items():
+        print(f"\n{media_type} play lengths:")
+        edges = histogram["edges"]
+        for low, high, count in zip(edges, edges[1:], histogram["counts"]):
+            print(f"  {low:>10,.0f} - {high:<10,.0f} {count:>10,}")
+    print(f"\nTop {len(report['top_artists'])} artists:")
+    for artist in report["top_artists"]:
+        print(f"  {artist['name']:<30} {artist['count']:>10,}")
+
+def build_parser():
+    """Returns the argument parser for every command"""
+    parser = argparse.ArgumentParser(prog = "MediaCLI.py", description = "Media library tools without the GUI.")
+    parser.add_argument("--time", action = "store_true", help = "report how long the command took")
+    parser.add_argument("--metrics", metavar = "FILE", help = "write call counts and latencies of library operations to a JSON file")
+    parser.add_argument("--slow-ms", type = float, help = "log library operations slower than this many milliseconds")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    command = commands.add_parser("import", help = "add CSV files or directories of CSV files to a library file")
+    command.add_argument("library", help = "library CSV file to add to (created if missing)")
+    command.add_argument("sources", nargs = "+", help = "CSV files or directories to import")
+    command.add_argument("--workers", type = int, help = "worker processes used for directories")
+    command.add_argument("--keep-duplicates", action = "store_true",
+                         help = "add items even if the same item is already in the library")
+    command.set_defaults(run = import_command)
+
+    command = commands.add_parser("export", help = "write a library file to a new CSV file")
+    command.add_argument("library", help = "library CSV file")
+    command.add_argument("output", help = "CSV file to write")
+    command.set_defaults(run = export_command)
+
+    command = commands.add_parser("filter", help = "print items matching every given condition")
+    command.add_argument("library", help = "library CSV file")
+    command.add_argument("--type", choices = ("Song", "Video"), help = "media type to match")
+    command.add_argument("--language", help = "language to match (case-insensitive)")
+    command.add_argument("--format", help = "format to match (case-insensitive)")
+    command.add_argument("--artist", help = "performer, actor or director to match (case-insensitive)")
+    command.add_argument("--min-length", type = int, help = "smallest play length to match")
+    command.add_argument("--max-length", type = int, help = "largest play length to match")
+    command.add_argument("--title", help = "text the title must contain (case-insensitive)")
+    command.set_defaults(run = filter_command)
+
+    command = commands.add_parser("artist", help = "print all items featuring an artist")
+    command.add_argument("library", help = "library CSV file")
+    command.add_argument("name", help = "performer, actor or director name (case-insensitive)")
+    command.set_defaults(run = artist_command)
+
+    command = commands.add_parser("runtime", help = "print the runtime in seconds of the songs in a playlist file")
+    command.add_argument("playlist", help = "CSV file of playlist items")
+    command.set_defaults(run = runtime_command)
+
+    command = commands.add_parser("stats", help = "print play length statistics and top artists (needs NumPy)")
+    command.add_argument("library", help = "library CSV file")
+    command.add_argument("--bins", type = int, default = 10, help = "bins in each play length histogram (default 10)")
+    command.add_argument("--top", type = int, default = 10, help = "number of artists listed (default 10)")
+    command.add_argument("--json", action = "store_true", help = "print the report as JSON")
+    command.set_defaults(run = stats_command)
+    return parser
+
+def main(argv = None):
+    """Runs the command given on the command line"""
+    start_time = time.perf_counter()
+    arguments = build_parser().parse_args(argv)
+    # Instrumentation is only imported when asked for, as it is not needed otherwise.
+    if arguments.metrics or arguments.slow_ms is not None:
+        import MediaInstrumentation
+        MediaInstrumentation.enable(100 if arguments.slow_ms is None else arguments.slow_ms, arguments.metrics)
+    elif any(name.startswith("MEDIAAPP_") for name in os.environ):
+        import MediaInstrumentation
+        MediaInstrumentation.from_environment()
+    try:
+        arguments.run(arguments)
+    except (OSError, ValueError, SyntaxError, csv.Error) as error:
+        sys.exit(f"{arguments.command}: {error}")
+    if arguments.time:
+        print(f"{arguments.command} took {time.perf_counter() - start_time:.3f} seconds", file = sys.stderr)
+
+if __name__ == "__main__":
+    main()
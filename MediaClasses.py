@@ -1,33 +1,938 @@
 import ast
 
+import bisect
+
 import csv
 
-class Library:
+import hashlib
+
+import os
+
+import random
+
+import re
+
+import stat
+
+import tempfile
+
+import threading
+
+import time
+
+from collections.abc import MutableSequence, Sequence
+
+from functools import lru_cache
+
+from itertools import accumulate, chain, islice
+
+# Separator between names in a list cell, e.g. ['A', 'B'] or ['A','B'].
+_LIST_SEPARATOR = re.compile(r"',\s*'")
+
+@lru_cache(maxsize = 4096)
+def _parse_list_cell(cell):
+    """Converts a list cell such as "['A', 'B']" to a tuple of names
+
+       Cells written by Library.write_items_to_file are parsed by splitting
+       on the quoted separators. Anything else (escapes, double quotes,
+       unusual spacing) falls back to ast.literal_eval. Results are cached,
+       as the same cast and band lists repeat across many rows, and are
+       returned as tuples so cached values cannot be mutated by callers.
+    """
+    if cell == "[]":
+        return ()
+    if cell.startswith("['") and cell.endswith("']") and "\\" not in cell:
+        names = _LIST_SEPARATOR.split(cell[2:-2])
+        if not any("'" in name for name in names):
+            return tuple(names)
+    value = ast.literal_eval(cell)
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+# A word in a title or name, for searching.
+_WORD = re.compile(r"\w+")
+
+def _search_words(media):
+    """Returns the set of case-folded words in a media item's title and people's names"""
+    return set(_WORD.findall(" ".join((media.get_media_title(), *media.get_people())).casefold()))
+
+def _first_seen(media_items):
+    """Yields each media item the first time it appears, without reading further ahead"""
+    seen = set()
+    for media in media_items:
+        if media not in seen:
+            seen.add(media)
+            yield media
+
+def _title_sort_key(media):
+    """Returns the key media items are sorted by in the title index"""
+    return media.get_media_title().casefold()
+
+class ChangeNotifier:
+    """Represents a collection that tells subscribers about changes made to it
+
+       Subscribers are called with the event name followed by its details:
+            "inserted", position, media: An item was inserted at position
+            "removed", position, media: The item at position was removed
+            "moved", from_position, to_position: An item was moved to a new position
+            "bulk_loaded": Many items were added or removed at once
+
+       Attributes in constructor:
+            subscribers: Callables notified of each change (list)
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Calls callback with the details of every later change
+
+           Main Args:
+                callback: Callable taking the event name and its details
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stops calling a callback previously passed to subscribe"""
+        self._subscribers.remove(callback)
+
+    def _notify(self, event, *details):
+        """Calls every subscriber with an event and its details"""
+        for callback in self._subscribers:
+            callback(event, *details)
+
+class KeyedList(Sequence):
+    """Represents a list of values that can also be found and removed by a unique key
+
+       Values are stored in slots in the order they were appended, with a dict
+       from each key to its slot, so a value is found by key in O(1). Removing
+       a value leaves a tombstone (None) in its slot instead of shifting every
+       later value. A Fenwick tree counts the live slots, which converts between
+       positions and slots in O(log n). The slots are compacted once more than
+       half of them are tombstones, so removal is amortised O(log n).
+
+       While there are no tombstones, positions and slots are the same, so the
+       tree is not built and appending and indexing are as fast as a plain list.
+
+       Attributes in constructor:
+            values: Value in each slot, or None once removed (list)
+            keys: Key of each slot, or None once removed (list)
+            slots: Key of every live value mapped to its slot (dict)
+            tree: Fenwick tree of live slot counts indexed from 1, or None while there are no tombstones (list)
+       Class attribute:
+            MIN_COMPACT_SIZE: Number of tombstones below which slots are never compacted
+    """
+
+    MIN_COMPACT_SIZE = 1024
+
+    def __init__(self):
+        self._values = []
+        self._keys = []
+        self._slots = {}
+        self._tree = None
+
+    def __len__(self):
+        return len(self._slots)
+
+    def has_key(self, key):
+        """Returns True if a live value has the key"""
+        return key in self._slots
+
+    def get(self, key, default = None):
+        """Returns the value with the key, or default if there is none"""
+        slot = self._slots.get(key)
+        if slot is None:
+            return default
+        return self._values[slot]
+
+    def _count_before(self, slot):
+        """Returns the number of live values in the slots before slot"""
+        if self._tree is None:
+            return slot
+        count = 0
+        while slot > 0:
+            count += self._tree[slot]
+            slot -= slot & -slot
+        return count
+
+    def _add_to_tree(self, slot, change):
+        """Adds change to the live count of slot, building the tree if needed"""
+        if self._tree is None:
+            self._build_tree()
+        index = slot + 1
+        while index < len(self._tree):
+            self._tree[index] += change
+            index += index & -index
+
+    def _slot_at(self, position):
+        """Returns the slot holding the value at a non-negative position"""
+        if len(self._slots) == len(self._values):
+            return position
+        slot = 0
+        remaining = position + 1
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            index = slot + step
+            if index < len(self._tree) and self._tree[index] < remaining:
+                slot = index
+                remaining -= self._tree[index]
+            step >>= 1
+        return slot
+
+    def _position(self, position):
+        """Returns position as a non-negative index, raising IndexError if out of range"""
+        if position < 0:
+            position += len(self._slots)
+        if not 0 <= position < len(self._slots):
+            raise IndexError("list index out of range")
+        return position
+
+    def position_of_key(self, key):
+        """Returns the position of the value with the key, raising KeyError if there is none"""
+        return self._count_before(self._slots[key])
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        return self._values[self._slot_at(self._position(position))]
+
+    def __iter__(self):
+        if len(self._slots) == len(self._values):
+            return iter(self._values)
+        return (value for value in self._values if value is not None)
+
+    def append(self, key, value):
+        """Adds a value with a key that is not already in the list to the end"""
+        if key in self._slots:
+            raise KeyError(f"Duplicate key: {key!r}")
+        slot = len(self._values)
+        self._values.append(value)
+        self._keys.append(key)
+        self._slots[key] = slot
+        if self._tree is not None:
+            # Tree node slot + 1 counts the live slots from (slot + 1) - lowbit to slot.
+            index = slot + 1
+            self._tree.append(1 + self._count_before(slot) - self._count_before(index - (index & -index)))
+
+    def remove_key(self, key):
+        """Removes and returns the value with the key, raising KeyError if there is none"""
+        slot = self._slots.pop(key)
+        self._add_to_tree(slot, -1)
+        value = self._values[slot]
+        self._values[slot] = None
+        self._keys[slot] = None
+        tombstones = len(self._values) - len(self._slots)
+        if tombstones >= KeyedList.MIN_COMPACT_SIZE and tombstones * 2 > len(self._values):
+            self.compact()
+        return value
+
+    def pop(self, position = -1):
+        """Removes and returns the value at position"""
+        slot = self._slot_at(self._position(position))
+        return self.remove_key(self._keys[slot])
+
+    def truncate(self, length):
+        """Removes every value after the first length values"""
+        if length >= len(self._slots):
+            return
+        end = self._slot_at(length)
+        for key in self._keys[end:]:
+            if key is not None:
+                del self._slots[key]
+        del self._values[end:]
+        del self._keys[end:]
+        if self._tree is not None:
+            # Tree nodes up to end only count slots before end, so they stay correct.
+            del self._tree[end + 1:]
+
+    def compact(self):
+        """Drops every tombstone, so positions and slots are the same again"""
+        self._values = [value for value in self._values if value is not None]
+        self._keys = [key for key in self._keys if key is not None]
+        self._slots = {key : slot for slot, key in enumerate(self._keys)}
+        self._tree = None
+
+    def _build_tree(self):
+        """Builds the Fenwick tree of live slot counts in O(n)"""
+        tree = [0] + [int(key is not None) for key in self._keys]
+        for index in range(1, len(tree)):
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+class SortedIndex:
+    """Represents media items kept sorted by a key, for range queries and ordered views
+
+       The index is built by sorting the source on first use. The sorted items
+       are held in blocks of about LOAD items, with the largest key of each
+       block, so an item is inserted or removed by bisecting for its block and
+       then shifting only that block, rather than the whole index. Blocks that
+       grow past twice LOAD are split, and blocks that shrink below half of it
+       are merged with a neighbour. The start position of each block is worked
+       out again on the next positional lookup after a change. A batch of
+       changes larger than the index itself drops the index, so that it is
+       sorted again on next use; smaller batches, such as the chunks of a
+       background load, are applied item by item, so a view of the index kept
+       open during a load is never sorted again from scratch. Items with equal
+       keys stay in the order they were added.
+
+       Attributes in constructor:
+            source: Collection of every media item, sorted when the index is built
+            key: Callable returning the sort key of a media item
+            key_blocks: Blocks of sort keys in sorted order, or None until built (list of lists)
+            item_blocks: Blocks of media items matching key_blocks, or None until built (list of lists)
+            maxes: Largest key of each block (list)
+            offsets: Sorted position of the first item of each block, or None until
+                     next needed (list)
+            length: Number of items in the index (integer)
+       Class attribute:
+            LOAD: Number of items a block is built with, and split back to
+    """
+
+    LOAD = 512
+
+    def __init__(self, source, key):
+        self._source = source
+        self._key = key
+        self._key_blocks = None
+        self._item_blocks = None
+        self._maxes = []
+        self._offsets = None
+        self._length = 0
+
+    def _build(self):
+        """Sorts the source into blocks, if the index is not built"""
+        if self._key_blocks is None:
+            items = sorted(self._source, key = self._key)
+            keys = [self._key(media) for media in items]
+            load = SortedIndex.LOAD
+            self._key_blocks = [keys[start : start + load] for start in range(0, len(keys), load)]
+            self._item_blocks = [items[start : start + load] for start in range(0, len(items), load)]
+            self._maxes = [keys[-1] for keys in self._key_blocks]
+            self._offsets = None
+            self._length = len(items)
+
+    def clear(self):
+        """Drops the index, so that it is sorted again on next use"""
+        self._key_blocks = None
+        self._item_blocks = None
+        self._maxes = []
+        self._offsets = None
+        self._length = 0
+
+    def add(self, media):
+        """Inserts a media item after any items with an equal key"""
+        if self._key_blocks is None:
+            return
+        key = self._key(media)
+        if not self._key_blocks:
+            self._key_blocks.append([key])
+            self._item_blocks.append([media])
+            self._maxes.append(key)
+        else:
+            # The first block with a larger key holds the place after every equal key.
+            block = min(bisect.bisect_right(self._maxes, key), len(self._maxes) - 1)
+            keys = self._key_blocks[block]
+            position = bisect.bisect_right(keys, key)
+            keys.insert(position, key)
+            self._item_blocks[block].insert(position, media)
+            self._maxes[block] = keys[-1]
+            if len(keys) > 2 * SortedIndex.LOAD:
+                self._split(block)
+        self._length += 1
+        self._offsets = None
+
+    def _split(self, block):
+        """Splits a block that has grown too large in two"""
+        keys = self._key_blocks[block]
+        items = self._item_blocks[block]
+        half = len(keys) // 2
+        self._key_blocks[block + 1 : block + 1] = [keys[half:]]
+        self._item_blocks[block + 1 : block + 1] = [items[half:]]
+        del keys[half:], items[half:]
+        self._maxes[block : block + 1] = [keys[-1], self._key_blocks[block + 1][-1]]
+
+    def add_many(self, media_items):
+        """Inserts several media items, or drops the index if there are more of them than it holds"""
+        if self._key_blocks is not None and len(media_items) > self._length:
+            self.clear()
+        else:
+            for media in media_items:
+                self.add(media)
+
+    def remove(self, media):
+        """Removes a media item, which is found by bisecting for its key"""
+        if self._key_blocks is None:
+            return
+        key = self._key(media)
+        for block in range(bisect.bisect_left(self._maxes, key), len(self._maxes)):
+            keys = self._key_blocks[block]
+            if keys[0] > key:
+                return
+            items = self._item_blocks[block]
+            for position in range(bisect.bisect_left(keys, key), bisect.bisect_right(keys, key)):
+                if items[position] is media:
+                    del keys[position], items[position]
+                    self._length -= 1
+                    self._offsets = None
+                    if keys:
+                        self._maxes[block] = keys[-1]
+                    if len(keys) < SortedIndex.LOAD // 2:
+                        self._merge(block)
+                    return
+
+    def _merge(self, block):
+        """Joins a block that has shrunk too small onto a neighbour, or drops it if empty"""
+        if not self._key_blocks[block]:
+            del self._key_blocks[block], self._item_blocks[block], self._maxes[block]
+            return
+        if len(self._key_blocks) == 1:
+            return
+        if block == len(self._key_blocks) - 1:
+            block -= 1
+        self._key_blocks[block] += self._key_blocks.pop(block + 1)
+        self._item_blocks[block] += self._item_blocks.pop(block + 1)
+        del self._maxes[block]
+        if len(self._key_blocks[block]) > 2 * SortedIndex.LOAD:
+            self._split(block)
+
+    def remove_many(self, media_items):
+        """Removes several media items, or drops the index if they are over half of it"""
+        if self._key_blocks is not None and 2 * len(media_items) > self._length:
+            self.clear()
+        else:
+            for media in media_items:
+                self.remove(media)
+
+    def __len__(self):
+        self._build()
+        return self._length
+
+    def __iter__(self):
+        self._build()
+        for items in self._item_blocks:
+            yield from items
+
+    def __reversed__(self):
+        self._build()
+        for items in reversed(self._item_blocks):
+            yield from reversed(items)
+
+    def _block_offsets(self):
+        """Returns the sorted position of the first item of each block"""
+        self._build()
+        if self._offsets is None:
+            self._offsets = list(accumulate((len(keys) for keys in self._key_blocks[:-1]), initial = 0))
+        return self._offsets
+
+    def _bounds(self, low, high):
+        """Returns the sorted positions of the first item with a key of at least low,
+           and just after the last item with a key of at most high. None means no limit."""
+        offsets = self._block_offsets()
+        start = 0
+        if low is not None:
+            block = bisect.bisect_left(self._maxes, low)
+            start = (self._length if block == len(self._maxes)
+                     else offsets[block] + bisect.bisect_left(self._key_blocks[block], low))
+        end = self._length
+        if high is not None:
+            block = bisect.bisect_right(self._maxes, high)
+            if block < len(self._maxes):
+                end = offsets[block] + bisect.bisect_right(self._key_blocks[block], high)
+        return start, max(start, end)
+
+    def _locate(self, position):
+        """Returns the block holding a sorted position, and the position within it"""
+        offsets = self._block_offsets()
+        block = bisect.bisect_right(offsets, position) - 1
+        return block, position - offsets[block]
+
+    def count_range(self, low = None, high = None):
+        """Returns the number of items with keys between low and high inclusive"""
+        start, end = self._bounds(low, high)
+        return end - start
+
+    def get_range(self, low = None, high = None):
+        """Returns the items with keys between low and high inclusive, in key order"""
+        start, end = self._bounds(low, high)
+        media_items = []
+        if start < end:
+            block, position = self._locate(start)
+            while len(media_items) < end - start:
+                media_items += self._item_blocks[block][position : position + end - start - len(media_items)]
+                block += 1
+                position = 0
+        return media_items
+
+    def item_at(self, position):
+        """Returns the item at a position in key order"""
+        length = len(self)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("sorted index position out of range")
+        block, position = self._locate(position)
+        return self._item_blocks[block][position]
+
+class SortedMediaView(Sequence):
+    """Represents a read-only view of media items in the order of a sorted index
+
+       The view reads from the index each time it is used, so it stays up to
+       date as the library changes and nothing is sorted again to show it.
+
+       Attributes in constructor:
+            index: The SortedIndex the view reads from
+            descending: Whether the view lists the largest keys first (boolean)
+    """
+
+    def __init__(self, index, descending = False):
+        self._index = index
+        self._descending = descending
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        length = len(self._index)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("media position out of range")
+        if self._descending:
+            position = length - 1 - position
+        return self._index.item_at(position)
+
+    def __iter__(self):
+        return reversed(self._index) if self._descending else iter(self._index)
+
+class WordIndex:
+    """Represents an index of the words in media titles and people's names, for prefix search
+
+       Each case-folded title word is mapped to the media items with that word
+       in their title. People's names repeat across many items, so each name
+       word is instead mapped to the names containing it, and the library's
+       artist index maps those names to their items. Every distinct word is
+       also kept in a sorted list, so the words starting with a prefix are
+       found by bisecting it. The index is built on first use and then kept
+       up to date after the library's artist index, with single items
+       inserted and removed, while a large batch of changes drops the index
+       so that it is built again on next use. It can also be built from a
+       copy of the source on a worker thread, ahead of the first search; the
+       thread only reads its copy, and the result is installed by the next
+       search if nothing has been added or removed since the copy was taken.
+
+       Attributes in constructor:
+            source: Collection of every media item, indexed when the index is built
+            artist_index: The library's artist index, from case-folded name to media items (dict)
+            title_words: Title word mapped to a dict used as an ordered set of media items,
+                         or None until built (dict)
+            name_words: Name word mapped to the set of case-folded names containing it (dict)
+            sorted_words: Every title and name word, sorted (list)
+            version: Count of changes made, to tell if a background build is out of date (integer)
+            background: The worker thread, version and result list of a background
+                        build not yet installed, or None (tuple)
+       Class attribute:
+            REBUILD_SIZE: Batch size above which the index is dropped rather than updated
+            MAX_BUCKET_CHECKS: Most index entries a search word may match for candidates
+                               to be checked against each entry
+            SET_CHECK_RATIO: Most items a search word may match, per candidate, for its
+                             matches to be collected in a set rather than candidates
+                             being checked against their own words
+    """
+
+    REBUILD_SIZE = 1000
+    MAX_BUCKET_CHECKS = 16
+    SET_CHECK_RATIO = 20
+
+    def __init__(self, source, artist_index):
+        self._source = source
+        self._artist_index = artist_index
+        self._title_words = None
+        self._name_words = None
+        self._sorted_words = None
+        self._version = 0
+        self._background = None
+
+    @staticmethod
+    def _index_words(media_items, names):
+        """Returns the title words, name words and sorted words of media items and artist names"""
+        title_words = {}
+        for media in media_items:
+            for word in set(_WORD.findall(media.get_media_title().casefold())):
+                bucket = title_words.get(word)
+                if bucket is None:
+                    bucket = title_words[word] = {}
+                bucket[media] = None
+        name_words = {}
+        for name in names:
+            for word in _WORD.findall(name):
+                name_words.setdefault(word, set()).add(name)
+        return title_words, name_words, sorted(title_words.keys() | name_words.keys())
+
+    def _build(self):
+        """Indexes the source, if the index is not built
+
+           A background build of the unchanged source is waited for and used.
+        """
+        if self._title_words is None:
+            index = None
+            if self._background is not None:
+                worker, version, result = self._background
+                self._background = None
+                if version == self._version:
+                    worker.join()
+                    index = result[0] if result else None
+            if index is None:
+                index = self._index_words(self._source, self._artist_index)
+            self._title_words, self._name_words, self._sorted_words = index
+
+    def build_in_background(self):
+        """Starts indexing a copy of the source on a worker thread, if the index is not built"""
+        if self._title_words is not None or self._background is not None:
+            return
+        media_items = list(self._source)
+        names = list(self._artist_index)
+        result = []
+        worker = threading.Thread(target = lambda: result.append(self._index_words(media_items, names)),
+                                  daemon = True)
+        worker.start()
+        self._background = (worker, self._version, result)
+
+    def clear(self):
+        """Drops the index, so that it is built again on next use"""
+        self._version += 1
+        self._title_words = None
+        self._name_words = None
+        self._sorted_words = None
+
+    def _add_word(self, word):
+        """Adds a word to the sorted words, unless it is already there"""
+        position = bisect.bisect_left(self._sorted_words, word)
+        if position == len(self._sorted_words) or self._sorted_words[position] != word:
+            self._sorted_words.insert(position, word)
+
+    def _discard_word(self, word):
+        """Removes a word from the sorted words, once no title or name contains it"""
+        if word not in self._title_words and word not in self._name_words:
+            del self._sorted_words[bisect.bisect_left(self._sorted_words, word)]
+
+    def add(self, media):
+        """Adds the words of a media item, which is already in the artist index"""
+        self._version += 1
+        if self._title_words is None:
+            return
+        for word in set(_WORD.findall(media.get_media_title().casefold())):
+            bucket = self._title_words.get(word)
+            if bucket is None:
+                bucket = self._title_words[word] = {}
+                self._add_word(word)
+            bucket[media] = None
+        for name in {name.casefold() for name in media.get_people() if name}:
+            for word in _WORD.findall(name):
+                names = self._name_words.get(word)
+                if names is None:
+                    names = self._name_words[word] = set()
+                    self._add_word(word)
+                names.add(name)
+
+    def add_many(self, media_items):
+        """Adds the words of several media items, or drops the index if there are many of them"""
+        if len(media_items) > WordIndex.REBUILD_SIZE:
+            self.clear()
+        else:
+            for media in media_items:
+                self.add(media)
+
+    def remove(self, media):
+        """Removes the words of a media item, which is already out of the artist index"""
+        self._version += 1
+        if self._title_words is None:
+            return
+        for word in set(_WORD.findall(media.get_media_title().casefold())):
+            bucket = self._title_words[word]
+            del bucket[media]
+            if not bucket:
+                del self._title_words[word]
+                self._discard_word(word)
+        for name in {name.casefold() for name in media.get_people() if name}:
+            if name in self._artist_index:
+                continue
+            for word in _WORD.findall(name):
+                names = self._name_words.get(word)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self._name_words[word]
+                        self._discard_word(word)
+
+    def remove_many(self, media_items):
+        """Removes the words of several media items, or drops the index if there are many of them"""
+        if len(media_items) > WordIndex.REBUILD_SIZE:
+            self.clear()
+        else:
+            for media in media_items:
+                self.remove(media)
+
+    def _buckets(self, token):
+        """Returns the ordered sets of media items with a title or name word starting with token"""
+        start = bisect.bisect_left(self._sorted_words, token)
+        end = bisect.bisect_left(self._sorted_words, token + "\U0010ffff", start)
+        buckets = []
+        for word in self._sorted_words[start:end]:
+            if word in self._title_words:
+                buckets.append(self._title_words[word])
+            for name in self._name_words.get(word, ()):
+                buckets.append(self._artist_index[name])
+        return buckets
+
+    def search(self, text, within = None, limit = None):
+        """Returns the media items with a word starting with each word of text
+
+           The search word matching the fewest items supplies the candidates,
+           which are checked against the other search words. If within is given
+           and is smaller, it is used as the candidates instead, which lets a
+           search be narrowed as more is typed. With a limit, candidates are
+           gathered and checked only until that many matches are found, so a
+           short prefix matching much of the library returns quickly.
+        """
+        tokens = _WORD.findall(text.casefold())
+        if not tokens:
+            return []
+        self._build()
+        token_buckets = [self._buckets(token) for token in tokens]
+        sizes = [sum(map(len, buckets)) for buckets in token_buckets]
+        smallest = sizes.index(min(sizes))
+
+        if within is not None and len(within) <= sizes[smallest]:
+            candidates = within
+            candidate_count = len(within)
+        else:
+            matches = chain.from_iterable(token_buckets[smallest])
+            candidates = dict.fromkeys(matches) if limit is None else _first_seen(matches)
+            candidate_count = sizes[smallest]
+            del tokens[smallest], token_buckets[smallest]
+        if limit is not None:
+            candidate_count = min(candidate_count, limit)
+
+        # Each other search word is checked by looking candidates up in its few
+        # matching entries, in a set of all its matches, or, where it matches far
+        # more items than there are candidates, against each candidate's own words.
+        checks = []
+        for token, buckets in zip(tokens, token_buckets):
+            if len(buckets) <= WordIndex.MAX_BUCKET_CHECKS:
+                checks.append(lambda media, buckets = buckets: any(media in bucket for bucket in buckets))
+            elif sum(map(len, buckets)) <= WordIndex.SET_CHECK_RATIO * candidate_count:
+                checks.append(set(chain.from_iterable(buckets)).__contains__)
+            else:
+                checks.append(lambda media, token = token:
+                              any(word.startswith(token) for word in _search_words(media)))
+        return list(islice((media for media in candidates if all(check(media) for check in checks)), limit))
+
+class InternPool:
+    """Represents the shared copies of strings and name tuples used by a library's items
+
+       Formats, languages and people's names repeat across many items. Each item
+       added to a library has them replaced by the pool's copy, so each distinct
+       value is stored once. Names act as flyweight person records: one string
+       object per person, shared by every item they feature in. Lists of names
+       are stored as tuples, and items with the same people share one tuple.
+
+       Attributes in constructor:
+            strings: Each distinct string mapped to its shared copy (dict)
+            names: Each distinct tuple of names mapped to its shared copy (dict)
+    """
+
+    def __init__(self):
+        self._strings = {}
+        self._names = {}
+
+    def __len__(self):
+        return len(self._strings) + len(self._names)
+
+    def string(self, value):
+        """Returns the shared copy of a string, adding it to the pool if it is new"""
+        shared = self._strings.get(value)
+        if shared is None:
+            shared = self._strings[value] = value
+        return shared
+
+    def names(self, names):
+        """Returns the shared tuple of a sequence of names, adding it to the pool if it is new
+
+           Main Args:
+                names: List or tuple of names. An empty cell ("") is returned unchanged.
+        """
+        if isinstance(names, str):
+            return names
+        shared = self._names.get(names) if isinstance(names, tuple) else self._names.get(tuple(names))
+        if shared is None:
+            shared = tuple(self.string(name) for name in names)
+            self._names[shared] = shared
+        return shared
+
+def _list_cell(names):
+    """Returns names as a list, as they are written to library files, or an empty cell unchanged"""
+    return list(names) if isinstance(names, tuple) else names
+
+class Library(ChangeNotifier):
     """Represents a library to store video and song items
 
-       This class includes a collection to store media objects
+       This class includes a collection to store media objects. Subscribers are
+       told about every item added or removed. Every item is given a media ID
+       that stays the same while it is in the library, and is saved with it.
 
        Attributes in constructor:
-            media_list: An ordered collection type (list) to store all objects
+            media_list: An ordered collection (KeyedList) of all objects, keyed by media ID
+            next_media_id: The media ID given to the next item without one (integer)
+            type_index: Case-folded class name ("song" or "video") mapped to its media items (dict)
+            language_index: Case-folded language mapped to its media items (dict)
+            format_index: Case-folded format mapped to its media items (dict)
+            artist_index: Case-folded performer, actor or director name mapped
+                          to the media items they feature in (dict)
+            sorted_indexes: Field name ("length" or "title") mapped to a
+                            SortedIndex of media items by that field (dict)
+            word_index: WordIndex of the words in titles and people's names (WordIndex)
+            lazy_indexes: The sorted and word indexes, which are built on first use (tuple)
+            fingerprints: Fingerprint of every item mapped to how many items have it,
+                          or None until duplicates are first checked for (dict)
+            journal: Optional LibraryJournal recording every change (LibraryJournal)
+            intern_pool: Shared copies of the formats, languages and names of items (InternPool)
        Class attribute:
             FIELDS: A set used to specify titles for writing and reading from files
+            CHUNK_SIZE: Default number of items parsed per chunk when reading files
+            WRITE_BUFFER_SIZE: Buffer size in bytes used when writing files
     """
 
     FIELDS = ('Type', 'Media Title', 'Media Format', 'Media Language',
-            'Play Length', 'Performer Names', 'Director Name', 'Actors')
+            'Play Length', 'Performer Names', 'Director Name', 'Actors', 'Media ID')
+    CHUNK_SIZE = 10000
+    WRITE_BUFFER_SIZE = 1 << 20
 
     def __init__(self):
-        self._media_list = []
+        super().__init__()
+        self._media_list = KeyedList()
+        self._next_media_id = 1
+        self._type_index = {}
+        self._language_index = {}
+        self._format_index = {}
+        self._artist_index = {}
+        self._sorted_indexes = {"length" : SortedIndex(self._media_list, MediaItem.get_play_length),
+                                "title" : SortedIndex(self._media_list, _title_sort_key)}
+        self._word_index = WordIndex(self._media_list, self._artist_index)
+        self._lazy_indexes = (*self._sorted_indexes.values(), self._word_index)
+        self._fingerprints = None
+        self._journal = None
+        self._intern_pool = InternPool()
+
+    def attach_journal(self, journal):
+        """Records all later changes to library collection in specified journal
+
+           Main Args:
+                journal: LibraryJournal object, or None to stop recording changes
+        """
+        self._journal = journal
+
+    def get_journal(self):
+        """Returns the journal recording changes to library collection, or None"""
+        return self._journal
+
+    def _assign_media_id(self, media):
+        """Gives media item a new media ID unless it has one not used in library collection"""
+        media_id = media.get_media_id()
+        if media_id is None or self._media_list.has_key(media_id):
+            media_id = self._next_media_id
+            media.set_media_id(media_id)
+        self._next_media_id = max(self._next_media_id, media_id + 1)
+        return media_id
 
     def add_media(self, media):
         """Adds media item to library collection.
         
-           Media item should be a Song or Video class object.
+           Media item should be a Song or Video class object. It keeps its media ID
+           unless it has none or the ID is already used, when it is given a new one.
 
            Main Args:
                 media: The Song or Video object to be added.
         """
-        self._media_list.append(media)
+        media.intern_values(self._intern_pool)
+        self._media_list.append(self._assign_media_id(media), media)
+        self._index_media(media)
+        for index in self._lazy_indexes:
+            index.add(media)
+        self._count_fingerprint(media, 1)
+        if self._journal:
+            self._journal.record_add(media)
+        self._notify("inserted", len(self._media_list) - 1, media)
+
+    def add_media_items(self, media_items, skip_duplicates = False):
+        """Adds several media items to library collection at once.
+
+           Returns the number of items skipped as duplicates.
+
+           Main Args:
+                media_items: Iterable of Song or Video objects to be added.
+                skip_duplicates: Whether to skip items with the same fingerprint as
+                                 an item already in the library, or earlier in media_items
+        """
+        media_items, duplicates = self._unique_items(media_items, skip_duplicates)
+        intern_pool = self._intern_pool
+        for media in media_items:
+            media.intern_values(intern_pool)
+            self._media_list.append(self._assign_media_id(media), media)
+            self._index_media(media)
+        for index in self._lazy_indexes:
+            index.add_many(media_items)
+        if self._journal:
+            for media in media_items:
+                self._journal.record_add(media)
+        if media_items:
+            self._notify("bulk_loaded")
+        return duplicates
+
+    def _get_fingerprints(self):
+        """Returns the fingerprint counts, counting every item's fingerprint the first time"""
+        if self._fingerprints is None:
+            fingerprints = {}
+            for media in self.get_all_media():
+                fingerprint = media.get_fingerprint()
+                fingerprints[fingerprint] = fingerprints.get(fingerprint, 0) + 1
+            self._fingerprints = fingerprints
+        return self._fingerprints
+
+    def _count_fingerprint(self, media, change):
+        """Adds change to the count of media item's fingerprint, once fingerprints are kept"""
+        if self._fingerprints is not None:
+            fingerprint = media.get_fingerprint()
+            count = self._fingerprints.get(fingerprint, 0) + change
+            if count:
+                self._fingerprints[fingerprint] = count
+            else:
+                del self._fingerprints[fingerprint]
+
+    def _unique_items(self, media_items, skip_duplicates):
+        """Returns a list of the media items to add, and the number of duplicates left out
+
+           Each fingerprint is looked up in a dict, so this takes O(1) time per item.
+           The fingerprints of the returned items are counted.
+        """
+        media_items = list(media_items)
+        if not skip_duplicates:
+            for media in media_items:
+                self._count_fingerprint(media, 1)
+            return media_items, 0
+
+        fingerprints = self._get_fingerprints()
+        unique_items = []
+        for media in media_items:
+            fingerprint = media.get_fingerprint()
+            if fingerprint not in fingerprints:
+                fingerprints[fingerprint] = 1
+                unique_items.append(media)
+        return unique_items, len(media_items) - len(unique_items)
 
     def remove_media(self, position):
         """Remove item for Library collection 
@@ -35,77 +940,323 @@ class Library:
            Main Args:
                 position: The index in library collection to remove item from
         """
+        if position < 0:
+            position += len(self._media_list)
         removed_item = self._media_list.pop(position)
+        self._removed(position, removed_item)
         return removed_item
 
+    def remove_media_by_id(self, media_id):
+        """Remove the item with a media ID from library collection
+
+           The item is found through the media ID map, so later items are not
+           shifted. A KeyError is raised if no item has the media ID.
+
+           Main Args:
+                media_id: The media ID of the item to remove
+        """
+        position = self._media_list.position_of_key(media_id)
+        removed_item = self._media_list.remove_key(media_id)
+        self._removed(position, removed_item)
+        return removed_item
+
+    def _removed(self, position, removed_item):
+        """Unindexes, records and announces an item removed from position"""
+        self._unindex_media(removed_item)
+        self._count_fingerprint(removed_item, -1)
+        for index in self._lazy_indexes:
+            index.remove(removed_item)
+        if self._journal:
+            self._journal.record_remove(removed_item)
+        self._notify("removed", position, removed_item)
+
+    def get_media_by_id(self, media_id):
+        """Return the item with a media ID, or None if there is none
+
+           Main Args:
+                media_id: The media ID of the item
+        """
+        return self._media_list.get(media_id)
+
+    def truncate(self, length):
+        """Removes every item after the first length items in library collection
+
+           This is used to roll back items added by an import that failed or was cancelled.
+
+           Main Args:
+                length: Number of items to keep
+        """
+        removed_items = self._media_list[length:]
+        for media in removed_items:
+            self._unindex_media(media)
+            self._count_fingerprint(media, -1)
+        for index in self._lazy_indexes:
+            index.remove_many(removed_items)
+        self._media_list.truncate(length)
+        if self._journal:
+            self._journal.record_truncate(length)
+        if removed_items:
+            self._notify("bulk_loaded")
+
+    def _index_keys(self, media):
+        """Returns (index, key) pairs for every index entry of a media item"""
+        keys = [(self._type_index, media.get_class_name().casefold()),
+                (self._language_index, media.get_media_language().casefold()),
+                (self._format_index, media.get_media_format().casefold())]
+        artists = {name.casefold() for name in media.get_people() if name}
+        keys.extend((self._artist_index, artist) for artist in artists)
+        return keys
+
+    def _index_media(self, media):
+        """Adds media item to the type, language, format and artist indexes
+
+           Each index maps a case-folded key to a dict used as an ordered set,
+           so items stay in the order they were added to the library.
+        """
+        for index, key in self._index_keys(media):
+            index.setdefault(key, {})[media] = None
+
+    def _unindex_media(self, media):
+        """Removes media item from the type, language, format and artist indexes"""
+        for index, key in self._index_keys(media):
+            bucket = index[key]
+            del bucket[media]
+            if not bucket:
+                del index[key]
+
     def reformat_items(self, item):
-        """Converts item from string to list by evaluating the expression
+        """Converts item from string to a tuple of names by evaluating the expression
 
            Item should be emptry or of string format, with the intention of evaluating
-           to a list type.
+           to a list, which is returned as a tuple. Common cells are handled by a fast,
+           cached parser.
 
            Main Args:
                 item: The item to evaluate
         """
         if item != "":
-            return ast.literal_eval(item)
+            return _parse_list_cell(item)
         return item
 
-    def read_items_from_file(self, file_name):
+    def create_media_from_row(self, row):
+        """Create a Song or Video object from one row of a library file
+
+           Row should be a dictionary keyed by the titles in FIELDS, as produced
+           by csv.DictReader. The media ID column may be missing. A ValueError is
+           raised for an unknown media type or a missing column.
+
+           Main Args:
+                row: Dictionary of field titles to cell strings
+        """
+        try:
+            media_type = row[Library.FIELDS[0]]
+            media_title = row[Library.FIELDS[1]]
+            media_format = row[Library.FIELDS[2]]
+            media_language = row[Library.FIELDS[3]]
+            play_length = int(row[Library.FIELDS[4]])
+            performer_names = row[Library.FIELDS[5]]
+            director_name = row[Library.FIELDS[6]]
+            actors = row[Library.FIELDS[7]]
+        except KeyError as error:
+            raise ValueError(f"Row has no {error} column") from None
+        # Files saved before media IDs were added have no ID column.
+        media_id = row.get(Library.FIELDS[8])
+        media_id = int(media_id) if media_id else None
+
+        if media_type == "Song":
+            performer_names = self.reformat_items(performer_names)
+            return Song(media_title, media_format, media_language,
+                        play_length, performer_names, media_id)
+
+        elif media_type == "Video":
+            actors = self.reformat_items(actors)
+            return Video(media_title, media_format, media_language,
+                         play_length, director_name, actors, media_id)
+
+        raise ValueError(f"Unknown media type: {media_type!r}")
+
+    def iter_items_from_file(self, file_name):
+        """Yield media objects from specified file one row at a time
+
+           Items are not added to the library collection, so callers can
+           consume a file of any size without holding it all in memory.
+
+           Main Args:
+                file_name: File where data will be loaded from
+        """
+        with open(file_name, "r", newline = "") as f:
+            reader = csv.DictReader(f)
+            self._check_header(file_name, reader.fieldnames)
+            for row in reader:
+                yield self.create_media_from_row(row)
+
+    @staticmethod
+    def _check_header(file_name, fieldnames):
+        """Raises ValueError if a library file's header is missing a column of FIELDS
+           other than the media ID, which files saved before media IDs were added lack.
+           An empty file has no header, and is read as a file of no items."""
+        if fieldnames is None:
+            return
+        missing = [field for field in Library.FIELDS[:8] if field not in fieldnames]
+        if missing:
+            raise ValueError(f"{file_name} has no {missing[0]!r} column; library files "
+                             f"start with the header {','.join(Library.FIELDS)}")
+
+    def iter_chunks_from_file(self, file_name, chunk_size = None):
+        """Yield lists of at most chunk_size media objects from specified file
+
+           Main Args:
+                file_name: File where data will be loaded from
+                chunk_size: Maximum number of items per chunk, CHUNK_SIZE if not given
+        """
+        chunk_size = chunk_size or Library.CHUNK_SIZE
+        items = self.iter_items_from_file(file_name)
+        chunk = list(islice(items, chunk_size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(items, chunk_size))
+
+    def read_items_from_file(self, file_name, chunk_size = None, progress = None, skip_duplicates = False):
         """Import Media from specified file and add to library collection
         
            File should be an existing specified file of correct format
-           & structure specified by guidelines. Function reads all items from
-           file row by row, generates relevant objects, and appends these to 
-           library collection.
+           & structure specified by guidelines. Function parses the file in
+           chunks, so memory used while parsing is bounded by the chunk size,
+           and adds each chunk to the library collection. If any row fails,
+           items added by this call are removed again before the error is raised.
+           Returns a dictionary with the number of items added and the number
+           skipped as duplicates.
 
            Main Args:
                 file_name: File where data will be loaded from
+                chunk_size: Number of items parsed before they are added, CHUNK_SIZE if not given
+                progress: Optional callable passed the running count of added items
+                skip_duplicates: Whether to skip items already in the library or earlier in the file
+        """
+        start_length = len(self._media_list)
+        duplicates = 0
+        try:
+            for chunk in self.iter_chunks_from_file(file_name, chunk_size):
+                duplicates += self.add_media_items(chunk, skip_duplicates)
+                if progress:
+                    progress(len(self._media_list) - start_length)
+        except Exception:
+            self.truncate(start_length)
+            raise
+        return {"added" : len(self._media_list) - start_length, "duplicates" : duplicates}
+
+    def iter_items_from_files(self, file_names, workers = None):
+        """Yield (file name, list of media objects) for several files, parsed in parallel
+
+           Files are parsed in worker processes using the same row logic as
+           read_items_from_file, and yielded in the order the files were given
+           (sorted by name for a directory), whichever worker finishes first.
+           Items are not added to the library collection.
+
+           Main Args:
+                file_names: Iterable of CSV files, or a directory of CSV files
+                workers: Number of worker processes, one per CPU if not given
+        """
+        if isinstance(file_names, (str, os.PathLike)):
+            directory = file_names
+            file_names = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                                if name.lower().endswith(".csv"))
+        file_names = list(file_names)
+
+        if workers == 1 or len(file_names) <= 1:
+            yield from zip(file_names, map(_read_items_in_worker, file_names))
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers = workers) as executor:
+                yield from zip(file_names, executor.map(_read_items_in_worker, file_names))
+
+    def read_items_from_files(self, file_names, workers = None, progress = None, skip_duplicates = False):
+        """Import Media from several files in parallel and add to library collection
+
+           Files are parsed by iter_items_from_files and added file by file, in
+           a deterministic order. If any file fails, items added by this call are
+           removed again before the error is raised. Returns a dictionary with the
+           number of items added and the number skipped as duplicates.
+
+           Main Args:
+                file_names: Iterable of CSV files, or a directory of CSV files
+                workers: Number of worker processes, one per CPU if not given
+                progress: Optional callable passed each file name and the running count of added items
+                skip_duplicates: Whether to skip items already in the library or in an earlier file
         """
-        with open(file_name, "r") as f:
-            input_file = csv.DictReader(f)
-            for row in input_file:
-
-                media_type = row[Library.FIELDS[0]]
-                media_title = row[Library.FIELDS[1]]
-                media_format = row[Library.FIELDS[2]]
-                media_language = row[Library.FIELDS[3]]
-                play_length = int(row[Library.FIELDS[4]])
-                performer_names = row[Library.FIELDS[5]]
-                director_name = row[Library.FIELDS[6]]
-                actors = row[Library.FIELDS[7]]
-                performer_names = self.reformat_items(performer_names)
-                actors = self.reformat_items(actors)
-
-                if media_type == "Song":
-                    media_object = Song(media_title, media_format, media_language, 
-                                        play_length, performer_names)
-                                        
-                elif media_type == "Video":
-                    media_object = Video(media_title, media_format, media_language, 
-                                         play_length, director_name, actors)
-
-                self.add_media(media_object)
-
-    def write_items_to_file(self, file_name):
+        start_length = len(self._media_list)
+        duplicates = 0
+        try:
+            for file_name, media_items in self.iter_items_from_files(file_names, workers):
+                duplicates += self.add_media_items(media_items, skip_duplicates)
+                if progress:
+                    progress(file_name, len(self._media_list) - start_length)
+        except Exception:
+            self.truncate(start_length)
+            raise
+        return {"added" : len(self._media_list) - start_length, "duplicates" : duplicates}
+
+    def write_items_to_file(self, file_name, media_items = None):
         """Write all items in library to specified file
         
-           File should be of CSV format. Function converts objects from
-           library collection to dictionary before saving down to CSV.
+           File should be of CSV format. Function streams each object from
+           library collection (or from media_items, if given) to a temporary
+           file in the same directory, using
+           large buffered writes, then fsyncs it and renames it over the target.
+           A crash part way through therefore never leaves a truncated file.
+           Returns a dictionary with the rows written, seconds taken and rows per second.
 
            Main Args:
                 file_name: File where data from library collection will be saved
+                media_items: Optional sequence of items to save instead of library collection
         """
-        objects = []
-        for obj in self._media_list:
-            object_dictionary = obj.to_dict()
-            objects.append(object_dictionary)
+        if media_items is None:
+            media_items = self._media_list
+        start_time = time.perf_counter()
+        directory = os.path.dirname(os.path.abspath(file_name))
+        file_descriptor, temp_name = tempfile.mkstemp(prefix = ".", suffix = ".tmp", dir = directory)
+        try:
+            with open(file_descriptor, "w", newline = "", buffering = Library.WRITE_BUFFER_SIZE) as f:
+                writer = csv.DictWriter(f, fieldnames = Library.FIELDS)
+                writer.writeheader()
+                writer.writerows(obj.to_dict() for obj in media_items)
+                f.flush()
+                os.fsync(f.fileno())
+            self._copy_file_mode(file_name, temp_name)
+            os.replace(temp_name, file_name)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+        self._fsync_directory(directory)
+
+        rows = len(media_items)
+        seconds = time.perf_counter() - start_time
+        return {"rows" : rows, "seconds" : seconds,
+                "rows_per_second" : rows / seconds if seconds else float(rows)}
+
+    @staticmethod
+    def _copy_file_mode(file_name, temp_name):
+        """Gives the temporary file the permissions of the file it replaces"""
+        try:
+            mode = stat.S_IMODE(os.stat(file_name).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(temp_name, mode)
 
-        with open(file_name, 'w') as f:
-            writer = csv.DictWriter(f, fieldnames = Library.FIELDS)
-            writer.writeheader()
-            for obj in objects:
-                writer.writerow(obj)
+    @staticmethod
+    def _fsync_directory(directory):
+        """Makes a rename within directory durable, where the platform allows it"""
+        try:
+            directory_descriptor = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(directory_descriptor)
+        except OSError:
+            pass
+        finally:
+            os.close(directory_descriptor)
 
     def get_all_media(self):
         """Return all media items"""
@@ -114,40 +1265,671 @@ class Library:
     def get_media_of_language(self, search_string):
         """Return media with specified language
 
-           This will search each object within library collection for specified
-           string under the language attribute and return all matching instances
+           This will look up the specified string in the language index and
+           return all matching instances, in library order
         
            Main Args:
                 search_string: String which will be searched for
         """
-        language_filter = [media for media in self._media_list 
-                          if media.get_media_language().lower() == search_string.lower()]
+        language_filter = list(self._language_index.get(search_string.casefold(), ()))
         return language_filter
 
     def get_media_of_format(self, search_string):
         """Return media with specified format
            
-           This will search each object within library collection for specified
-           string under the format attribute and return all matching instances
+           This will look up the specified string in the format index and
+           return all matching instances, in library order
         
            Main Args:
                 search_string: String which will be searched for
         """
-        format_filter = [media for media in self._media_list
-                        if media.get_media_format().lower() == search_string.lower()]
+        format_filter = list(self._format_index.get(search_string.casefold(), ()))
         return format_filter
+
+    def get_media_with_artist(self, name):
+        """Return all media featuring specified artist
+
+           This will look up the name in the artist index, which covers song
+           performers, video actors and video directors, and return all
+           matching instances in library order
+
+           Main Args:
+                name: Name of the performer, actor or director
+        """
+        artist_filter = list(self._artist_index.get(name.casefold(), ()))
+        return artist_filter
+
+    def media_has_artist(self, media, name):
+        """Returns a boolean value indicating whether passed name has any
+           involvement in a library media item, using the artist index
+
+           Main Args:
+                media: The Song or Video object to check
+                name: Name of the performer, actor or director
+        """
+        return media in self._artist_index.get(name.casefold(), ())
+
+    def query(self, media_type = None, language = None, media_format = None,
+              min_length = None, max_length = None, title = None, artist = None):
+        """Return media matching every given condition, in library order
+
+           Type, language, format and artist are matched exactly (ignoring case)
+           using their indexes, and a play length range using the sorted length
+           index, which can count the items in a range by bisecting. The smallest
+           of those candidate sets is used, and each candidate is checked against
+           the other conditions with a dict lookup or comparison, so the time
+           taken is proportional to the smallest set rather than the library.
+           Title is checked on the candidates, or on the whole library if it is
+           the only condition given.
+
+           Main Args:
+                media_type: "Song" or "Video"
+                language: Language to match
+                media_format: Format to match
+                min_length: Smallest play length to match
+                max_length: Largest play length to match
+                title: Text the title must contain (ignoring case)
+                artist: Performer, actor or director to match
+        """
+        buckets = []
+        for index, key in ((self._type_index, media_type), (self._language_index, language),
+                           (self._format_index, media_format), (self._artist_index, artist)):
+            if key is not None:
+                buckets.append(index.get(key.casefold(), {}))
+
+        length_index = self._sorted_indexes["length"]
+        has_range = min_length is not None or max_length is not None
+        if has_range and (not buckets or length_index.count_range(min_length, max_length) <
+                                          min(len(bucket) for bucket in buckets)):
+            # Items from the length index are in length order, so put them back in library order.
+            candidates = sorted(length_index.get_range(min_length, max_length), key = self._position_of)
+        elif buckets:
+            buckets.sort(key = len)
+            candidates, buckets = buckets[0], buckets[1:]
+        else:
+            candidates = self._media_list
+
+        conditions = [lambda media, bucket = bucket: media in bucket for bucket in buckets]
+        if min_length is not None:
+            conditions.append(lambda media: media.get_play_length() >= min_length)
+        if max_length is not None:
+            conditions.append(lambda media: media.get_play_length() <= max_length)
+        if title is not None:
+            title = title.casefold()
+            conditions.append(lambda media: title in media.get_media_title().casefold())
+        return [media for media in candidates if all(condition(media) for condition in conditions)]
     
-class PlayList:
+    def _position_of(self, media):
+        """Returns the position of a library media item in library collection"""
+        return self._media_list.position_of_key(media.get_media_id())
+
+    def sorted_media(self, field, descending = False):
+        """Return a view of all media sorted by a field
+
+           The view reads from a sorted index that is kept up to date as items
+           are added and removed, so it does not sort the library each time.
+           Items with equal values stay in library order (reversed if descending).
+
+           Main Args:
+                field: "length" to sort by play length, or "title" to sort by title ignoring case
+                descending: Whether to list the largest values first
+        """
+        if field not in self._sorted_indexes:
+            raise ValueError(f"Cannot sort by {field!r}")
+        return SortedMediaView(self._sorted_indexes[field], descending)
+
+    def get_media_in_length_range(self, min_length = None, max_length = None):
+        """Return media with a play length between min_length and max_length inclusive
+
+           The range is found by bisecting the sorted length index, and items
+           are returned shortest first.
+
+           Main Args:
+                min_length: Smallest play length to return, or None for no limit
+                max_length: Largest play length to return, or None for no limit
+        """
+        return self._sorted_indexes["length"].get_range(min_length, max_length)
+
+    def search(self, text, within = None, limit = None):
+        """Return media with a title or person's name containing a word starting
+           with each word of text, ignoring case
+
+           For example "bo rhap" finds "Bohemian Rhapsody". Matches are found in
+           the word index, whose size is the number of distinct words, so a search
+           takes time proportional to the matches rather than the library. Items
+           are grouped by the word they matched, alphabetically, and are in library
+           order within each group.
+
+           Main Args:
+                text: Words or the starts of words to search for
+                within: Optional earlier results to narrow down, when text extends
+                        the text they were found with
+                limit: Optional largest number of results, which are the first
+                       results a search without a limit would return
+        """
+        return self._word_index.search(text, within, limit)
+
+    def start_search_index(self):
+        """Starts building the word index on a worker thread, if it is not built
+
+           The first search then uses the finished index rather than building
+           it, unless items have been added or removed in the meantime.
+        """
+        self._word_index.build_in_background()
+
+    def get_longest_media(self, count, media_type = None):
+        """Return the count longest media items, longest first
+
+           Main Args:
+                count: Number of items to return
+                media_type: Optional "Song" or "Video" to only return that type
+        """
+        longest = self.sorted_media("length", descending = True)
+        if media_type is not None:
+            media_type = media_type.casefold()
+            longest = (media for media in longest if media.get_class_name().casefold() == media_type)
+        return list(islice(longest, count))
+
+def _read_items_in_worker(file_name):
+    """Returns a list of all media items in a file, for use in a worker process"""
+    return list(Library().iter_items_from_file(file_name))
+
+class LibraryJournal:
+    """Represents an append-only journal of changes made on top of a library snapshot
+
+       Changes to an attached library are kept in memory until save is called,
+       which appends them to the journal file. Loading reads the snapshot CSV, or
+       its memory-mapped binary copy, and replays the journal on top of it before
+       the items are added to a library, so each is indexed once. Once the journal grows past
+       COMPACT_THRESHOLD, it is folded into a new snapshot on a background thread.
+
+       The first line of the journal records the size and modification time of
+       the snapshot it applies to. A journal left behind by an interrupted
+       compaction no longer matches the new snapshot, and is ignored. Removals
+       are recorded by media ID, so replaying them does not depend on positions.
+       If the snapshot file is replaced after loading (e.g. by writing the library
+       over it), pending changes no longer apply to it, so save writes the whole
+       library as a new snapshot instead.
+
+       Attributes in constructor:
+            snapshot_name: The library CSV file the journal applies to (string)
+            journal_name: The journal file, snapshot_name + ".journal" by default (string)
+            compact_threshold: Journal size in bytes that triggers compaction (integer)
+            pending: Changes recorded since the last save (list)
+            loaded_token: Version of the snapshot file the library was loaded from,
+                          or None if load has not been called (string)
+       Class attribute:
+            FIELDS: Titles for journal columns, the operation and position followed by Library.FIELDS
+            COMPACT_THRESHOLD: Default journal size in bytes that triggers compaction
+    """
+
+    FIELDS = ('Operation', 'Position') + Library.FIELDS
+    COMPACT_THRESHOLD = 1 << 22
+
+    def __init__(self, snapshot_name, journal_name = None, compact_threshold = None):
+        self._snapshot_name = snapshot_name
+        self._journal_name = journal_name or snapshot_name + ".journal"
+        self._compact_threshold = compact_threshold or LibraryJournal.COMPACT_THRESHOLD
+        self._pending = []
+        self._lock = threading.Lock()
+        self._compaction = None
+        self._loaded_token = None
+
+    def record_add(self, media):
+        """Records that media item was appended to library collection"""
+        entry = media.to_dict()
+        entry[LibraryJournal.FIELDS[0]] = "add"
+        self._pending.append(entry)
+
+    def record_remove(self, media):
+        """Records that media item was removed from library collection, by its media ID"""
+        self._pending.append({LibraryJournal.FIELDS[0] : "remove",
+                              Library.FIELDS[8] : media.get_media_id()})
+
+    def record_truncate(self, length):
+        """Records that library collection was cut down to its first length items"""
+        self._pending.append({LibraryJournal.FIELDS[0] : "truncate",
+                              LibraryJournal.FIELDS[1] : length})
+
+    def _snapshot_token(self):
+        """Returns a string identifying the current version of the snapshot file"""
+        try:
+            snapshot_stat = os.stat(self._snapshot_name)
+        except FileNotFoundError:
+            return "missing"
+        return f"{snapshot_stat.st_size}:{snapshot_stat.st_mtime_ns}"
+
+    def load(self, library, write_binary = False):
+        """Reads the snapshot into library, then replays the journal on top of it
+
+           Library should not have a journal attached yet, so that replayed
+           changes are not recorded a second time. Returns the number of
+           journal entries replayed.
+
+           Main Args:
+                library: Library object to load items into
+                write_binary: Whether to write a binary copy of the snapshot next to it
+                              when there is no up to date one, to speed up the next load
+        """
+        media_items, replayed = self._read_items(write_binary)
+        library.add_media_items(media_items)
+        return replayed
+
+    def load_items(self, write_binary = False):
+        """Returns a list of the snapshot items with the journal replayed on top of them
+
+           Nothing is indexed, so the list can be built on a worker thread and
+           added to a library in batches, with each item indexed only once.
+           Every item keeps the media ID it had when the changes were recorded.
+
+           Main Args:
+                write_binary: Whether to write a binary copy of the snapshot next to it
+                              when there is no up to date one, to speed up the next load
+        """
+        return self._read_items(write_binary)[0]
+
+    def _read_items(self, write_binary):
+        """Returns (list of media items, number of journal entries replayed)
+
+           Items are kept in a dict by media ID while the journal is replayed, so
+           removals are O(1). Media IDs are given as Library.add_media gives them.
+        """
+        self._loaded_token = self._snapshot_token()
+        media_items = {}
+        next_media_id = 1
+        for media in self._read_snapshot(write_binary):
+            next_media_id = self._add_item(media_items, media, next_media_id)
+        replayed = self._replay_items(media_items, next_media_id)
+        return list(media_items.values()), replayed
+
+    @staticmethod
+    def _add_item(media_items, media, next_media_id):
+        """Adds media item to a dict by media ID, giving it a new ID if it has none
+           or its ID is taken, and returns the next free media ID"""
+        media_id = media.get_media_id()
+        if media_id is None or media_id in media_items:
+            media_id = next_media_id
+            media.set_media_id(media_id)
+        media_items[media_id] = media
+        return max(next_media_id, media_id + 1)
+
+    def _read_snapshot(self, write_binary):
+        """Returns the snapshot's media items, from its binary copy where that is up to date
+
+           The binary copy (snapshot_name + ".snap") is memory-mapped, which avoids
+           parsing the CSV. If it is missing or was written from a different version
+           of the CSV, the CSV is read, and a new binary copy is written if write_binary is set.
+
+           Every item is built from the binary copy in one bulk pass rather than on
+           access, as a library indexes each item's language, format, people and
+           media ID when it is added, so it needs all of them straight away.
+        """
+        from MediaSnapshot import MediaSnapshot, write_snapshot
+
+        if not os.path.exists(self._snapshot_name):
+            return []
+        token = self._snapshot_token()
+        binary_name = self._snapshot_name + ".snap"
+        try:
+            with MediaSnapshot(binary_name) as snapshot:
+                if snapshot.source_token == token:
+                    return list(snapshot)
+        except (OSError, ValueError):
+            pass
+
+        media_items = {}
+        next_media_id = 1
+        for media in Library().iter_items_from_file(self._snapshot_name):
+            next_media_id = self._add_item(media_items, media, next_media_id)
+        media_items = list(media_items.values())
+        if write_binary:
+            try:
+                write_snapshot(binary_name, media_items, token)
+            except OSError:
+                pass
+        return media_items
+
+    def _replay_items(self, media_items, next_media_id):
+        """Applies every journal entry to a dict of the snapshot items by media ID,
+           in the order they were recorded, and returns the number of entries applied"""
+        try:
+            f = open(self._journal_name, "r", newline = "")
+        except FileNotFoundError:
+            return 0
+
+        # Library is only used to parse the added rows.
+        reader = Library()
+        replayed = 0
+        with f:
+            if f.readline().rstrip("\r\n") != f"#snapshot {self._snapshot_token()}":
+                return 0
+            for entry in csv.DictReader(f):
+                operation = entry[LibraryJournal.FIELDS[0]]
+                if operation == "add":
+                    next_media_id = self._add_item(media_items, reader.create_media_from_row(entry),
+                                                   next_media_id)
+                elif operation == "remove" and entry.get(Library.FIELDS[8]):
+                    media_id = int(entry[Library.FIELDS[8]])
+                    if media_items.pop(media_id, None) is None:
+                        raise ValueError(f"Journal removes media ID {media_id}, which is not in the library")
+                elif operation == "remove":
+                    # Journals written before media IDs were added record positions.
+                    del media_items[list(media_items)[int(entry[LibraryJournal.FIELDS[1]])]]
+                elif operation == "truncate":
+                    for media_id in list(islice(media_items, int(entry[LibraryJournal.FIELDS[1]]), None)):
+                        del media_items[media_id]
+                else:
+                    raise ValueError(f"Unknown journal operation: {operation!r}")
+                replayed += 1
+        return replayed
+
+    def save(self, library):
+        """Appends pending changes to the journal file
+
+           The cost of saving is proportional to the changes made since the last
+           save, not to the size of library. If the journal is now larger than
+           the compaction threshold, compaction is started on a background thread.
+           Returns the number of entries written.
+
+           Main Args:
+                library: Library object the pending changes were recorded from
+        """
+        with self._lock:
+            entries = self._pending
+            self._pending = []
+            snapshot_token = self._snapshot_token()
+            if self._loaded_token is not None and snapshot_token != self._loaded_token:
+                # The snapshot was replaced since loading, so entries recorded against
+                # the old one cannot be appended. The whole library becomes the snapshot.
+                self._compact_locked(library, list(library.get_all_media()))
+                return len(entries)
+            token = f"#snapshot {snapshot_token}"
+            try:
+                with open(self._journal_name, "r", newline = "") as f:
+                    is_current = f.readline().rstrip("\r\n") == token
+                    has_current_fields = next(csv.reader(f), None) == list(LibraryJournal.FIELDS)
+            except FileNotFoundError:
+                is_current = has_current_fields = False
+
+            if is_current and not has_current_fields:
+                # Journal was written with older columns. It has already been replayed
+                # into library, so a new snapshot replaces it rather than appending.
+                self._compact_locked(library, list(library.get_all_media()))
+                return len(entries)
+
+            with open(self._journal_name, "a" if is_current else "w", newline = "") as f:
+                writer = csv.DictWriter(f, fieldnames = LibraryJournal.FIELDS)
+                if not is_current:
+                    f.write(token + "\n")
+                    writer.writeheader()
+                writer.writerows(entries)
+                f.flush()
+                os.fsync(f.fileno())
+
+            journal_size = os.path.getsize(self._journal_name)
+
+        if journal_size > self._compact_threshold:
+            self.start_compaction(library)
+        return len(entries)
+
+    def start_compaction(self, library):
+        """Starts folding the journal into a new snapshot on a background thread
+
+           The thread is not a daemon, so the process waits for compaction to
+           finish even if the window is closed straight after saving.
+
+           Main Args:
+                library: Library object whose saved state becomes the new snapshot
+        """
+        if self._compaction and self._compaction.is_alive():
+            return self._compaction
+        media_items = list(library.get_all_media())
+        self._compaction = threading.Thread(target = self.compact, args = (library, media_items),
+                                            name = "LibraryJournal compaction")
+        self._compaction.start()
+        return self._compaction
+
+    def compact(self, library, media_items):
+        """Writes media_items as the new snapshot and empties the journal
+
+           Media items should be the saved state of library, i.e. the snapshot
+           with every journal entry applied.
+
+           Main Args:
+                library: Library object used to write the snapshot
+                media_items: Items to write to the new snapshot
+        """
+        with self._lock:
+            self._compact_locked(library, media_items)
+
+    def _compact_locked(self, library, media_items):
+        """Writes the new snapshot and empties the journal, with the lock already held"""
+        library.write_items_to_file(self._snapshot_name, media_items)
+        self._loaded_token = self._snapshot_token()
+        with open(self._journal_name, "w", newline = "") as f:
+            f.write(f"#snapshot {self._loaded_token}\n")
+            csv.DictWriter(f, fieldnames = LibraryJournal.FIELDS).writeheader()
+            f.flush()
+            os.fsync(f.fileno())
+
+class _TreapNode:
+    """Represents one value in an OrderStatisticList, with the size and total weight of its subtree"""
+
+    __slots__ = ('value', 'weight', 'priority', 'left', 'right', 'size', 'total')
+
+    def __init__(self, value, weight):
+        self.value = value
+        self.weight = weight
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.size = 1
+        self.total = weight
+
+    def update(self):
+        """Recalculates the subtree size and total weight from the node's children"""
+        self.size = 1
+        self.total = self.weight
+        if self.left:
+            self.size += self.left.size
+            self.total += self.left.total
+        if self.right:
+            self.size += self.right.size
+            self.total += self.right.total
+
+class OrderStatisticList(MutableSequence):
+    """Represents a list stored as a balanced tree (an implicit treap)
+
+       Each node records the size of its subtree, so the node at any position
+       can be found by descending from the root. Looking up, inserting and
+       removing at any position therefore take O(log n) time, where a Python
+       list takes O(n) to insert or pop anywhere but the end.
+
+       If a weight function is given, each node also records the total weight
+       of its subtree. The total weight is then available in O(1), and prefix
+       sums and the position covering a given weight offset in O(log n).
+
+       Attributes in constructor:
+            values: Optional iterable of initial values
+            weight: Optional callable returning the weight of a value (number)
+    """
+
+    def __init__(self, values = (), weight = None):
+        self._root = None
+        self._weight = weight
+        for value in values:
+            self.append(value)
+
+    @staticmethod
+    def _split(node, count):
+        """Splits a subtree into its first count values and the rest"""
+        if node is None:
+            return None, None
+        left_size = node.left.size if node.left else 0
+        if count <= left_size:
+            left, node.left = OrderStatisticList._split(node.left, count)
+            node.update()
+            return left, node
+        node.right, right = OrderStatisticList._split(node.right, count - left_size - 1)
+        node.update()
+        return node, right
+
+    @staticmethod
+    def _merge(left, right):
+        """Joins two subtrees, with every value of left before every value of right"""
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = OrderStatisticList._merge(left.right, right)
+            left.update()
+            return left
+        right.left = OrderStatisticList._merge(left, right.left)
+        right.update()
+        return right
+
+    def _position(self, position):
+        """Returns a non-negative position, raising IndexError if it is out of range"""
+        length = len(self)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("list index out of range")
+        return position
+
+    def _node_at(self, position):
+        """Returns the node holding the value at position"""
+        position = self._position(position)
+        node = self._root
+        while True:
+            left_size = node.left.size if node.left else 0
+            if position < left_size:
+                node = node.left
+            elif position == left_size:
+                return node
+            else:
+                position -= left_size + 1
+                node = node.right
+
+    def __len__(self):
+        return self._root.size if self._root else 0
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        return self._node_at(position).value
+
+    def __setitem__(self, position, value):
+        if isinstance(position, slice):
+            raise TypeError("OrderStatisticList does not support slice assignment")
+        position = self._position(position)
+        del self[position]
+        self.insert(position, value)
+
+    def __delitem__(self, position):
+        if isinstance(position, slice):
+            for index in sorted(range(*position.indices(len(self))), reverse = True):
+                del self[index]
+            return
+        position = self._position(position)
+        left, rest = self._split(self._root, position)
+        _, right = self._split(rest, 1)
+        self._root = self._merge(left, right)
+
+    def insert(self, position, value):
+        """Inserts value before position, as list.insert does"""
+        length = len(self)
+        if position < 0:
+            position = max(0, position + length)
+        position = min(position, length)
+        left, right = self._split(self._root, position)
+        node = _TreapNode(value, self._weight(value) if self._weight else 0)
+        self._root = self._merge(self._merge(left, node), right)
+
+    def total_weight(self):
+        """Returns the sum of the weights of all values"""
+        return self._root.total if self._root else 0
+
+    def weight_before(self, position):
+        """Returns the sum of the weights of the values before position
+
+           Main Args:
+                position: Index of a value, or the length of the list for the total weight
+        """
+        if position == len(self):
+            return self.total_weight()
+        position = self._position(position)
+        node = self._root
+        total = 0
+        while True:
+            left_size = node.left.size if node.left else 0
+            if position < left_size:
+                node = node.left
+                continue
+            total += node.left.total if node.left else 0
+            if position == left_size:
+                return total
+            total += node.weight
+            position -= left_size + 1
+            node = node.right
+
+    def position_at_weight(self, offset):
+        """Returns the position of the value covering a weight offset
+
+           The value at position p covers offsets from weight_before(p) up to,
+           but not including, weight_before(p + 1). Returns None if offset is
+           negative or not less than the total weight.
+
+           Main Args:
+                offset: Weight offset from the start of the list
+        """
+        if offset < 0 or offset >= self.total_weight():
+            return None
+        node = self._root
+        position = 0
+        while True:
+            left_total = node.left.total if node.left else 0
+            if offset < left_total:
+                node = node.left
+                continue
+            left_size = node.left.size if node.left else 0
+            offset -= left_total
+            if offset < node.weight:
+                return position + left_size
+            offset -= node.weight
+            position += left_size + 1
+            node = node.right
+
+    def __iter__(self):
+        stack = []
+        node = self._root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.value
+            node = node.right
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+class PlayList(ChangeNotifier):
     """Represents a playlist to store video and song items
 
-       This class includes a collection to store song objects
+       This class includes a collection to store song objects. Subscribers are
+       told about every song added, moved or removed.
 
        Attributes in constructor:
-            play_list: An ordered collection type (list) to store all song objects
+            play_list: An ordered collection (OrderStatisticList) to store all song objects,
+                       so songs can be looked up, moved and removed by position in O(log n).
+                       It is weighted by play length, which keeps the runtime up to date.
     """
     
     def __init__(self):
-        self._play_list = []
+        super().__init__()
+        self._play_list = OrderStatisticList(weight = MediaItem.get_play_length)
 
     def get_all_media(self):
         """Return all media items from playlist"""
@@ -156,13 +1938,31 @@ class PlayList:
     def get_playlist_runtime(self):
         """Returns full runtime of playlist collection
 
-           Function sums the length attribute of all song objects
-           within the playlist collection
+           The playlist collection keeps the sum of the length attribute of
+           all song objects up to date as songs are added, moved and removed,
+           so this does not need to visit every song
+        """
+        return self._play_list.total_weight()
+
+    def get_song_start_time(self, index):
+        """Returns the number of seconds into the playlist at which a song starts
+
+           Argument should be of type integer and within the bounds of the playlist collection
+
+           Main Args:
+                index: Position of the song in playlist collection
         """
-        play_list_runtime = 0
-        for song in self._play_list:
-            play_list_runtime += song._play_length
-        return play_list_runtime
+        return self._play_list.weight_before(index)
+
+    def get_song_at_time(self, offset):
+        """Returns the position of the song playing at a given number of seconds into the playlist
+
+           Returns None if offset is before the start or at or after the end of the playlist.
+
+           Main Args:
+                offset: Seconds from the start of the playlist
+        """
+        return self._play_list.position_at_weight(offset)
     
     def add_song(self, media):
         """Add media item to playlist collection
@@ -174,6 +1974,7 @@ class PlayList:
                 media: song object intialised through the Song class
         """
         self._play_list.append(media)
+        self._notify("inserted", len(self._play_list) - 1, media)
 
     def move_song(self, from_position, to_position):
         """Move song at given position to new position in playlist collection
@@ -185,6 +1986,7 @@ class PlayList:
                 to_position: Index in playlist collection where item should be inserted
         """
         self._play_list.insert(to_position, self._play_list.pop(from_position))
+        self._notify("moved", from_position, to_position)
 
     def remove_song(self, index):
         """Remove media item from playlist collection
@@ -194,7 +1996,10 @@ class PlayList:
            Main Args:
                 index: Item at this index in playlist collection will be removed from collection
         """
-        self._play_list.pop(index)
+        removed_song = self._play_list.pop(index)
+        if index < 0:
+            index += len(self._play_list) + 1
+        self._notify("removed", index, removed_song)
     
 class MediaItem:
     """Represents a media item (Song or Video)
@@ -205,15 +2010,23 @@ class MediaItem:
             media_language: The format of media language (string) e.g. French, English
             play_length: The format of media length (integer)
             director_name: The director of the media item (string)
-            actors: The actors within the media item (list)
-            performer_names: The performers within the media item (list)
+            actors: The actors within the media item (tuple or list)
+            performer_names: The performers within the media item (tuple or list)
+
+            media_id: The ID given to the item by a library, or None (integer)
+
+       Media items use __slots__ rather than a per-instance __dict__, as a library
+       can hold millions of them.
     """
 
-    def __init__(self, media_title, media_format, media_language, play_length):
+    __slots__ = ('_media_title', '_media_format', '_media_language', '_play_length', '_media_id')
+
+    def __init__(self, media_title, media_format, media_language, play_length, media_id = None):
         self._media_title = media_title
         self._media_format = media_format
         self._media_language = media_language
         self._play_length = play_length
+        self._media_id = media_id
     
     def get_media_with_artist(self, name):
         """Returns a boolean value indicating whether passed name has any involvement
@@ -222,6 +2035,13 @@ class MediaItem:
            What fields will be searched is dependent on object type
         """
         return False
+
+    def get_people(self):
+        """Returns the names of everyone involved in the media item
+
+           What fields are returned is dependent on object type
+        """
+        return ()
     
     def get_media_title(self):
         """Returns media title"""
@@ -239,10 +2059,43 @@ class MediaItem:
         """Returns media length"""
         return self._play_length
 
+    def get_media_id(self):
+        """Returns media ID, or None if the item has not been added to a library"""
+        return self._media_id
+
+    def set_media_id(self, media_id):
+        """Sets media ID. This is called by Library when the item is added"""
+        self._media_id = media_id
+
     def get_class_name(self):
         """Returns the name of current class"""
         return self.__class__.__name__ 
 
+    def intern_values(self, intern_pool):
+        """Replaces repeated values with the shared copies in a library's InternPool
+
+           What fields are shared is dependent on object type
+        """
+        self._media_format = intern_pool.string(self._media_format)
+        self._media_language = intern_pool.string(self._media_language)
+
+    def _fingerprint_fields(self):
+        """Returns the canonical fields that identify the item's content
+
+           Text is compared ignoring case and surrounding spaces, and people in any order.
+        """
+        return (self.__class__.__name__, self._media_title.strip().casefold(),
+                self._media_format.strip().casefold(), self._media_language.strip().casefold(),
+                self._play_length, sorted(name.strip().casefold() for name in self.get_people()))
+
+    def get_fingerprint(self):
+        """Returns a 16 byte hash of the item's content, used to find duplicate items
+
+           Items with the same title, format, language, play length and people have
+           the same fingerprint, whatever their media ID.
+        """
+        return hashlib.blake2b(repr(self._fingerprint_fields()).encode(), digest_size = 16).digest()
+
     def to_dict(self):
         """Returns an attributes dictionary
 
@@ -253,7 +2106,8 @@ class MediaItem:
                 Library.FIELDS[1] : self._media_title, 
                 Library.FIELDS[2] : self._media_format, 
                 Library.FIELDS[3] : self._media_language, 
-                Library.FIELDS[4] : self._play_length}
+                Library.FIELDS[4] : self._play_length,
+                Library.FIELDS[8] : self._media_id}
 
     def __str__(self):
         return (f"Title: {self._media_title}\n"
@@ -266,11 +2120,14 @@ class Video(MediaItem):
 
        Attributes in constructor:
             director_name: The director of the media item (string)
-            actors: The actors within the media item (list)
+            actors: The actors within the media item (tuple or list)
     """
 
-    def __init__(self, media_title, media_format, media_language, play_length, director_name, actors):
-        super().__init__(media_title, media_format, media_language, play_length)    
+    __slots__ = ('_director_name', '_actors')
+
+    def __init__(self, media_title, media_format, media_language, play_length, director_name, actors,
+                 media_id = None):
+        super().__init__(media_title, media_format, media_language, play_length, media_id)
         self._director_name = director_name
         self._actors = actors
 
@@ -286,34 +2143,55 @@ class Video(MediaItem):
             return True
         return False
 
+    def get_people(self):
+        """Returns the actors followed by the director"""
+        return (*self._actors, self._director_name)
+
     def get_director_name(self):
         """Returns director name"""
         return self._director_name
 
+    def intern_values(self, intern_pool):
+        """Replaces the format, language, director and actors with shared copies"""
+        super().intern_values(intern_pool)
+        self._director_name = intern_pool.string(self._director_name)
+        self._actors = intern_pool.names(self._actors)
+
+    def _fingerprint_fields(self):
+        """Returns the canonical fields that identify the item's content, including who directed it"""
+        return (*super()._fingerprint_fields(), self._director_name.strip().casefold())
+
     def get_actors(self):
         """Returns actors"""
         return self._actors
 
+    def __reduce__(self):
+        return (Video, (self._media_title, self._media_format, self._media_language,
+                        self._play_length, self._director_name, self._actors, self._media_id))
+
     def to_dict(self):
         master_dict = super().to_dict()
         master_dict.update({Library.FIELDS[6] : self._director_name, 
-                            Library.FIELDS[7] : self._actors})
+                            Library.FIELDS[7] : _list_cell(self._actors)})
         return master_dict
 
     def __str__(self):
         return (f"{super().__str__()}"
                 f"Director: {self._director_name}\n"
-                f"Actors: {self._actors}\n")
+                f"Actors: {_list_cell(self._actors)}\n")
     
 class Song(MediaItem):
     """Represents a Song item
 
        Attributes in constructor:
-                performer_names: The performers within the media item (list)
+                performer_names: The performers within the media item (tuple or list)
     """
-    
-    def __init__(self, media_title, media_format, media_language, play_length, performer_names):
-        super().__init__(media_title, media_format, media_language, play_length)
+
+    __slots__ = ('_performer_names',)
+
+    def __init__(self, media_title, media_format, media_language, play_length, performer_names,
+                 media_id = None):
+        super().__init__(media_title, media_format, media_language, play_length, media_id)
         self._performer_names = performer_names
 
     def get_media_with_artist(self, name):
@@ -327,15 +2205,28 @@ class Song(MediaItem):
             return True
         return False
     
+    def get_people(self):
+        """Returns performer names"""
+        return tuple(self._performer_names)
+
     def get_performer_names(self):
         """Returns performer names"""
         return self._performer_names
+
+    def intern_values(self, intern_pool):
+        """Replaces the format, language and performers with shared copies"""
+        super().intern_values(intern_pool)
+        self._performer_names = intern_pool.names(self._performer_names)
     
+    def __reduce__(self):
+        return (Song, (self._media_title, self._media_format, self._media_language,
+                       self._play_length, self._performer_names, self._media_id))
+
     def to_dict(self):
         master_dict = super().to_dict()
-        master_dict.update({Library.FIELDS[5] : self._performer_names})
+        master_dict.update({Library.FIELDS[5] : _list_cell(self._performer_names)})
         return master_dict
 
     def __str__(self):
         return (f"{super().__str__()}"
-                f"Performers: {self._performer_names}\n")
+                f"Performers: {_list_cell(self._performer_names)}\n")
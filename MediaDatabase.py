@@ -0,0 +1,547 @@
+import sqlite3
+
+import re
+
+import sys
+
+from collections.abc import Sequence
+
+from itertools import islice
+
+from MediaClasses import Library
+
+class SQLiteMediaSequence(Sequence):
+    """Represents a lazily loaded, read-only view of media rows in the database
+
+       Items are fetched a page at a time and cached until the library changes,
+       so large libraries are never loaded into memory all at once. Rows are
+       sorted by an optional sort column and then by id. Once a page has been
+       loaded, the next one is found from the sort key of its last row (keyset
+       paging), so walking through the view does not make SQLite step over
+       every earlier row again for each page. Iterating streams from one query.
+
+       Attributes in constructor:
+            library: The SQLiteLibrary object the rows belong to
+            where: Optional SQL condition selecting which rows are in the view (string)
+            parameters: Parameters for the SQL condition (tuple)
+            sort_column: Column (with any COLLATE clause) sorted by before id, or None (string)
+            descending: Whether rows are sorted largest first (boolean)
+            pages: Page number mapped to the cached items on that page (dict)
+            page_ends: Page number mapped to the sort key of its last row (dict)
+    """
+
+    def __init__(self, library, where = "", parameters = (), sort_column = None, descending = False):
+        self._library = library
+        self._where = where
+        self._parameters = tuple(parameters)
+        direction = "DESC" if descending else "ASC"
+        self._sort_column = sort_column
+        self._order = f"{sort_column} {direction}, id {direction}" if sort_column else f"id {direction}"
+        self._after = "<" if descending else ">"
+        # The sort column's value is selected after the item's columns, as the
+        # last key needed to find the next page. The id is already in COLUMNS.
+        self._select = f"SELECT {SQLiteLibrary.COLUMNS}"
+        if sort_column:
+            self._select += f", {sort_column.split()[0]}"
+        self._version = None
+        self._length = None
+        self._pages = {}
+        self._page_ends = {}
+
+    def _check_version(self):
+        """Drops cached pages and length if library has changed since they were loaded"""
+        if self._version != self._library._version:
+            self._version = self._library._version
+            self._length = None
+            self._pages.clear()
+            self._page_ends.clear()
+
+    def _where_clause(self, after_key = None):
+        """Returns the WHERE clause and its parameters, optionally only for rows after a sort key"""
+        conditions = [self._where] if self._where else []
+        parameters = self._parameters
+        if after_key is not None and self._sort_column:
+            # Written as (column, id) > (value, id) expanded, with any collation on the
+            # parameters, so that SQLite can search the column's index for the range.
+            column, _, collation = self._sort_column.partition(" ")
+            after = self._after
+            conditions.append(f"{column} {after}= ? {collation} AND "
+                              f"({column} {after} ? {collation} OR id {after} ?)")
+            parameters += (after_key[0], after_key[0], after_key[1])
+        elif after_key is not None:
+            conditions.append(f"id {self._after} ?")
+            parameters += after_key
+        if not conditions:
+            return "", parameters
+        return "WHERE " + " AND ".join(f"({condition})" for condition in conditions), parameters
+
+    def _query(self, after_key = None):
+        """Returns the SELECT statement and parameters for rows after a sort key, in order"""
+        where, parameters = self._where_clause(after_key)
+        return f"{self._select} FROM media {where} ORDER BY {self._order}", parameters
+
+    def _row_key(self, record):
+        """Returns the sort key (sort column value, then id) of a selected record"""
+        media_id = record[len(Library.FIELDS) - 1]
+        return (record[-1], media_id) if self._sort_column else (media_id,)
+
+    def _media_from_record(self, record):
+        return self._library._media_from_record(record[:len(Library.FIELDS)])
+
+    def __len__(self):
+        self._check_version()
+        if self._length is None:
+            where, parameters = self._where_clause()
+            self._length = self._library._connection.execute(f"SELECT COUNT(*) FROM media {where}",
+                                                             parameters).fetchone()[0]
+        return self._length
+
+    def _get_page(self, page_number):
+        """Returns the media items on a page, loading the page if needed"""
+        self._check_version()
+        page = self._pages.get(page_number)
+        if page is None:
+            if len(self._pages) >= SQLiteLibrary.CACHED_PAGES:
+                del self._pages[next(iter(self._pages))]
+            page_size = SQLiteLibrary.PAGE_SIZE
+            after_key = self._page_ends.get(page_number - 1)
+            if page_number == 0 or after_key is not None:
+                query, parameters = self._query(after_key)
+                records = self._library._connection.execute(f"{query} LIMIT ?", parameters + (page_size,))
+            else:
+                # Jumping to a page with no loaded page before it needs an offset once.
+                query, parameters = self._query()
+                records = self._library._connection.execute(f"{query} LIMIT ? OFFSET ?",
+                                                            parameters + (page_size, page_number * page_size))
+            records = records.fetchall()
+            if records:
+                self._page_ends[page_number] = self._row_key(records[-1])
+            page = [self._media_from_record(record) for record in records]
+            self._pages[page_number] = page
+        return page
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("media position out of range")
+        page_number, offset = divmod(position, SQLiteLibrary.PAGE_SIZE)
+        return self._get_page(page_number)[offset]
+
+    def __iter__(self):
+        query, parameters = self._query()
+        records = self._library._connection.execute(query, parameters)
+        while True:
+            page = records.fetchmany(SQLiteLibrary.PAGE_SIZE)
+            if not page:
+                return
+            for record in page:
+                yield self._media_from_record(record)
+
+class SQLiteLibrary(Library):
+    """Represents a library stored in a local SQLite database
+
+       This class has the same public methods as Library. Language, format and
+       artist queries are answered by indexed SQL, and items are loaded lazily
+       a page at a time. Changes are written to the database straight away.
+       Each item's media ID is its row id, so library order is media ID order
+       and items are always given a new media ID when they are added.
+
+       Attributes in constructor:
+            database_name: The SQLite database file, or ":memory:" (string)
+            connection: Open connection to the database
+            version: Counter increased on every change, used to invalidate cached pages (integer)
+       Class attribute:
+            PAGE_SIZE: Number of items loaded per page
+            CACHED_PAGES: Number of pages each view keeps in memory
+            COLUMNS: Columns selected to build media items, in Library.FIELDS order
+            SCHEMA: Tables and indexes created in a new database
+            SORT_COLUMNS: Field name mapped to the column (and collation) that sorts by it
+    """
+
+    PAGE_SIZE = 500
+    CACHED_PAGES = 8
+    COLUMNS = ("type, title, format, language, play_length, "
+               "performer_names, director_name, actors, id")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS media (
+            id INTEGER PRIMARY KEY,
+            type TEXT NOT NULL,
+            title TEXT NOT NULL,
+            format TEXT NOT NULL,
+            language TEXT NOT NULL,
+            play_length INTEGER NOT NULL,
+            performer_names TEXT,
+            director_name TEXT,
+            actors TEXT,
+            format_key TEXT NOT NULL,
+            language_key TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS media_format ON media (format_key, id);
+        CREATE INDEX IF NOT EXISTS media_language ON media (language_key, id);
+        CREATE INDEX IF NOT EXISTS media_play_length ON media (play_length, id);
+        CREATE INDEX IF NOT EXISTS media_title ON media (title COLLATE NOCASE, id);
+        CREATE TABLE IF NOT EXISTS media_artist (
+            artist_key TEXT NOT NULL,
+            media_id INTEGER NOT NULL REFERENCES media (id) ON DELETE CASCADE,
+            PRIMARY KEY (artist_key, media_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS media_artist_media ON media_artist (media_id);
+    """
+
+    SORT_COLUMNS = {"length" : "play_length", "title" : "title COLLATE NOCASE"}
+
+    def __init__(self, database_name = ":memory:"):
+        super().__init__()
+        self._database_name = database_name
+        self._connection = sqlite3.connect(database_name)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(SQLiteLibrary.SCHEMA)
+        self._version = 0
+        self._media_list = SQLiteMediaSequence(self)
+
+    def close(self):
+        """Closes the database connection"""
+        self._connection.close()
+
+    def _changed(self):
+        """Invalidates cached pages after a change to the database"""
+        self._version += 1
+
+    def _media_from_record(self, record):
+        """Creates a media object from a database row selected with COLUMNS"""
+        return self.create_media_from_row(dict(zip(Library.FIELDS, record)))
+
+    def _insert_media(self, media_items):
+        """Inserts media items and their artist index rows, without committing
+
+           Each item is given its new row id as its media ID.
+        """
+        cursor = self._connection.cursor()
+        for media in media_items:
+            values = media.to_dict()
+            record = [values.get(field) for field in Library.FIELDS[:8]]
+            for column in (5, 7):
+                if record[column] is not None:
+                    record[column] = str(record[column])
+            cursor.execute("INSERT INTO media (type, title, format, language, play_length, "
+                           "performer_names, director_name, actors, format_key, language_key) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           record + [media.get_media_format().casefold(),
+                                     media.get_media_language().casefold()])
+            media_id = cursor.lastrowid
+            media.set_media_id(media_id)
+            artists = {name.casefold() for name in media.get_people() if name}
+            cursor.executemany("INSERT INTO media_artist (artist_key, media_id) VALUES (?, ?)",
+                               ((artist, media_id) for artist in artists))
+
+    def add_media(self, media):
+        """Adds media item to the database.
+
+           Main Args:
+                media: The Song or Video object to be added.
+        """
+        with self._connection:
+            self._insert_media((media,))
+        self._changed()
+        self._count_fingerprint(media, 1)
+        self._notify("inserted", len(self._media_list) - 1, media)
+
+    def add_media_items(self, media_items, skip_duplicates = False):
+        """Adds several media items to the database in one transaction.
+
+           Returns the number of items skipped as duplicates. Fingerprints are
+           counted from the whole database the first time duplicates are checked for.
+
+           Main Args:
+                media_items: Iterable of Song or Video objects to be added.
+                skip_duplicates: Whether to skip items with the same fingerprint as
+                                 an item already in the database, or earlier in media_items
+        """
+        media_items, duplicates = self._unique_items(media_items, skip_duplicates)
+        if media_items:
+            with self._connection:
+                self._insert_media(media_items)
+            self._changed()
+            self._notify("bulk_loaded")
+        return duplicates
+
+    def _row_id_at(self, position):
+        """Returns the row id of the item at position in library order"""
+        if position < 0:
+            position += len(self._media_list)
+        record = None
+        if position >= 0:
+            record = self._connection.execute("SELECT id FROM media ORDER BY id LIMIT 1 OFFSET ?",
+                                              (position,)).fetchone()
+        if record is None:
+            raise IndexError("media position out of range")
+        return record[0]
+
+    def remove_media(self, position):
+        """Remove item from the database
+
+           Main Args:
+                position: The index in library order to remove item from
+        """
+        if position < 0:
+            position += len(self._media_list)
+        removed_item = self._media_list[position]
+        with self._connection:
+            self._connection.execute("DELETE FROM media WHERE id = ?", (removed_item.get_media_id(),))
+        self._changed()
+        self._count_fingerprint(removed_item, -1)
+        self._notify("removed", position, removed_item)
+        return removed_item
+
+    def remove_media_by_id(self, media_id):
+        """Remove the item with a media ID from the database
+
+           A KeyError is raised if no item has the media ID.
+
+           Main Args:
+                media_id: The media ID of the item to remove
+        """
+        removed_item = self.get_media_by_id(media_id)
+        if removed_item is None:
+            raise KeyError(media_id)
+        position = self._connection.execute("SELECT COUNT(*) FROM media WHERE id < ?",
+                                            (media_id,)).fetchone()[0]
+        with self._connection:
+            self._connection.execute("DELETE FROM media WHERE id = ?", (media_id,))
+        self._changed()
+        self._count_fingerprint(removed_item, -1)
+        self._notify("removed", position, removed_item)
+        return removed_item
+
+    def get_media_by_id(self, media_id):
+        """Return the item with a media ID, or None if there is none
+
+           Main Args:
+                media_id: The media ID of the item
+        """
+        record = self._connection.execute(f"SELECT {SQLiteLibrary.COLUMNS} FROM media WHERE id = ?",
+                                          (media_id,)).fetchone()
+        return self._media_from_record(record) if record else None
+
+    def truncate(self, length):
+        """Removes every item after the first length items in library order
+
+           Main Args:
+                length: Number of items to keep
+        """
+        if length >= len(self._media_list):
+            return
+        with self._connection:
+            if length == 0:
+                self._connection.execute("DELETE FROM media")
+            else:
+                last_row_id = self._row_id_at(length - 1)
+                self._connection.execute("DELETE FROM media WHERE id > ?", (last_row_id,))
+        self._changed()
+        self._fingerprints = None
+        self._notify("bulk_loaded")
+
+    def read_items_from_file(self, file_name, chunk_size = None, progress = None, skip_duplicates = False):
+        """Import Media from specified file into the database
+
+           Each chunk is inserted in its own transaction. If any row fails,
+           rows added by this call are deleted before the error is raised.
+           Returns a dictionary with the number of items added and the number
+           skipped as duplicates.
+
+           Main Args:
+                file_name: File where data will be loaded from
+                chunk_size: Number of items per transaction, CHUNK_SIZE if not given
+                progress: Optional callable passed the running count of added items
+                skip_duplicates: Whether to skip items already in the database or earlier in the file
+        """
+        start_length = len(self._media_list)
+        added = 0
+        duplicates = 0
+        try:
+            for chunk in self.iter_chunks_from_file(file_name, chunk_size):
+                skipped = self.add_media_items(chunk, skip_duplicates)
+                added += len(chunk) - skipped
+                duplicates += skipped
+                if progress:
+                    progress(added)
+        except Exception:
+            self.truncate(start_length)
+            raise
+        return {"added" : added, "duplicates" : duplicates}
+
+    def get_media_of_language(self, search_string):
+        """Return media with specified language, using the language index
+
+           Main Args:
+                search_string: String which will be searched for
+        """
+        return SQLiteMediaSequence(self, "language_key = ?", (search_string.casefold(),))
+
+    def get_media_of_format(self, search_string):
+        """Return media with specified format, using the format index
+
+           Main Args:
+                search_string: String which will be searched for
+        """
+        return SQLiteMediaSequence(self, "format_key = ?", (search_string.casefold(),))
+
+    def get_media_with_artist(self, name):
+        """Return all media featuring specified artist, using the artist index
+
+           Main Args:
+                name: Name of the performer, actor or director
+        """
+        return SQLiteMediaSequence(self, "id IN (SELECT media_id FROM media_artist "
+                                         "WHERE artist_key = ?)", (name.casefold(),))
+
+    def query(self, media_type = None, language = None, media_format = None,
+              min_length = None, max_length = None, title = None, artist = None):
+        """Return media matching every given condition, using SQL
+
+           The conditions are combined into one WHERE clause, and SQLite chooses
+           which index to start from. Title matching uses LIKE, which ignores
+           case for ASCII letters only.
+
+           Main Args:
+                media_type: "Song" or "Video"
+                language: Language to match
+                media_format: Format to match
+                min_length: Smallest play length to match
+                max_length: Largest play length to match
+                title: Text the title must contain
+                artist: Performer, actor or director to match
+        """
+        conditions = []
+        parameters = []
+        for condition, value in (("type = ?", media_type and media_type.capitalize()),
+                                 ("language_key = ?", language and language.casefold()),
+                                 ("format_key = ?", media_format and media_format.casefold()),
+                                 ("play_length >= ?", min_length),
+                                 ("play_length <= ?", max_length),
+                                 ("id IN (SELECT media_id FROM media_artist WHERE artist_key = ?)",
+                                  artist and artist.casefold())):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        if title is not None:
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            parameters.append(f"%{_escape_like(title)}%")
+        return SQLiteMediaSequence(self, " AND ".join(conditions), parameters)
+
+    def search(self, text, within = None, limit = None):
+        """Return media with a title or person's name containing a word starting
+           with each word of text, using SQL
+
+           Words are only recognised after spaces, and LIKE ignores case for ASCII
+           letters only, so results can differ slightly from Library.search. This
+           scans the table; within is accepted for compatibility and ignored.
+           With a limit, only the pages holding the first results are read.
+
+           Main Args:
+                text: Words or the starts of words to search for
+                within: Ignored
+                limit: Optional largest number of results
+        """
+        tokens = re.findall(r"\w+", text.casefold())
+        if not tokens:
+            return []
+        conditions = []
+        parameters = []
+        for token in tokens:
+            conditions.append("(title LIKE ? ESCAPE '\\' OR title LIKE ? ESCAPE '\\' OR id IN "
+                              "(SELECT media_id FROM media_artist WHERE artist_key LIKE ? ESCAPE '\\' "
+                              "OR artist_key LIKE ? ESCAPE '\\'))")
+            token = _escape_like(token)
+            parameters.extend((f"{token}%", f"% {token}%") * 2)
+        results = SQLiteMediaSequence(self, " AND ".join(conditions), parameters)
+        return results if limit is None else list(islice(results, limit))
+
+    def start_search_index(self):
+        """Does nothing, as searches are answered by SQL rather than a word index"""
+
+    def sorted_media(self, field, descending = False):
+        """Return a lazily loaded view of all media sorted by a field, using its index
+
+           Main Args:
+                field: "length" to sort by play length, or "title" to sort by title ignoring case
+                descending: Whether to list the largest values first
+        """
+        if field not in SQLiteLibrary.SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {field!r}")
+        return SQLiteMediaSequence(self, sort_column = SQLiteLibrary.SORT_COLUMNS[field], descending = descending)
+
+    def get_media_in_length_range(self, min_length = None, max_length = None):
+        """Return media with a play length between min_length and max_length inclusive,
+           shortest first, using the play length index
+
+           Main Args:
+                min_length: Smallest play length to return, or None for no limit
+                max_length: Largest play length to return, or None for no limit
+        """
+        conditions = []
+        parameters = []
+        for condition, value in (("play_length >= ?", min_length), ("play_length <= ?", max_length)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        return SQLiteMediaSequence(self, " AND ".join(conditions), parameters,
+                                   SQLiteLibrary.SORT_COLUMNS["length"])
+
+    def get_longest_media(self, count, media_type = None):
+        """Return the count longest media items, longest first
+
+           Main Args:
+                count: Number of items to return
+                media_type: Optional "Song" or "Video" to only return that type
+        """
+        where, parameters = ("type = ?", (media_type.capitalize(),)) if media_type else ("", ())
+        longest = SQLiteMediaSequence(self, where, parameters,
+                                      SQLiteLibrary.SORT_COLUMNS["length"], descending = True)
+        return longest[:count]
+
+    def media_has_artist(self, media, name):
+        """Returns a boolean value indicating whether passed name has any
+           involvement in a media item loaded from the database
+
+           Main Args:
+                media: The Song or Video object to check
+                name: Name of the performer, actor or director
+        """
+        row_id = media.get_media_id()
+        if row_id is None:
+            return media.get_media_with_artist(name)
+        record = self._connection.execute("SELECT 1 FROM media_artist WHERE artist_key = ? "
+                                          "AND media_id = ?", (name.casefold(), row_id)).fetchone()
+        return record is not None
+
+def _escape_like(text):
+    """Escapes the LIKE wildcards in text, for use with ESCAPE '\\'"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def import_csv(file_name, database_name, chunk_size = None):
+    """Import a library CSV file such as Media.csv into an SQLite database
+
+       Returns the number of items imported.
+
+       Main Args:
+            file_name: CSV file in the format written by Library.write_items_to_file
+            database_name: SQLite database file to import into
+            chunk_size: Number of items per transaction, Library.CHUNK_SIZE if not given
+    """
+    library = SQLiteLibrary(database_name)
+    try:
+        return library.read_items_from_file(file_name, chunk_size)["added"]
+    finally:
+        library.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python MediaDatabase.py <library.csv> <library.db>")
+    imported = import_csv(sys.argv[1], sys.argv[2])
+    print(f"Imported {imported} items into {sys.argv[2]}")
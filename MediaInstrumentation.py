@@ -0,0 +1,251 @@
+"""Opt-in timing of library, playlist and window operations.
+
+   Instrumentation wraps the public methods of chosen classes (by default
+   Library and PlayList, and the MainApp *_click handlers and view updates
+   when the app is running). Each call is counted, its time is added to a
+   latency histogram, and the number of items it returned or was given is
+   totalled. Calls slower than a threshold are logged as warnings on the
+   "MediaApp" logger. One call of a chosen method can be run under cProfile.
+
+   Nothing is wrapped unless instrumentation is enabled, either by calling
+   enable() or through these environment variables, read by from_environment():
+
+        MEDIAAPP_METRICS       JSON file the metrics are written to on exit
+        MEDIAAPP_SLOW_MS       Log calls slower than this many milliseconds (default 100)
+        MEDIAAPP_PROFILE       Method to profile once, e.g. MainApp.filter_button_click
+        MEDIAAPP_PROFILE_FILE  File the profile is written to (default <method>.prof)
+
+   e.g. MEDIAAPP_METRICS=metrics.json MEDIAAPP_SLOW_MS=50 python MainApp.py
+"""
+
+import atexit
+
+import functools
+
+import inspect
+
+import io
+
+import json
+
+import logging
+
+import os
+
+import threading
+
+import time
+
+from collections.abc import Sized
+
+logger = logging.getLogger("MediaApp")
+
+# Upper bounds in milliseconds of the latency histogram buckets. Calls slower
+# than the last bound are counted in a final overflow bucket.
+HISTOGRAM_BOUNDS = (0.1, 1, 10, 100, 1000, 10000)
+
+# Helpers called once per item inside bulk reads and filters. Timing them would
+# slow those operations down far more than it tells us, so they are left alone.
+PER_ITEM_METHODS = ("reformat_items", "create_media_from_row", "media_has_artist")
+
+# MainApp methods that are timed along with the *_click handlers, as they
+# parse files, filter or fill the library view outside of a click.
+APP_METHODS = ("update_tree", "render_tree_window", "run_search", "poll_background_read",
+               "refresh_playlist")
+
+def _item_count(result, arguments):
+    """Returns the number of items an operation returned, or was given, or None
+
+       Lists and other sized results count their items; summaries returned by
+       reads and writes count the rows added or written. Otherwise a list or
+       tuple passed as the first argument, such as the items to add, is counted.
+    """
+    if isinstance(result, dict):
+        count = result.get("added", result.get("rows"))
+        if isinstance(count, int):
+            return count
+    elif isinstance(result, Sized) and not isinstance(result, str):
+        return len(result)
+    if arguments and isinstance(arguments[0], (list, tuple)):
+        return len(arguments[0])
+    return None
+
+class Instrumentation:
+    """Represents the metrics recorded for instrumented methods
+
+       Attributes in constructor:
+            slow_threshold: Calls taking longer than this many seconds are logged (float)
+            profile_target: Name of the method whose next call is profiled, or None (string)
+            profile_file: File the profile of profile_target is written to (string)
+    """
+
+    def __init__(self, slow_threshold = 0.1):
+        self.slow_threshold = slow_threshold
+        self.profile_target = None
+        self.profile_file = None
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._originals = []
+
+    def record(self, name, seconds, items = None):
+        """Adds one call of a method to its metrics, and logs it if it was slow
+
+           Main Args:
+                name: Method name, e.g. "Library.read_items_from_file"
+                seconds: Time the call took
+                items: Number of items returned or handled by the call, or None
+        """
+        milliseconds = seconds * 1000
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS) and milliseconds > HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        with self._lock:
+            metrics = self._metrics.get(name)
+            if metrics is None:
+                metrics = self._metrics[name] = {"calls" : 0, "total_seconds" : 0.0, "max_seconds" : 0.0,
+                                                 "items" : 0, "histogram" : [0] * (len(HISTOGRAM_BOUNDS) + 1)}
+            metrics["calls"] += 1
+            metrics["total_seconds"] += seconds
+            metrics["max_seconds"] = max(metrics["max_seconds"], seconds)
+            metrics["histogram"][bucket] += 1
+            if items is not None:
+                metrics["items"] += items
+        if seconds > self.slow_threshold:
+            logger.warning("Slow operation: %s took %.1f ms%s", name, milliseconds,
+                           f" ({items:,} items)" if items is not None else "")
+
+    def wrap(self, name, function):
+        """Returns function wrapped so that its calls are recorded under name"""
+        @functools.wraps(function)
+        def instrumented(*arguments, **keywords):
+            if self.profile_target == name:
+                return self._profile(name, function, arguments, keywords)
+            start_time = time.perf_counter()
+            result = function(*arguments, **keywords)
+            self.record(name, time.perf_counter() - start_time, _item_count(result, arguments[1:]))
+            return result
+        return instrumented
+
+    def _profile(self, name, function, arguments, keywords):
+        """Runs one call of function under cProfile and writes the profile to profile_file
+
+           cProfile and pstats are only imported here, as most runs never profile.
+        """
+        import cProfile
+        import pstats
+
+        self.profile_target = None
+        profile = cProfile.Profile()
+        start_time = time.perf_counter()
+        try:
+            result = profile.runcall(function, *arguments, **keywords)
+        finally:
+            seconds = time.perf_counter() - start_time
+            profile_file = self.profile_file or f"{name}.prof"
+            profile.dump_stats(profile_file)
+            summary = io.StringIO()
+            pstats.Stats(profile, stream = summary).sort_stats("cumulative").print_stats(15)
+            logger.warning("Profile of %s (%.1f ms) written to %s\n%s", name, seconds * 1000,
+                           profile_file, summary.getvalue())
+        self.record(name, seconds, _item_count(result, arguments[1:]))
+        return result
+
+    def instrument(self, cls, method_names = None):
+        """Wraps methods of a class so that calls on every instance are recorded
+
+           Generator methods are left alone, as a call only creates the generator.
+
+           Main Args:
+                cls: Class whose methods are wrapped
+                method_names: Names of the methods to wrap; by default every public
+                              method defined by the class itself, except PER_ITEM_METHODS
+        """
+        if method_names is None:
+            method_names = [name for name in vars(cls)
+                            if not name.startswith("_") and name not in PER_ITEM_METHODS]
+        for method_name in method_names:
+            function = vars(cls).get(method_name)
+            if not inspect.isfunction(function) or inspect.isgeneratorfunction(function):
+                continue
+            self._originals.append((cls, method_name, function))
+            setattr(cls, method_name, self.wrap(f"{cls.__name__}.{method_name}", function))
+
+    def instrument_app(self, app_class):
+        """Wraps the *_click handlers and view update methods of the MainApp class"""
+        self.instrument(app_class, [name for name in vars(app_class)
+                                    if name.endswith("_click") or name in APP_METHODS])
+
+    def remove(self):
+        """Restores every wrapped method. Metrics recorded so far are kept."""
+        for cls, method_name, function in reversed(self._originals):
+            setattr(cls, method_name, function)
+        self._originals.clear()
+
+    def profile_next(self, name, file_name = None):
+        """Profiles the next call of a wrapped method with cProfile
+
+           Main Args:
+                name: Method name, e.g. "MainApp.filter_button_click"
+                file_name: File the profile is written to, by default <name>.prof
+        """
+        self.profile_file = file_name
+        self.profile_target = name
+
+    def to_dict(self):
+        """Returns the metrics of every method, slowest total time first, as a dict"""
+        with self._lock:
+            metrics = {name : dict(values, histogram = list(values["histogram"]))
+                       for name, values in self._metrics.items()}
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]}ms"]
+        methods = {}
+        for name, values in sorted(metrics.items(), key = lambda entry: -entry[1]["total_seconds"]):
+            values["mean_seconds"] = values["total_seconds"] / values["calls"]
+            values["histogram"] = dict(zip(labels, values["histogram"]))
+            methods[name] = values
+        return {"slow_threshold_seconds" : self.slow_threshold, "methods" : methods}
+
+    def dump(self, file_name):
+        """Writes the metrics to a JSON file"""
+        with open(file_name, "w") as f:
+            json.dump(self.to_dict(), f, indent = 2)
+
+_active = None
+
+def get_instrumentation():
+    """Returns the enabled Instrumentation, or None if instrumentation is off"""
+    return _active
+
+def enable(slow_ms = 100, metrics_file = None, profile = None, profile_file = None):
+    """Turns on instrumentation of Library and PlayList and returns the Instrumentation
+
+       If instrumentation is already on, its settings are updated instead.
+
+       Main Args:
+            slow_ms: Calls slower than this many milliseconds are logged
+            metrics_file: JSON file the metrics are written to when Python exits, or None
+            profile: Name of a method whose next call is profiled, or None
+            profile_file: File that profile is written to, by default <method>.prof
+    """
+    global _active
+    from MediaClasses import Library, PlayList
+
+    if _active is None:
+        _active = Instrumentation()
+        _active.instrument(Library)
+        _active.instrument(PlayList)
+    _active.slow_threshold = slow_ms / 1000
+    if profile:
+        _active.profile_next(profile, profile_file)
+    if metrics_file:
+        atexit.register(_active.dump, metrics_file)
+    return _active
+
+def from_environment():
+    """Enables instrumentation if any MEDIAAPP_ variable asks for it, returning it or None"""
+    metrics_file = os.environ.get("MEDIAAPP_METRICS")
+    slow_ms = os.environ.get("MEDIAAPP_SLOW_MS")
+    profile = os.environ.get("MEDIAAPP_PROFILE")
+    if not (metrics_file or slow_ms or profile):
+        return None
+    return enable(float(slow_ms) if slow_ms else 100, metrics_file, profile,
+                  os.environ.get("MEDIAAPP_PROFILE_FILE"))
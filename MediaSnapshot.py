@@ -0,0 +1,198 @@
+import mmap
+
+import os
+
+import struct
+
+import sys
+
+import tempfile
+
+from array import array
+
+from collections.abc import Sequence
+
+from MediaClasses import Song, Video
+
+# Header: magic, format version, item count, string count, people count,
+# and the string index of the source token.
+HEADER = struct.Struct("<8sIIIII")
+# Item: type code, padding, title, format and language string indexes, play length,
+# director string index, the start and count of the item's people entries, then
+# the media ID (0 for none).
+ITEM = struct.Struct("<B3xIIIqIIIQ")
+STRING_INDEX = struct.Struct("<I")
+STRING_OFFSET = struct.Struct("<Q")
+
+MAGIC = b"MEDIASNP"
+VERSION = 2
+NO_STRING = 0xFFFFFFFF
+TYPE_CODES = {"Song" : 0, "Video" : 1}
+
+class MediaSnapshot(Sequence):
+    """Represents a library snapshot file opened with mmap
+
+       The file holds fixed-width item records, a table of people entries and
+       a string table. Opening a snapshot only maps the file and reads the
+       header; each media item is built when it is indexed or iterated over.
+       Strings are decoded once and shared between items. Loading a library
+       iterates, which builds items in bulk; indexing reads single items
+       without building the others.
+
+       Attributes in constructor:
+            file_name: The snapshot file to open (string)
+            source_token: Identifies the CSV file the snapshot was written from (string)
+    """
+
+    def __init__(self, file_name):
+        with open(file_name, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        try:
+            if len(self._map) < HEADER.size:
+                raise ValueError(f"{file_name} is truncated")
+            magic, version, self._item_count, string_count, people_count, token_index = \
+                HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{file_name} is not a version {VERSION} media snapshot")
+            self._items_offset = HEADER.size
+            self._people_offset = self._items_offset + self._item_count * ITEM.size
+            self._string_offsets = self._people_offset + people_count * STRING_INDEX.size
+            self._blob_offset = self._string_offsets + (string_count + 1) * STRING_OFFSET.size
+            if (self._blob_offset > len(self._map) or self._blob_offset + STRING_OFFSET.unpack_from(
+                    self._map, self._blob_offset - STRING_OFFSET.size)[0] > len(self._map)):
+                raise ValueError(f"{file_name} is truncated")
+            self._strings = {}
+            self.source_token = self._string(token_index)
+        except Exception:
+            self._map.close()
+            raise
+
+    def close(self):
+        """Unmaps the snapshot file"""
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _string(self, index):
+        """Returns string number index from the string table"""
+        if index == NO_STRING:
+            return ""
+        string = self._strings.get(index)
+        if string is None:
+            start, end = struct.unpack_from("<QQ", self._map, self._string_offsets + index * STRING_OFFSET.size)
+            string = self._map[self._blob_offset + start : self._blob_offset + end].decode("utf-8")
+            self._strings[index] = string
+        return string
+
+    def __len__(self):
+        return self._item_count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += self._item_count
+        if not 0 <= position < self._item_count:
+            raise IndexError("snapshot position out of range")
+
+        (type_code, title, media_format, language, play_length,
+         director, people_start, people_count, media_id) = ITEM.unpack_from(self._map, self._items_offset + position * ITEM.size)
+        people_offset = self._people_offset + people_start * STRING_INDEX.size
+        people = [self._string(index) for (index,) in
+                  STRING_INDEX.iter_unpack(self._map[people_offset : people_offset + people_count * STRING_INDEX.size])]
+
+        if type_code == TYPE_CODES["Song"]:
+            return Song(self._string(title), self._string(media_format), self._string(language),
+                        play_length, people, media_id or None)
+        return Video(self._string(title), self._string(media_format), self._string(language),
+                     play_length, self._string(director), people, media_id or None)
+
+    def _read_array(self, typecode, start, end):
+        """Returns the little-endian values between two file offsets as an array"""
+        values = array(typecode, self._map[start : end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def __iter__(self):
+        # A full pass decodes the whole string table up front and unpacks the
+        # item and people tables in bulk, rather than one record at a time.
+        offsets = self._read_array("Q", self._string_offsets, self._blob_offset)
+        blob = self._map[self._blob_offset : self._blob_offset + offsets[-1]]
+        strings = [blob[start : end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+        people_table = self._read_array("I", self._people_offset, self._string_offsets)
+        items_end = self._items_offset + self._item_count * ITEM.size
+        song_code = TYPE_CODES["Song"]
+        for (type_code, title, media_format, language, play_length,
+             director, people_start, people_count, media_id) in ITEM.iter_unpack(self._map[self._items_offset : items_end]):
+            people = [strings[index] for index in people_table[people_start : people_start + people_count]]
+            if type_code == song_code:
+                yield Song(strings[title], strings[media_format], strings[language], play_length,
+                           people, media_id or None)
+            else:
+                yield Video(strings[title], strings[media_format], strings[language],
+                            play_length, strings[director], people, media_id or None)
+
+def write_snapshot(file_name, media_items, source_token = ""):
+    """Write media items to a binary snapshot file
+
+       The file is written to a temporary file in the same directory and
+       renamed over file_name, so readers never see a partial snapshot.
+
+       Main Args:
+            file_name: Snapshot file to write
+            media_items: Sequence of Song and Video objects to store
+            source_token: String identifying the CSV file the items were read from
+    """
+    strings = {}
+    def string_index(string):
+        return strings.setdefault(string, len(strings))
+
+    token_index = string_index(source_token)
+    items = bytearray()
+    people = bytearray()
+    people_count = 0
+    for media in media_items:
+        if media.get_class_name() == "Song":
+            names = media.get_performer_names()
+            director = NO_STRING
+        else:
+            names = media.get_actors()
+            director = string_index(media.get_director_name())
+        names = names or ()
+        items += ITEM.pack(TYPE_CODES[media.get_class_name()],
+                           string_index(media.get_media_title()),
+                           string_index(media.get_media_format()),
+                           string_index(media.get_media_language()),
+                           media.get_play_length(), director, people_count, len(names),
+                           media.get_media_id() or 0)
+        for name in names:
+            people += STRING_INDEX.pack(string_index(name))
+        people_count += len(names)
+
+    blob = bytearray()
+    offsets = bytearray(STRING_OFFSET.pack(0))
+    for string in strings:
+        blob += string.encode("utf-8")
+        offsets += STRING_OFFSET.pack(len(blob))
+
+    directory = os.path.dirname(os.path.abspath(file_name))
+    file_descriptor, temp_name = tempfile.mkstemp(prefix = ".", suffix = ".tmp", dir = directory)
+    try:
+        os.chmod(temp_name, 0o644)
+        with open(file_descriptor, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(items) // ITEM.size, len(strings),
+                                people_count, token_index))
+            for section in (items, people, offsets, blob):
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
@@ -0,0 +1,42 @@
+"""Times Library.read_items_from_files against the number of worker processes.
+
+   Usage: python benchmarks/bench_parallel_import.py [files] [rows per file]
+"""
+
+import os
+
+import sys
+
+import tempfile
+
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library
+
+from generate_library import write_library
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, 16, cpus} & set(range(1, cpus + 1)) | {1})
+
+    with tempfile.TemporaryDirectory() as directory:
+        for seed in range(files):
+            write_library(os.path.join(directory, f"export_{seed:03}.csv"), rows, seed)
+
+        print(f"{files} files x {rows} rows, {cpus} CPUs")
+        print(f"{'workers':>8} {'seconds':>9} {'rows/s':>10} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            library = Library()
+            start_time = time.perf_counter()
+            added = library.read_items_from_files(directory, workers = workers)["added"]
+            seconds = time.perf_counter() - start_time
+            baseline = baseline or seconds
+            print(f"{workers:>8} {seconds:>9.2f} {added / seconds:>10,.0f} {baseline / seconds:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
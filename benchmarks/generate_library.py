@@ -0,0 +1,77 @@
+"""Writes synthetic library CSV files in the Library.FIELDS format.
+
+   Output is fully determined by the seed, so benchmark runs are comparable.
+   Rows are written as they are generated, so libraries of 10M rows or more
+   need no more memory than small ones. Row counts may use a k or M suffix.
+
+   Usage: python benchmarks/generate_library.py <file.csv> <rows> [seed]
+          e.g. python benchmarks/generate_library.py big.csv 10M
+"""
+
+import csv
+
+import os
+
+import random
+
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library
+
+LANGUAGES = ("English", "French", "German", "Spanish", "Italian", "Japanese")
+SONG_FORMATS = ("MP3", "MP4", "FLAC", "WAV")
+VIDEO_FORMATS = ("DVD", "BluRay", "Digital")
+
+SIZE_SUFFIXES = {"k" : 1000, "m" : 1000000}
+
+def parse_rows(text):
+    """Returns the row count written as text, e.g. "5000", "10k" or "10M"
+
+       Main Args:
+            text: Row count, optionally ending in k (thousands) or M (millions)
+    """
+    text = text.strip().replace("_", "")
+    multiplier = SIZE_SUFFIXES.get(text[-1:].lower(), 1)
+    if multiplier != 1:
+        text = text[:-1]
+    rows = int(float(text) * multiplier)
+    if rows < 0:
+        raise ValueError(f"row count must not be negative: {text}")
+    return rows
+
+def write_library(file_name, rows, seed = 0, people = 5000):
+    """Write a synthetic library CSV file
+
+       Main Args:
+            file_name: CSV file to write
+            rows: Number of media items to write
+            seed: Seed for the random generator
+            people: Number of distinct performer, actor and director names
+    """
+    generator = random.Random(seed)
+    with open(file_name, "w", newline = "") as f:
+        writer = csv.DictWriter(f, fieldnames = Library.FIELDS)
+        writer.writeheader()
+        for row in range(rows):
+            names = [f"Person {generator.randrange(people)}" for _ in range(generator.randint(1, 3))]
+            language = generator.choice(LANGUAGES)
+            if generator.random() < 0.7:
+                writer.writerow({"Type" : "Song", "Media Title" : f"Song {seed}-{row}",
+                                 "Media Format" : generator.choice(SONG_FORMATS),
+                                 "Media Language" : language,
+                                 "Play Length" : generator.randint(60, 600),
+                                 "Performer Names" : names})
+            else:
+                writer.writerow({"Type" : "Video", "Media Title" : f"Video {seed}-{row}",
+                                 "Media Format" : generator.choice(VIDEO_FORMATS),
+                                 "Media Language" : language,
+                                 "Play Length" : generator.randint(1200, 12000),
+                                 "Director Name" : f"Person {generator.randrange(people)}",
+                                 "Actors" : names})
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python benchmarks/generate_library.py <file.csv> <rows> [seed]")
+    write_library(sys.argv[1], parse_rows(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) == 4 else 0)
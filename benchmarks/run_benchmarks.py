@@ -0,0 +1,294 @@
+"""Times the main library, playlist and view operations on synthetic libraries.
+
+   A seeded library CSV is generated for each size (and kept in --data-dir
+   between runs if one is given). Each benchmark is run --repeat times and the
+   best time is kept. Results are written as JSON, and --check compares each
+   result's cost per operation with the limits in thresholds.json, exiting
+   with status 1 if any benchmark is over its limit.
+
+   The MainApp.update_tree benchmarks need a display, and are skipped without
+   one; run under xvfb-run on a machine without a screen. --check reports a
+   benchmark with a limit but no result as not checked, and exits with status
+   2 if nothing is over its limit but something was not checked.
+
+   Usage: python benchmarks/run_benchmarks.py [--sizes 1k,10k,100k] [--output results.json] [--check]
+          python benchmarks/run_benchmarks.py --sizes 1M --save-thresholds benchmarks/thresholds.json
+"""
+
+import argparse
+
+import json
+
+import os
+
+import platform
+
+import random
+
+import sys
+
+import tempfile
+
+import time
+
+from datetime import datetime, timezone
+
+from itertools import chain
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, PlayList
+
+from generate_library import LANGUAGES, SONG_FORMATS, VIDEO_FORMATS, parse_rows, write_library
+
+THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+# Playlists hold at most this many songs, however large the library is.
+PLAYLIST_SIZE = 100000
+# Number of moves, runtime queries, artist lookups and view refreshes timed per run.
+OPERATIONS = 1000
+VIEW_REFRESHES = 50
+# Benchmarks yielded by view_benchmarks, which are skipped without a display.
+VIEW_BENCHMARKS = ("MainApp.update_tree", "MainApp.update_tree (filtered)")
+
+def best_time(run, repeat, setup = None):
+    """Returns the shortest time in seconds taken by run() over repeat runs
+
+       Main Args:
+            run: Function to time. It is passed the value returned by setup, if given.
+            repeat: Number of times to run it
+            setup: Function called before each run, outside the timing
+    """
+    best = None
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start_time = time.perf_counter()
+        run(argument) if setup else run()
+        seconds = time.perf_counter() - start_time
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def library_benchmarks(file_name, rows, repeat, seed):
+    """Yields (benchmark name, seconds, operations) for the Library and PlayList benchmarks
+
+       Main Args:
+            file_name: Synthetic library CSV file holding rows items
+            rows: Number of items in the file
+            repeat: Number of times each benchmark is run
+            seed: Seed for choosing artists and moves
+    """
+    seconds = best_time(lambda library: library.read_items_from_file(file_name), repeat, Library)
+    yield "Library.read_items_from_file", seconds, rows
+
+    library = Library()
+    library.read_items_from_file(file_name)
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "library.csv")
+        seconds = best_time(lambda: library.write_items_to_file(output), repeat)
+    yield "Library.write_items_to_file", seconds, rows
+
+    # Every item has one language and one format, so a pass over all of them
+    # returns each item once and the cost is per item returned.
+    def filter_all(get_media, values):
+        for value in values:
+            len(get_media(value))
+    seconds = best_time(lambda: filter_all(library.get_media_of_language, LANGUAGES), repeat)
+    yield "Library.get_media_of_language", seconds, rows
+    seconds = best_time(lambda: filter_all(library.get_media_of_format, SONG_FORMATS + VIDEO_FORMATS), repeat)
+    yield "Library.get_media_of_format", seconds, rows
+
+    generator = random.Random(seed)
+    items = library.get_all_media()
+    names = [generator.choice(items[generator.randrange(len(items))].get_people()) for _ in range(OPERATIONS)]
+    seconds = best_time(lambda: filter_all(library.get_media_with_artist, names), repeat)
+    yield "Library.get_media_with_artist", seconds, OPERATIONS
+
+    playlist = PlayList()
+    for media in items:
+        if media.get_class_name() == "Song":
+            playlist.add_song(media)
+            if len(playlist.get_all_media()) == PLAYLIST_SIZE:
+                break
+    size = len(playlist.get_all_media())
+    moves = [(generator.randrange(size), generator.randrange(size)) for _ in range(OPERATIONS)]
+    def move_all():
+        for from_position, to_position in moves:
+            playlist.move_song(from_position, to_position)
+    seconds = best_time(move_all, repeat)
+    yield "PlayList.move_song", seconds, OPERATIONS
+
+    def runtime_all():
+        for _ in range(OPERATIONS):
+            playlist.get_playlist_runtime()
+    seconds = best_time(runtime_all, repeat)
+    yield "PlayList.get_playlist_runtime", seconds, OPERATIONS
+
+def create_window():
+    """Returns (hidden Tk root window, None), or (None, reason) if no window can be created"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except ImportError as error:
+        return None, f"Tkinter is not installed: {error}"
+    except tk.TclError as error:
+        return None, str(error)
+    root.withdraw()
+    return root, None
+
+def view_benchmarks(root, file_name, repeat):
+    """Yields (benchmark name, seconds, operations) for the MainApp view benchmarks
+
+       The window is destroyed once the benchmarks have run.
+
+       Main Args:
+            root: Tk root window returned by create_window
+            file_name: Synthetic library CSV file to show in the view
+            repeat: Number of times each benchmark is run
+    """
+    from MainApp import MainApp
+
+    try:
+        library = Library()
+        app = MainApp(library, PlayList(), root)
+        while app.background_task:
+            root.update()
+            time.sleep(0.01)
+        library.read_items_from_file(file_name)
+        root.update()
+
+        def refresh_all(media_collection):
+            for _ in range(VIEW_REFRESHES):
+                app.update_tree(media_collection)
+                root.update_idletasks()
+        seconds = best_time(lambda: refresh_all(app.get_library), repeat)
+        yield VIEW_BENCHMARKS[0], seconds, VIEW_REFRESHES
+        filtered = library.get_media_of_language(LANGUAGES[0])
+        seconds = best_time(lambda: refresh_all(filtered), repeat)
+        yield VIEW_BENCHMARKS[1], seconds, VIEW_REFRESHES
+    finally:
+        root.destroy()
+
+def run_benchmarks(sizes, repeat, seed, data_dir):
+    """Returns the results of every benchmark at every size as a dict
+
+       Main Args:
+            sizes: Library sizes (row counts) to run the benchmarks on
+            repeat: Number of times each benchmark is run
+            seed: Seed for the synthetic libraries and random operations
+            data_dir: Directory for the generated CSV files, kept between runs
+    """
+    report = {"created" : datetime.now(timezone.utc).isoformat(timespec = "seconds"),
+              "python" : platform.python_version(), "platform" : platform.platform(),
+              "seed" : seed, "repeat" : repeat, "results" : [], "skipped" : []}
+    for rows in sizes:
+        file_name = os.path.join(data_dir, f"library_{rows}_{seed}.csv")
+        if not os.path.exists(file_name):
+            print(f"Generating {rows:,} rows...", file = sys.stderr)
+            write_library(file_name, rows, seed)
+
+        benchmarks = library_benchmarks(file_name, rows, repeat, seed)
+        root, reason = create_window()
+        if root is None:
+            report["skipped"].extend({"benchmark" : name, "rows" : rows, "reason" : reason}
+                                     for name in VIEW_BENCHMARKS)
+        else:
+            benchmarks = chain(benchmarks, view_benchmarks(root, file_name, repeat))
+
+        for name, seconds, operations in benchmarks:
+            result = {"benchmark" : name, "rows" : rows, "operations" : operations, "seconds" : round(seconds, 6),
+                      "us_per_operation" : round(seconds / operations * 1e6, 4)}
+            report["results"].append(result)
+            print(f"{name:<34} {rows:>10,} {seconds:>10.4f}s {result['us_per_operation']:>12.3f} us/op",
+                  file = sys.stderr)
+    return report
+
+def check_thresholds(report, thresholds):
+    """Returns a message for each result slower than its threshold
+
+       Main Args:
+            report: Benchmark results returned by run_benchmarks
+            thresholds: Dict of benchmark name to {"max_us_per_operation" : limit}
+    """
+    failures = []
+    for result in report["results"]:
+        limit = thresholds.get(result["benchmark"], {}).get("max_us_per_operation")
+        if limit is not None and result["us_per_operation"] > limit:
+            failures.append(f"{result['benchmark']} at {result['rows']:,} rows: "
+                            f"{result['us_per_operation']:.3f} us/op, limit {limit}")
+    return failures
+
+def unchecked_thresholds(report, thresholds):
+    """Returns a message for each benchmark with a threshold but no result in report
+
+       Main Args:
+            report: Benchmark results returned by run_benchmarks
+            thresholds: Dict of benchmark name to {"max_us_per_operation" : limit}
+    """
+    checked = {result["benchmark"] for result in report["results"]}
+    reasons = {skipped["benchmark"] : skipped["reason"] for skipped in report["skipped"]}
+    return [f"{name}: {reasons.get(name, 'no result in this run')}"
+            for name in thresholds if name not in checked]
+
+def make_thresholds(report, slack):
+    """Returns thresholds allowing each benchmark slack times its slowest result in report"""
+    thresholds = {}
+    for result in report["results"]:
+        limit = round(result["us_per_operation"] * slack, 3)
+        entry = thresholds.setdefault(result["benchmark"], {"max_us_per_operation" : limit})
+        entry["max_us_per_operation"] = max(entry["max_us_per_operation"], limit)
+    return thresholds
+
+def main():
+    parser = argparse.ArgumentParser(description = "Media library benchmark suite.")
+    parser.add_argument("--sizes", default = "1k,10k,100k",
+                        help = "comma separated library sizes, from 1k to 10M (default 1k,10k,100k)")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs of each benchmark; the best is kept")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed for the synthetic libraries")
+    parser.add_argument("--data-dir", help = "directory to keep generated library files in between runs")
+    parser.add_argument("--output", help = "JSON file to write the results to (default: standard output)")
+    parser.add_argument("--check", nargs = "?", const = THRESHOLDS_FILE, metavar = "THRESHOLDS",
+                        help = "fail if any result is over its limit in a thresholds file "
+                               "(default benchmarks/thresholds.json)")
+    parser.add_argument("--save-thresholds", metavar = "THRESHOLDS",
+                        help = "write thresholds allowing --slack times this run's results")
+    parser.add_argument("--slack", type = float, default = 3.0,
+                        help = "multiple of this run's results allowed by --save-thresholds (default 3)")
+    arguments = parser.parse_args()
+    sizes = [parse_rows(size) for size in arguments.sizes.split(",")]
+
+    if arguments.data_dir:
+        os.makedirs(arguments.data_dir, exist_ok = True)
+        report = run_benchmarks(sizes, arguments.repeat, arguments.seed, arguments.data_dir)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            report = run_benchmarks(sizes, arguments.repeat, arguments.seed, directory)
+
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            json.dump(report, f, indent = 2)
+    else:
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+
+    if arguments.save_thresholds:
+        with open(arguments.save_thresholds, "w") as f:
+            json.dump(make_thresholds(report, arguments.slack), f, indent = 2)
+            f.write("\n")
+
+    if arguments.check:
+        with open(arguments.check) as f:
+            thresholds = json.load(f)
+        failures = check_thresholds(report, thresholds)
+        unchecked = unchecked_thresholds(report, thresholds)
+        for failure in failures:
+            print(f"REGRESSION: {failure}", file = sys.stderr)
+        for message in unchecked:
+            print(f"NOT CHECKED: {message}", file = sys.stderr)
+        if failures:
+            sys.exit(1)
+        if unchecked:
+            sys.exit(2)
+        print(f"All results within {arguments.check}", file = sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Randomized checks that skipping duplicates on import agrees with a brute-force comparison,
+   across removals, truncations and imports rolled back after a bad row.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import csv
+
+import os
+
+import random
+
+import sys
+
+import tempfile
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, Song, Video
+
+TITLES = ("Alpha", "alpha ", " ALPHA", "Beta", "beta")
+NAMES = ("Al Pacino", "al pacino", "Bo Diddley", " BO DIDDLEY")
+
+def content(media):
+    """Returns what makes two items duplicates, worked out without fingerprints"""
+    director = media.get_director_name() if media.get_class_name() == "Video" else None
+    return (media.get_class_name(), media.get_media_title().strip().casefold(),
+            media.get_media_format().strip().casefold(), media.get_media_language().strip().casefold(),
+            media.get_play_length(), sorted(name.strip().casefold() for name in media.get_people()),
+            director and director.strip().casefold())
+
+def random_media(generator):
+    # Few distinct values, written with different case and spacing, so duplicates are common.
+    arguments = (generator.choice(TITLES), generator.choice(("MP3", "mp3", "DVD")),
+                 generator.choice(("English", "english ")), generator.randrange(3))
+    people = generator.sample(NAMES, generator.randint(0, 2))
+    if generator.random() < 0.6:
+        return Song(*arguments, people)
+    return Video(*arguments, generator.choice(NAMES), people)
+
+class FingerprintDedupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "import.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected_additions(self, model, media_items, skip_duplicates):
+        """Returns the items an import should add, comparing each with every item before it"""
+        if not skip_duplicates:
+            return list(media_items)
+        seen = [content(media) for media in model]
+        added = []
+        for media in media_items:
+            if content(media) not in seen:
+                seen.append(content(media))
+                added.append(media)
+        return added
+
+    def write_file(self, media_items, bad_row):
+        Library().write_items_to_file(self.file_name, media_items)
+        if bad_row:
+            with open(self.file_name, "a", newline = "") as f:
+                csv.writer(f).writerow(["Song", "Bad", "MP3", "English", "not a length", "[]", "", "", ""])
+
+    def test_random_imports_match_brute_force(self):
+        for seed in range(15):
+            generator = random.Random(seed)
+            library = Library()
+            model = []
+            for step in range(60):
+                operation = generator.random()
+                if operation < 0.3 or not model:
+                    media_items = [random_media(generator) for _ in range(generator.randint(1, 8))]
+                    skip_duplicates = generator.random() < 0.7
+                    expected = self.expected_additions(model, media_items, skip_duplicates)
+                    duplicates = library.add_media_items(media_items, skip_duplicates)
+                    self.assertEqual(duplicates, len(media_items) - len(expected))
+                    model += expected
+                elif operation < 0.55:
+                    media_items = [random_media(generator) for _ in range(generator.randint(1, 8))]
+                    bad_row = generator.random() < 0.4
+                    self.write_file(media_items, bad_row)
+                    skip_duplicates = generator.random() < 0.7
+                    if bad_row:
+                        # Items from the chunks before the bad row are added, then rolled back.
+                        with self.assertRaises(ValueError):
+                            library.read_items_from_file(self.file_name, chunk_size = 3,
+                                                         skip_duplicates = skip_duplicates)
+                    else:
+                        expected = self.expected_additions(model, media_items, skip_duplicates)
+                        summary = library.read_items_from_file(self.file_name, chunk_size = 3,
+                                                               skip_duplicates = skip_duplicates)
+                        self.assertEqual(summary, {"added" : len(expected),
+                                                   "duplicates" : len(media_items) - len(expected)})
+                        added = library.get_all_media()[len(model):]
+                        self.assertEqual([content(media) for media in added],
+                                         [content(media) for media in expected])
+                        model += added
+                elif operation < 0.7:
+                    library.add_media(random_media(generator))
+                    model.append(library.get_all_media()[-1])
+                elif operation < 0.85:
+                    media = model.pop(generator.randrange(len(model)))
+                    library.remove_media_by_id(media.get_media_id())
+                else:
+                    length = generator.randrange(len(model) + 1)
+                    library.truncate(length)
+                    del model[length:]
+                self.assertEqual([content(media) for media in library.get_all_media()],
+                                 [content(media) for media in model], (seed, step))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Randomized checks that a library's intern pool shares repeated values without changing any item.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import copy
+
+import os
+
+import random
+
+import sys
+
+import tempfile
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, Song, Video
+
+LANGUAGES = ("English", "French", "english")
+FORMATS = ("MP3", "DVD", "FLAC")
+NAMES = ("Al Pacino", "Bo Diddley", "Freddy King", "al pacino")
+
+def fresh(value):
+    """Returns an equal string that is a separate object, as a file parser would create"""
+    return "".join(list(value))
+
+def random_media(generator):
+    arguments = (fresh(f"Title {generator.randrange(5)}"), fresh(generator.choice(FORMATS)),
+                 fresh(generator.choice(LANGUAGES)), generator.randrange(100))
+    people = [fresh(name) for name in generator.sample(NAMES, generator.randint(0, 3))]
+    if generator.random() < 0.2:
+        # An empty cell, as read from a file, rather than a list of names.
+        people = ""
+    if generator.random() < 0.6:
+        return Song(*arguments, people)
+    return Video(*arguments, fresh(generator.choice(NAMES)), people)
+
+class InternPoolTest(unittest.TestCase):
+
+    def assert_values_shared(self, media_items):
+        """Checks that equal formats, languages, names and name tuples are one object"""
+        shared = {}
+        def check(value):
+            self.assertIs(shared.setdefault(value, value), value, value)
+        for media in media_items:
+            check(media.get_media_format())
+            check(media.get_media_language())
+            if media.get_class_name() == "Song":
+                names = media.get_performer_names()
+            else:
+                names = media.get_actors()
+                check(media.get_director_name())
+            if names != "":
+                self.assertIsInstance(names, tuple)
+                check(names)
+                for name in names:
+                    check(name)
+
+    def test_random_adds_share_values_and_keep_content(self):
+        for seed in range(10):
+            generator = random.Random(seed)
+            library = Library()
+            originals = []
+            for _ in range(30):
+                media_items = [random_media(generator) for _ in range(generator.randint(1, 10))]
+                originals += [copy.copy(media) for media in media_items]
+                if len(media_items) == 1 and generator.random() < 0.5:
+                    library.add_media(media_items[0])
+                else:
+                    library.add_media_items(media_items)
+                if generator.random() < 0.2:
+                    position = generator.randrange(len(originals))
+                    library.remove_media(position)
+                    del originals[position]
+
+            media_items = library.get_all_media()
+            self.assert_values_shared(media_items)
+            self.assertEqual([media.to_dict() for media in media_items],
+                             [dict(original.to_dict(), **{Library.FIELDS[8] : media.get_media_id()})
+                              for original, media in zip(originals, media_items)])
+            for original, media in zip(originals, media_items):
+                self.assertEqual(list(media.get_people()), list(original.get_people()))
+
+            # Saving and reading back gives the same items, again sharing their values.
+            with tempfile.TemporaryDirectory() as directory:
+                file_name = os.path.join(directory, "library.csv")
+                library.write_items_to_file(file_name)
+                reloaded = Library()
+                reloaded.read_items_from_file(file_name)
+            self.assert_values_shared(reloaded.get_all_media())
+            self.assertEqual([media.to_dict() for media in reloaded.get_all_media()],
+                             [media.to_dict() for media in media_items])
+
+if __name__ == "__main__":
+    unittest.main()
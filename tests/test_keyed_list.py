@@ -0,0 +1,90 @@
+"""Randomized checks that KeyedList behaves like a plain list of (key, value) pairs.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import sys
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import KeyedList
+
+class KeyedListTest(unittest.TestCase):
+
+    def setUp(self):
+        # Compact after a handful of removals, so compaction happens many times per run.
+        self.min_compact_size = KeyedList.MIN_COMPACT_SIZE
+        KeyedList.MIN_COMPACT_SIZE = 8
+
+    def tearDown(self):
+        KeyedList.MIN_COMPACT_SIZE = self.min_compact_size
+
+    def assert_same(self, keyed_list, expected):
+        """Checks every way of reading keyed_list against the expected (key, value) pairs"""
+        values = [value for _, value in expected]
+        self.assertEqual(len(keyed_list), len(expected))
+        self.assertEqual(list(keyed_list), values)
+        self.assertEqual(keyed_list[:], values)
+        for position, (key, value) in enumerate(expected):
+            self.assertEqual(keyed_list[position], value)
+            self.assertEqual(keyed_list[position - len(expected)], value)
+            self.assertEqual(keyed_list.position_of_key(key), position)
+            self.assertEqual(keyed_list.get(key), value)
+            self.assertTrue(keyed_list.has_key(key))
+        with self.assertRaises(IndexError):
+            keyed_list[len(expected)]
+
+    def test_random_operations_match_list(self):
+        for seed in range(20):
+            generator = random.Random(seed)
+            keyed_list = KeyedList()
+            expected = []
+            removed_keys = []
+            next_key = 0
+            for step in range(600):
+                operation = generator.random()
+                if operation < 0.45 or not expected:
+                    keyed_list.append(next_key, f"value {next_key}")
+                    expected.append((next_key, f"value {next_key}"))
+                    next_key += 1
+                elif operation < 0.7:
+                    key, value = expected.pop(generator.randrange(len(expected)))
+                    self.assertEqual(keyed_list.remove_key(key), value)
+                    removed_keys.append(key)
+                elif operation < 0.85:
+                    position = generator.randrange(-len(expected), len(expected))
+                    key, value = expected.pop(position)
+                    self.assertEqual(keyed_list.pop(position), value)
+                    removed_keys.append(key)
+                elif operation < 0.93:
+                    length = generator.randrange(len(expected) + 1)
+                    removed_keys.extend(key for key, _ in expected[length:])
+                    del expected[length:]
+                    keyed_list.truncate(length)
+                else:
+                    keyed_list.compact()
+
+                if step % 25 == 0:
+                    self.assert_same(keyed_list, expected)
+                    for key in removed_keys[-5:]:
+                        self.assertFalse(keyed_list.has_key(key))
+                        self.assertIsNone(keyed_list.get(key))
+                        with self.assertRaises(KeyError):
+                            keyed_list.position_of_key(key)
+            self.assert_same(keyed_list, expected)
+
+    def test_duplicate_key_is_rejected(self):
+        keyed_list = KeyedList()
+        keyed_list.append(1, "a")
+        with self.assertRaises(KeyError):
+            keyed_list.append(1, "b")
+        self.assertEqual(list(keyed_list), ["a"])
+
+if __name__ == "__main__":
+    unittest.main()
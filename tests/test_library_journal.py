@@ -0,0 +1,150 @@
+"""Randomized checks that a library saved through LibraryJournal loads back exactly as it was.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import sys
+
+import tempfile
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, LibraryJournal, Song, Video
+
+def library_state(media_items):
+    """Returns the media ID and saved fields of each item, in order"""
+    return [(media.get_media_id(), media.to_dict()) for media in media_items]
+
+def random_media(generator):
+    title = f"Title {generator.randrange(10 ** 6)}"
+    if generator.random() < 0.6:
+        return Song(title, "MP3", "English", generator.randint(60, 600),
+                    [f"Singer {generator.randrange(20)}"])
+    return Video(title, "DVD", "French", generator.randint(600, 6000),
+                 f"Director {generator.randrange(5)}", [f"Actor {generator.randrange(20)}"])
+
+def random_changes(library, generator, count):
+    """Makes count random adds, removals and truncations to library"""
+    for _ in range(count):
+        operation = generator.random()
+        length = len(library.get_all_media())
+        if operation < 0.45 or not length:
+            library.add_media(random_media(generator))
+        elif operation < 0.55:
+            library.add_media_items([random_media(generator) for _ in range(generator.randint(1, 5))])
+        elif operation < 0.8:
+            media = library.get_all_media()[generator.randrange(length)]
+            library.remove_media_by_id(media.get_media_id())
+        elif operation < 0.95:
+            library.remove_media(generator.randrange(length))
+        else:
+            library.truncate(generator.randrange(length + 1))
+
+class LibraryJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.snapshot_name = os.path.join(self.directory.name, "library.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_snapshot(self, generator, count):
+        Library().write_items_to_file(self.snapshot_name,
+                                      [random_media(generator) for _ in range(count)])
+
+    def open_library(self, compact_threshold = None):
+        """Returns (journal, library loaded from it with the journal attached)"""
+        journal = LibraryJournal(self.snapshot_name, compact_threshold = compact_threshold)
+        library = Library()
+        journal.load(library)
+        library.attach_journal(journal)
+        return journal, library
+
+    def save(self, journal, library):
+        journal.save(library)
+        if journal._compaction:
+            journal._compaction.join()
+
+    def test_sessions_reload_what_was_saved(self):
+        for seed in range(15):
+            generator = random.Random(seed)
+            self.write_snapshot(generator, 30)
+            # A low threshold makes some saves compact the journal into a new snapshot.
+            compact_threshold = generator.choice((None, 2000))
+            expected = None
+            for session in range(8):
+                journal, library = self.open_library(compact_threshold)
+                if expected is not None:
+                    self.assertEqual(library_state(library.get_all_media()), expected, (seed, session))
+                    self.assertEqual(library_state(LibraryJournal(self.snapshot_name).load_items()), expected)
+                for _ in range(generator.randint(1, 3)):
+                    random_changes(library, generator, generator.randint(0, 25))
+                    self.save(journal, library)
+                expected = library_state(library.get_all_media())
+            os.remove(journal._journal_name)
+
+    def test_compaction_empties_journal(self):
+        generator = random.Random(0)
+        self.write_snapshot(generator, 20)
+        journal, library = self.open_library(compact_threshold = 1)
+        random_changes(library, generator, 40)
+        self.save(journal, library)
+        expected = library_state(library.get_all_media())
+        with open(journal._journal_name) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(library_state(Library().iter_items_from_file(self.snapshot_name)), expected)
+        self.assertEqual(library_state(self.open_library()[1].get_all_media()), expected)
+
+    def test_save_after_snapshot_replaced_writes_whole_library(self):
+        for seed in range(10):
+            generator = random.Random(seed)
+            self.write_snapshot(generator, 20)
+            journal, library = self.open_library()
+            random_changes(library, generator, 15)
+            self.save(journal, library)
+            random_changes(library, generator, 15)
+            # e.g. File Write over the startup library, with the session's changes pending.
+            library.write_items_to_file(self.snapshot_name, library.get_all_media()[:5])
+            random_changes(library, generator, 15)
+            self.save(journal, library)
+            self.assertEqual(library_state(self.open_library()[1].get_all_media()),
+                             library_state(library.get_all_media()), seed)
+
+    def test_journal_for_another_snapshot_is_ignored(self):
+        generator = random.Random(0)
+        self.write_snapshot(generator, 10)
+        journal, library = self.open_library()
+        random_changes(library, generator, 20)
+        self.save(journal, library)
+        # Replacing the snapshot behind the journal's back, as an interrupted compaction can.
+        self.write_snapshot(generator, 10)
+        library = Library()
+        library.read_items_from_file(self.snapshot_name)
+        self.assertEqual(library_state(self.open_library()[1].get_all_media()),
+                         library_state(library.get_all_media()))
+
+    def test_removal_of_unknown_media_id_is_an_error(self):
+        generator = random.Random(0)
+        self.write_snapshot(generator, 3)
+        journal, library = self.open_library()
+        media = library.remove_media(0)
+        library.add_media(media)
+        library.remove_media_by_id(media.get_media_id())
+        self.save(journal, library)
+        # Both journal removals name the same media ID, and the item only existed once.
+        with open(journal._journal_name) as f:
+            lines = f.readlines()
+        with open(journal._journal_name, "w") as f:
+            f.writelines(lines[:3] + lines[4:])
+        with self.assertRaises(ValueError):
+            LibraryJournal(self.snapshot_name).load_items()
+
+if __name__ == "__main__":
+    unittest.main()
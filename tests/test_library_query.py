@@ -0,0 +1,99 @@
+"""Randomized checks that Library.query returns what a brute-force scan of the library finds.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import sys
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import KeyedList, Library, Song, Video
+
+LANGUAGES = ("English", "french", "GERMAN")
+FORMATS = ("MP3", "flac", "DVD")
+NAMES = ("Al Pacino", "Bo Diddley", "freddy king", "Love Lee", "Zed")
+TITLE_WORDS = ("alpha", "Beta", "GAMMA", "delta", "Étoile")
+
+def random_media(generator):
+    # Skewed choices, so the planner sees buckets of very different sizes.
+    title = f"{generator.choice(TITLE_WORDS)} {generator.randrange(4)}"
+    media_format = generator.choices(FORMATS, (8, 2, 1))[0]
+    language = generator.choices(LANGUAGES, (8, 3, 1))[0]
+    arguments = (title, media_format, language, generator.randrange(20))
+    if generator.random() < 0.6:
+        return Song(*arguments, generator.sample(NAMES, generator.randint(1, 2)))
+    return Video(*arguments, generator.choice(NAMES), generator.sample(NAMES, generator.randint(0, 2)))
+
+def brute_force(media_items, media_type = None, language = None, media_format = None,
+                min_length = None, max_length = None, title = None, artist = None):
+    """Returns the media matching every given condition by checking each item"""
+    def matches(media):
+        return ((media_type is None or media.get_class_name().casefold() == media_type.casefold())
+                and (language is None or media.get_media_language().casefold() == language.casefold())
+                and (media_format is None or media.get_media_format().casefold() == media_format.casefold())
+                and (min_length is None or media.get_play_length() >= min_length)
+                and (max_length is None or media.get_play_length() <= max_length)
+                and (title is None or title.casefold() in media.get_media_title().casefold())
+                and (artist is None or artist.casefold() in [name.casefold() for name in media.get_people()]))
+    return [media for media in media_items if matches(media)]
+
+def random_conditions(generator):
+    return {"media_type" : generator.choice((None, "Song", "video", "Podcast")),
+            "language" : generator.choice((None, "ENGLISH", "French", "german", "Latin")),
+            "media_format" : generator.choice((None, "mp3", "FLAC", "dvd")),
+            "min_length" : generator.choice((None, 0, 5, 12, 25)),
+            "max_length" : generator.choice((None, -1, 4, 12, 19)),
+            "title" : generator.choice((None, "", "ta", "ALPHA 1", "étoile")),
+            "artist" : generator.choice((None, "nobody") + NAMES)}
+
+class LibraryQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        # Compact often, so queries run over a library whose positions have been renumbered.
+        self.min_compact_size = KeyedList.MIN_COMPACT_SIZE
+        KeyedList.MIN_COMPACT_SIZE = 4
+
+    def tearDown(self):
+        KeyedList.MIN_COMPACT_SIZE = self.min_compact_size
+
+    def assert_queries_match(self, library, generator):
+        media_items = list(library.get_all_media())
+        for _ in range(15):
+            conditions = random_conditions(generator)
+            self.assertEqual(library.query(**conditions), brute_force(media_items, **conditions), conditions)
+        # Each condition on its own, and none at all.
+        conditions = random_conditions(generator)
+        for field, value in conditions.items():
+            self.assertEqual(library.query(**{field : value}), brute_force(media_items, **{field : value}))
+        self.assertEqual(library.query(), media_items)
+
+    def test_random_changes_match_brute_force(self):
+        for seed in range(10):
+            generator = random.Random(seed)
+            library = Library()
+            for step in range(80):
+                operation = generator.random()
+                length = len(library.get_all_media())
+                if operation < 0.35 or not length:
+                    library.add_media(random_media(generator))
+                elif operation < 0.55:
+                    library.add_media_items([random_media(generator) for _ in range(generator.randint(1, 40))])
+                elif operation < 0.75:
+                    library.remove_media(generator.randrange(length))
+                elif operation < 0.95:
+                    media = library.get_all_media()[generator.randrange(length)]
+                    library.remove_media_by_id(media.get_media_id())
+                else:
+                    library.truncate(generator.randrange(length + 1))
+                if step % 8 == 0:
+                    self.assert_queries_match(library, generator)
+            self.assert_queries_match(library, generator)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""Randomized checks that LibraryAnalytics, as it follows a changing library, matches a brute-force count.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import sys
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, Song, Video
+
+from MediaDatabase import SQLiteLibrary
+
+try:
+    import numpy as np
+    from MediaAnalytics import LibraryAnalytics
+except ImportError:
+    np = None
+
+LANGUAGES = ("English", "english", "French", "GERMAN")
+FORMATS = ("MP3", "mp3", "DVD")
+NAMES = ("Al Pacino", "al pacino", "Bo Diddley", "Freddy King", "Love Lee")
+
+def random_media(generator):
+    arguments = (f"Title {generator.randrange(10)}", generator.choice(FORMATS),
+                 generator.choice(LANGUAGES), generator.randrange(50))
+    if generator.random() < 0.6:
+        return Song(*arguments, generator.sample(NAMES, generator.randint(0, 2)))
+    return Video(*arguments, generator.choice(NAMES), generator.sample(NAMES, generator.randint(0, 2)))
+
+def brute_force_groups(media_items, get_value):
+    """Returns case-folded group name mapped to (count, total play length)"""
+    groups = {}
+    for media in media_items:
+        count, total_length = groups.get(get_value(media).casefold(), (0, 0))
+        groups[get_value(media).casefold()] = (count + 1, total_length + media.get_play_length())
+    return groups
+
+def brute_force_artists(media_items):
+    """Returns case-folded artist name mapped to (number of items, total play length)"""
+    artists = {}
+    for media in media_items:
+        for name in {name.casefold() for name in media.get_people() if name}:
+            count, total_length = artists.get(name, (0, 0))
+            artists[name] = (count + 1, total_length + media.get_play_length())
+    return artists
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class LibraryAnalyticsTest(unittest.TestCase):
+
+    def assert_analytics_match(self, analytics, library, generator):
+        media_items = list(library.get_all_media())
+        for media_type in (None, "Song", "video", "SONG"):
+            selected = [media for media in media_items
+                        if media_type is None or media.get_class_name().casefold() == media_type.casefold()]
+            total_length = sum(media.get_play_length() for media in selected)
+            self.assertEqual(analytics.totals(media_type)["count"], len(selected))
+            self.assertEqual(analytics.totals(media_type)["total_length"], total_length)
+            for field, get_value in (("type", lambda media: media.get_class_name()),
+                                     ("language", lambda media: media.get_media_language()),
+                                     ("format", lambda media: media.get_media_format())):
+                groups = analytics.group_by(field, media_type)
+                self.assertEqual({name.casefold() : (group["count"], group["total_length"])
+                                  for name, group in groups.items()},
+                                 brute_force_groups(selected, get_value), (field, media_type))
+                totals = [group["total_length"] for group in groups.values()]
+                self.assertEqual(totals, sorted(totals, reverse = True))
+            counts, edges = analytics.length_histogram(5, media_type, (0, 50))
+            expected = np.histogram([media.get_play_length() for media in selected], bins = 5, range = (0, 50))
+            self.assertEqual((counts, edges), (expected[0].tolist(), expected[1].tolist()))
+
+        artists = brute_force_artists(media_items)
+        artist_counts = analytics.artist_counts()
+        self.assertEqual({name.casefold() : count for name, count in artist_counts},
+                         {name : count for name, (count, _) in artists.items()})
+        self.assertEqual([count for _, count in artist_counts],
+                         sorted((count for count, _ in artists.values()), reverse = True))
+        artist_lengths = analytics.artist_lengths()
+        self.assertEqual({name.casefold() : total_length for name, total_length in artist_lengths},
+                         {name : total_length for name, (_, total_length) in artists.items()})
+        self.assertEqual([total_length for _, total_length in artist_lengths],
+                         sorted((total_length for _, total_length in artists.values()), reverse = True))
+        top = generator.randint(0, 3)
+        self.assertEqual(analytics.artist_counts(top), artist_counts[:top])
+        self.assertEqual(analytics.artist_lengths(top), artist_lengths[:top])
+
+    def run_random_changes(self, make_library):
+        for seed in range(8):
+            generator = random.Random(seed)
+            library = make_library()
+            analytics = LibraryAnalytics(library)
+            for step in range(60):
+                operation = generator.random()
+                length = len(library.get_all_media())
+                if operation < 0.3 or not length:
+                    library.add_media(random_media(generator))
+                elif operation < 0.5:
+                    library.add_media_items([random_media(generator) for _ in range(generator.randint(0, 15))])
+                elif operation < 0.7:
+                    library.remove_media(generator.randrange(length))
+                elif operation < 0.9:
+                    media = library.get_all_media()[generator.randrange(length)]
+                    library.remove_media_by_id(media.get_media_id())
+                else:
+                    library.truncate(generator.randrange(length + 1))
+                # Checking only now and then lets changes queue up between checks.
+                if generator.random() < 0.3:
+                    self.assert_analytics_match(analytics, library, generator)
+            self.assert_analytics_match(analytics, library, generator)
+            analytics.close()
+
+    def test_library_changes_match_brute_force(self):
+        self.run_random_changes(Library)
+
+    def test_sqlite_library_changes_match_brute_force(self):
+        libraries = []
+        def make_library():
+            libraries.append(SQLiteLibrary())
+            return libraries[-1]
+        self.run_random_changes(make_library)
+        for library in libraries:
+            library.close()
+
+    def test_media_type_is_checked(self):
+        library = Library()
+        library.add_media(Song("Title", "MP3", "English", 100, ["Singer"]))
+        analytics = LibraryAnalytics(library)
+        self.assertEqual(analytics.totals("song")["count"], 1)
+        self.assertEqual(analytics.totals("Video")["count"], 0)
+        self.assertEqual(analytics.length_histogram(2, "VIDEO", (0, 100))[0], [0, 0])
+        for media_type in ("Podcast", "songs", ""):
+            with self.assertRaises(ValueError):
+                analytics.totals(media_type)
+        self.assertEqual(list(analytics.report()["length_histograms"]), ["Song"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""Checks MediaCLI commands against a brute-force scan, and the messages it exits with on bad input.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import contextlib
+
+import csv
+
+import io
+
+import os
+
+import random
+
+import sys
+
+import tempfile
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MediaCLI
+
+from MediaClasses import Library, LibraryJournal, Song, Video
+
+LANGUAGES = ("English", "french", "GERMAN")
+FORMATS = ("MP3", "flac", "DVD")
+NAMES = ("Al Pacino", "Bo Diddley", "freddy king", "Love Lee")
+TITLE_WORDS = ("alpha", "Beta", "GAMMA", "delta")
+
+def random_media(generator):
+    title = f"{generator.choice(TITLE_WORDS)} {generator.randrange(4)}"
+    arguments = (title, generator.choice(FORMATS), generator.choice(LANGUAGES), generator.randrange(10))
+    if generator.random() < 0.6:
+        return Song(*arguments, generator.sample(NAMES, generator.randint(1, 2)))
+    return Video(*arguments, generator.choice(NAMES), generator.sample(NAMES, generator.randint(0, 2)))
+
+def matches(media, conditions):
+    """Checks one item against filter conditions without using any index"""
+    folded = lambda value: value is None or value.casefold()
+    return ((conditions["--type"] is None or media.get_class_name() == conditions["--type"])
+            and folded(conditions["--language"]) in (True, media.get_media_language().casefold())
+            and folded(conditions["--format"]) in (True, media.get_media_format().casefold())
+            and (conditions["--min-length"] is None or media.get_play_length() >= conditions["--min-length"])
+            and (conditions["--max-length"] is None or media.get_play_length() <= conditions["--max-length"])
+            and (conditions["--title"] is None
+                 or conditions["--title"].casefold() in media.get_media_title().casefold())
+            and (conditions["--artist"] is None or conditions["--artist"].casefold()
+                 in [name.casefold() for name in media.get_people()]))
+
+class MediaCLITest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.library_name = os.path.join(self.directory.name, "library.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_cli(self, *argv):
+        """Returns the rows printed by a command as lists of cells"""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            MediaCLI.main(list(argv))
+        return list(csv.reader(io.StringIO(output.getvalue())))
+
+    def assert_exits_with(self, message, *argv):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit) as context:
+                MediaCLI.main(list(argv))
+        self.assertIn(message, str(context.exception.code))
+
+    def test_filter_and_artist_match_brute_force(self):
+        for seed in range(10):
+            generator = random.Random(seed)
+            media_items = [random_media(generator) for _ in range(generator.randint(0, 80))]
+            Library().write_items_to_file(self.library_name, media_items)
+            media_items = MediaCLI.load_library(self.library_name).get_all_media()
+            output = io.StringIO()
+            MediaCLI.write_items(media_items, output)
+            header, *rows = csv.reader(io.StringIO(output.getvalue()))
+            header = [header]
+            for _ in range(10):
+                conditions = {"--type" : generator.choice((None, "Song", "Video")),
+                              "--language" : generator.choice((None, "ENGLISH", "French")),
+                              "--format" : generator.choice((None,) + FORMATS),
+                              "--min-length" : generator.choice((None, 3)),
+                              "--max-length" : generator.choice((None, 7)),
+                              "--title" : generator.choice((None, "ta", "ALPHA 1")),
+                              "--artist" : generator.choice((None,) + NAMES)}
+                if all(value is None for value in conditions.values()):
+                    conditions["--artist"] = NAMES[0]
+                argv = ["filter", self.library_name]
+                for option, value in conditions.items():
+                    if value is not None:
+                        argv += [option, str(value)]
+                expected = [row for row, media in zip(rows, media_items) if matches(media, conditions)]
+                self.assertEqual(self.run_cli(*argv), header + expected, argv)
+
+                name = generator.choice(NAMES)
+                expected = [row for row, media in zip(rows, media_items)
+                            if name.casefold() in [person.casefold() for person in media.get_people()]]
+                self.assertEqual(self.run_cli("artist", self.library_name, name.upper()), header + expected)
+
+    def test_missing_file_is_reported(self):
+        for argv in (("export", self.library_name, "out.csv"), ("artist", self.library_name, "Al Pacino"),
+                     ("filter", self.library_name, "--type", "Song"), ("runtime", self.library_name)):
+            self.assert_exits_with(f"{argv[0]}: [Errno 2] No such file or directory: '{self.library_name}'", *argv)
+
+    def test_missing_column_is_named(self):
+        generator = random.Random(0)
+        Library().write_items_to_file(self.library_name, [random_media(generator) for _ in range(5)])
+        with open(self.library_name, newline = "") as f:
+            rows = list(csv.reader(f))
+        for column in range(8):
+            with open(self.library_name, "w", newline = "") as f:
+                csv.writer(f).writerows([cell for position, cell in enumerate(row) if position != column]
+                                        for row in rows)
+            self.assert_exits_with(f"export: {self.library_name} has no {Library.FIELDS[column]!r} column",
+                                   "export", self.library_name, os.path.join(self.directory.name, "out.csv"))
+
+    def test_files_without_media_ids_and_empty_files_are_read(self):
+        generator = random.Random(0)
+        media_items = [random_media(generator) for _ in range(5)]
+        with open(self.library_name, "w", newline = "") as f:
+            writer = csv.writer(f)
+            writer.writerow(Library.FIELDS[:8])
+            writer.writerows(list(media.to_dict().values())[:8] for media in media_items)
+        self.assertEqual(len(self.run_cli("artist", self.library_name, "")), 1)
+        self.assertEqual(len(self.run_cli("filter", self.library_name, "--min-length", "0")), 6)
+        open(self.library_name, "w").close()
+        self.assertEqual(self.run_cli("filter", self.library_name, "--min-length", "0"), [list(Library.FIELDS)])
+
+    def test_journal_error_is_not_reported_as_a_column(self):
+        generator = random.Random(0)
+        Library().write_items_to_file(self.library_name, [random_media(generator) for _ in range(3)])
+        journal = LibraryJournal(self.library_name)
+        library = Library()
+        journal.load(library)
+        library.attach_journal(journal)
+        media = library.remove_media(0)
+        library.add_media(media)
+        library.remove_media_by_id(media.get_media_id())
+        journal.save(library)
+        with open(journal._journal_name) as f:
+            lines = f.readlines()
+        with open(journal._journal_name, "w") as f:
+            f.writelines(lines[:3] + lines[4:])
+        self.assert_exits_with(f"export: Journal removes media ID {media.get_media_id()}",
+                               "export", self.library_name, os.path.join(self.directory.name, "out.csv"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Randomized checks that binary snapshots round-trip, and are only used while up to date.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import sys
+
+import tempfile
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, LibraryJournal, Song, Video
+
+from MediaSnapshot import MediaSnapshot, write_snapshot
+
+TEXT = ("", "a", "Rock", "Étoile filante", "東京", "O'Brien, \"Jr\"", "tab\there", "x" * 300)
+
+def state(media_items):
+    """Returns the class, fields and media ID of each item, in order"""
+    return [(media.get_class_name(), media.get_media_title(), media.get_media_format(),
+             media.get_media_language(), media.get_play_length(), tuple(media.get_people()),
+             media.get_media_id()) for media in media_items]
+
+def random_media(generator):
+    title, media_format, language = (generator.choice(TEXT) for _ in range(3))
+    people = [generator.choice(TEXT[1:]) for _ in range(generator.randint(0, 4))]
+    play_length = generator.randint(0, 10 ** 6)
+    media_id = generator.choice((None, generator.randint(1, 10 ** 9)))
+    if generator.random() < 0.5:
+        return Song(title, media_format, language, play_length, people, media_id)
+    return Video(title, media_format, language, play_length, generator.choice(TEXT), people, media_id)
+
+class MediaSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.snapshot_name = os.path.join(self.directory.name, "library.csv")
+        self.binary_name = self.snapshot_name + ".snap"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        for seed in range(20):
+            generator = random.Random(seed)
+            media_items = [random_media(generator) for _ in range(generator.randint(0, 200))]
+            token = f"{seed}:{generator.random()}"
+            write_snapshot(self.binary_name, media_items, token)
+            with MediaSnapshot(self.binary_name) as snapshot:
+                self.assertEqual(snapshot.source_token, token)
+                self.assertEqual(len(snapshot), len(media_items))
+                self.assertEqual(state(snapshot), state(media_items))
+                self.assertEqual(state(snapshot[:]), state(media_items))
+                for _ in range(20):
+                    if media_items:
+                        position = generator.randrange(-len(media_items), len(media_items))
+                        self.assertEqual(state([snapshot[position]]), state([media_items[position]]))
+                with self.assertRaises(IndexError):
+                    snapshot[len(media_items)]
+
+    def test_not_a_snapshot_is_rejected(self):
+        write_snapshot(self.binary_name, [random_media(random.Random(0)) for _ in range(10)])
+        with open(self.binary_name, "rb") as f:
+            data = f.read()
+        for damaged in (b"NOTASNAP" + data[8:], data[:20], data[:100], data[:-1]):
+            with open(self.binary_name, "wb") as f:
+                f.write(damaged)
+            with self.assertRaises(ValueError):
+                MediaSnapshot(self.binary_name)
+
+    def load(self, write_binary = True):
+        library = Library()
+        LibraryJournal(self.snapshot_name).load(library, write_binary)
+        return state(library.get_all_media())
+
+    def test_stale_or_damaged_binary_copy_falls_back_to_csv(self):
+        for seed in range(10):
+            generator = random.Random(seed)
+            Library().write_items_to_file(self.snapshot_name, [random_media(generator) for _ in range(30)])
+            expected = self.load()
+            self.assertTrue(os.path.exists(self.binary_name))
+            self.assertEqual(self.load(), expected)
+
+            # The CSV changes, so the binary copy no longer matches it.
+            media_items = [random_media(generator) for _ in range(generator.randint(0, 40))]
+            Library().write_items_to_file(self.snapshot_name, media_items)
+            library = Library()
+            library.read_items_from_file(self.snapshot_name)
+            expected = state(library.get_all_media())
+            self.assertEqual(self.load(write_binary = False), expected)
+            self.assertEqual(self.load(), expected)
+            with MediaSnapshot(self.binary_name) as snapshot:
+                self.assertEqual(state(snapshot), expected)
+
+            with open(self.binary_name, "r+b") as f:
+                f.truncate(20)
+            self.assertEqual(self.load(), expected)
+            self.assertEqual(self.load(), expected)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Randomized checks that OrderStatisticList behaves like a plain list, with correct weights.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import sys
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import OrderStatisticList
+
+class OrderStatisticListTest(unittest.TestCase):
+
+    def assert_same(self, tree_list, expected):
+        """Checks values, prefix weights and weight lookups against a plain list of weights"""
+        self.assertEqual(len(tree_list), len(expected))
+        self.assertEqual(list(tree_list), expected)
+        self.assertEqual(tree_list[:], expected)
+        self.assertEqual(tree_list.total_weight(), sum(expected))
+        total = 0
+        for position, value in enumerate(expected):
+            self.assertEqual(tree_list[position], value)
+            self.assertEqual(tree_list.weight_before(position), total)
+            if value:
+                self.assertEqual(tree_list.position_at_weight(total), position)
+                self.assertEqual(tree_list.position_at_weight(total + value - 1), position)
+            total += value
+        self.assertEqual(tree_list.weight_before(len(expected)), total)
+        self.assertIsNone(tree_list.position_at_weight(total))
+        self.assertIsNone(tree_list.position_at_weight(-1))
+
+    def test_random_operations_match_list(self):
+        for seed in range(20):
+            generator = random.Random(seed)
+            # Values are their own weights; zero weights check empty stretches are skipped.
+            tree_list = OrderStatisticList(weight = lambda value: value)
+            expected = []
+            for step in range(500):
+                operation = generator.random()
+                if operation < 0.4 or not expected:
+                    position = generator.randrange(-len(expected) - 2, len(expected) + 3)
+                    value = generator.choice((0, 1, 2, 5, 30))
+                    tree_list.insert(position, value)
+                    expected.insert(position, value)
+                elif operation < 0.6:
+                    position = generator.randrange(-len(expected), len(expected))
+                    self.assertEqual(tree_list.pop(position), expected.pop(position))
+                elif operation < 0.8:
+                    # Move, as PlayList.move_song does.
+                    from_position = generator.randrange(len(expected))
+                    to_position = generator.randrange(len(expected))
+                    tree_list.insert(to_position, tree_list.pop(from_position))
+                    expected.insert(to_position, expected.pop(from_position))
+                elif operation < 0.9:
+                    position = generator.randrange(len(expected))
+                    value = generator.randrange(10)
+                    tree_list[position] = value
+                    expected[position] = value
+                else:
+                    position = generator.randrange(len(expected))
+                    del tree_list[position]
+                    del expected[position]
+                if step % 20 == 0:
+                    self.assert_same(tree_list, expected)
+            self.assert_same(tree_list, expected)
+
+    def test_out_of_range_positions_raise(self):
+        tree_list = OrderStatisticList([1, 2, 3])
+        for position in (3, -4):
+            with self.assertRaises(IndexError):
+                tree_list[position]
+        with self.assertRaises(IndexError):
+            OrderStatisticList().pop()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Randomized checks of SortedIndex against a list sorted again after every change.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import sys
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import SortedIndex, SortedMediaView
+
+class Item:
+    """A stand-in media item, compared by identity like library items"""
+
+    def __init__(self, key):
+        self.key = key
+
+class SortedIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        # Small blocks, so blocks are split and merged many times.
+        self.load = SortedIndex.LOAD
+        SortedIndex.LOAD = 4
+
+    def tearDown(self):
+        SortedIndex.LOAD = self.load
+
+    def assert_index_matches(self, index, source, generator):
+        expected = sorted(source, key = lambda item: item.key)
+        self.assertEqual(len(index), len(expected))
+        self.assertEqual(list(index), expected)
+        self.assertEqual(list(reversed(index)), expected[::-1])
+        self.assertEqual(list(SortedMediaView(index, descending = True)), expected[::-1])
+        for position in range(-len(expected), len(expected)):
+            self.assertIs(index.item_at(position), expected[position])
+        with self.assertRaises(IndexError):
+            index.item_at(len(expected))
+        for _ in range(10):
+            low = generator.choice((None, generator.randrange(-2, 30)))
+            high = generator.choice((None, generator.randrange(-2, 30)))
+            in_range = [item for item in expected
+                        if (low is None or item.key >= low) and (high is None or item.key <= high)]
+            self.assertEqual(index.get_range(low, high), in_range, (low, high))
+            self.assertEqual(index.count_range(low, high), len(in_range))
+
+    def test_random_changes_match_sorted_list(self):
+        for seed in range(20):
+            generator = random.Random(seed)
+            # Few distinct keys, so equal keys span several blocks.
+            key_range = generator.choice((3, 25))
+            source = []
+            index = SortedIndex(source, lambda item: item.key)
+            for step in range(300):
+                operation = generator.random()
+                if operation < 0.4 or not source:
+                    item = Item(generator.randrange(key_range))
+                    source.append(item)
+                    index.add(item)
+                elif operation < 0.5:
+                    items = [Item(generator.randrange(key_range)) for _ in range(generator.randint(1, 30))]
+                    source.extend(items)
+                    index.add_many(items)
+                elif operation < 0.8:
+                    item = source.pop(generator.randrange(len(source)))
+                    index.remove(item)
+                elif operation < 0.95:
+                    items = generator.sample(source, generator.randint(1, len(source)))
+                    for item in items:
+                        source.remove(item)
+                    index.remove_many(items)
+                else:
+                    index.clear()
+                if step % 10 == 0:
+                    self.assert_index_matches(index, source, generator)
+            self.assert_index_matches(index, source, generator)
+
+    def test_chunked_load_keeps_index_built(self):
+        generator = random.Random(0)
+        source = [Item(generator.randrange(100))]
+        index = SortedIndex(source, lambda item: item.key)
+        len(index)
+        for _ in range(12):
+            items = [Item(generator.randrange(100)) for _ in range(len(source))]
+            source.extend(items)
+            index.add_many(items)
+            # A chunk no larger than the index is inserted, rather than dropping the index.
+            self.assertIsNotNone(index._key_blocks)
+        self.assert_index_matches(index, source, generator)
+
+if __name__ == "__main__":
+    unittest.main()
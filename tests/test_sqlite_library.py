@@ -0,0 +1,141 @@
+"""Randomized checks that SQLiteLibrary, with its keyset-paged views, answers like Library.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import copy
+
+import os
+
+import random
+
+import sys
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, Song, Video
+
+from MediaDatabase import SQLiteLibrary
+
+LANGUAGES = ("English", "french", "GERMAN")
+FORMATS = ("MP3", "flac", "DVD")
+NAMES = ("Al Pacino", "Bo Diddley", "freddy king", "Love Lee")
+TITLE_WORDS = ("alpha", "Beta", "GAMMA", "delta", "Zeta", "eta")
+
+def content(media_items):
+    """Returns the saved fields of each item, apart from its media ID, in order"""
+    return [tuple(value for field, value in media.to_dict().items() if field != Library.FIELDS[8])
+            for media in media_items]
+
+def random_media(generator):
+    # Few titles and lengths, so there are many ties for paging to get right.
+    title = f"{generator.choice(TITLE_WORDS)} {generator.randrange(4)}"
+    arguments = (title, generator.choice(FORMATS), generator.choice(LANGUAGES), generator.randrange(10))
+    if generator.random() < 0.6:
+        return Song(*arguments, generator.sample(NAMES, generator.randint(1, 2)))
+    return Video(*arguments, generator.choice(NAMES), generator.sample(NAMES, generator.randint(0, 2)))
+
+class SQLiteLibraryTest(unittest.TestCase):
+
+    def setUp(self):
+        # Small pages, so every view spans many pages and the page cache overflows.
+        self.page_settings = (SQLiteLibrary.PAGE_SIZE, SQLiteLibrary.CACHED_PAGES)
+        SQLiteLibrary.PAGE_SIZE = 7
+        SQLiteLibrary.CACHED_PAGES = 3
+
+    def tearDown(self):
+        SQLiteLibrary.PAGE_SIZE, SQLiteLibrary.CACHED_PAGES = self.page_settings
+
+    def assert_view_matches(self, view, expected, generator):
+        """Checks a view by iterating, by walking pages in order and by random jumps"""
+        expected = content(expected)
+        self.assertEqual(len(view), len(expected))
+        self.assertEqual(content(view), expected)
+        self.assertEqual(content(view[index] for index in range(len(view))), expected)
+        for _ in range(10):
+            if expected:
+                position = generator.randrange(-len(expected), len(expected))
+                self.assertEqual(content([view[position]]), [expected[position]])
+        with self.assertRaises(IndexError):
+            view[len(expected)]
+
+    def assert_libraries_match(self, library, database, generator):
+        self.assert_view_matches(database.get_all_media(), library.get_all_media(), generator)
+        for field in ("length", "title"):
+            for descending in (False, True):
+                self.assert_view_matches(database.sorted_media(field, descending),
+                                         library.sorted_media(field, descending), generator)
+        low = generator.choice((None, 2, 5))
+        high = generator.choice((None, 4, 8))
+        self.assert_view_matches(database.get_media_in_length_range(low, high),
+                                 library.get_media_in_length_range(low, high), generator)
+        count = generator.randrange(12)
+        media_type = generator.choice((None, "Song", "video"))
+        self.assertEqual(content(database.get_longest_media(count, media_type)),
+                         content(library.get_longest_media(count, media_type)))
+        conditions = {"media_type" : generator.choice((None, "Song", "video")),
+                      "language" : generator.choice((None, "ENGLISH", "French", "german")),
+                      "media_format" : generator.choice((None,) + FORMATS),
+                      "min_length" : generator.choice((None, 3)),
+                      "max_length" : generator.choice((None, 7)),
+                      "title" : generator.choice((None, "ta", "ALPHA 1")),
+                      "artist" : generator.choice((None,) + NAMES)}
+        self.assert_view_matches(database.query(**conditions), library.query(**conditions), generator)
+        name = generator.choice(NAMES).upper()
+        self.assert_view_matches(database.get_media_with_artist(name),
+                                 library.get_media_with_artist(name), generator)
+
+    def test_random_changes_match_library(self):
+        for seed in range(8):
+            generator = random.Random(seed)
+            library = Library()
+            database = SQLiteLibrary()
+            for step in range(60):
+                operation = generator.random()
+                length = len(library.get_all_media())
+                if operation < 0.35 or not length:
+                    media = random_media(generator)
+                    library.add_media(media)
+                    database.add_media(copy.copy(media))
+                elif operation < 0.55:
+                    media_items = [random_media(generator) for _ in range(generator.randint(1, 30))]
+                    database.add_media_items([copy.copy(media) for media in media_items])
+                    library.add_media_items(media_items)
+                elif operation < 0.75:
+                    position = generator.randrange(length)
+                    library.remove_media(position)
+                    database.remove_media(position)
+                elif operation < 0.95:
+                    position = generator.randrange(length)
+                    library.remove_media_by_id(library.get_all_media()[position].get_media_id())
+                    database.remove_media_by_id(database.get_all_media()[position].get_media_id())
+                else:
+                    length = generator.randrange(length + 1)
+                    library.truncate(length)
+                    database.truncate(length)
+                if step % 6 == 0:
+                    self.assert_libraries_match(library, database, generator)
+            self.assert_libraries_match(library, database, generator)
+            database.close()
+
+    def test_bulk_loaded_only_sent_when_rows_change(self):
+        database = SQLiteLibrary()
+        events = []
+        database.subscribe(lambda event, *details: events.append(event))
+        media = Song("Title", "MP3", "English", 100, ["Singer"])
+        database.add_media_items([])
+        self.assertEqual(events, [])
+        database.add_media_items([media])
+        self.assertEqual(events, ["bulk_loaded"])
+        database.add_media_items([Song("Title", "mp3", "English", 100, ["singer"])], skip_duplicates = True)
+        database.truncate(1)
+        database.truncate(5)
+        self.assertEqual(events, ["bulk_loaded"])
+        database.truncate(0)
+        self.assertEqual(events, ["bulk_loaded"] * 2)
+        database.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Randomized checks that Library.search, backed by WordIndex, matches a brute-force scan.
+
+   Run with: python -m pytest tests   (or python -m unittest discover tests)
+"""
+
+import os
+
+import random
+
+import re
+
+import sys
+
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MediaClasses import Library, Song, Video, WordIndex
+
+WORDS = ("bohemian", "rhapsody", "bo", "Book", "boo", "ROCK", "rocket", "Étoile", "etoile", "love", "lo", "night")
+NAMES = ("Freddy Mercury", "freddy King", "Al Pacino", "Rocky Road", "Bo Diddley", "Love Lee", "Mercury Rev")
+
+def matches(media, tokens):
+    """Returns True if every token starts a word of the item's title or people's names"""
+    words = set(re.findall(r"\w+", " ".join((media.get_media_title(), *media.get_people())).casefold()))
+    return all(any(word.startswith(token) for word in words) for token in tokens)
+
+class WordIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        # Small batch and bucket limits, so rebuilds and every kind of check are used.
+        self.limits = (WordIndex.REBUILD_SIZE, WordIndex.MAX_BUCKET_CHECKS)
+        WordIndex.REBUILD_SIZE = 20
+        WordIndex.MAX_BUCKET_CHECKS = 2
+
+    def tearDown(self):
+        WordIndex.REBUILD_SIZE, WordIndex.MAX_BUCKET_CHECKS = self.limits
+
+    def random_media(self, generator):
+        title = " ".join(generator.choice(WORDS) for _ in range(generator.randint(1, 3)))
+        people = generator.sample(NAMES, generator.randint(0, 2))
+        if generator.random() < 0.6:
+            return Song(title, "MP3", "English", 100, people)
+        return Video(title, "DVD", "English", 100, generator.choice(NAMES), people)
+
+    def assert_searches_match(self, library, generator):
+        items = list(library.get_all_media())
+        for _ in range(15):
+            text = " ".join(generator.choice(WORDS + NAMES)[:generator.randint(1, 5)]
+                            for _ in range(generator.randint(1, 2)))
+            tokens = re.findall(r"\w+", text.casefold())
+            expected = {media.get_media_id() for media in items if matches(media, tokens)}
+            results = library.search(text)
+            self.assertEqual(len(results), len(expected), text)
+            self.assertEqual({media.get_media_id() for media in results}, expected, text)
+
+            # A limited search returns the first results of the full search.
+            limit = generator.randint(1, 10)
+            self.assertEqual(library.search(text, limit = limit), results[:limit], text)
+
+            # Narrowing earlier results gives the same answer as searching afresh.
+            longer = text + generator.choice(("", "o", "c", " l"))
+            narrowed = library.search(longer, within = results)
+            tokens = re.findall(r"\w+", longer.casefold())
+            self.assertEqual({media.get_media_id() for media in narrowed},
+                             {media.get_media_id() for media in items if matches(media, tokens)}, longer)
+
+    def test_random_changes_match_scan(self):
+        for seed in range(10):
+            generator = random.Random(seed)
+            library = Library()
+            library.add_media_items([self.random_media(generator) for _ in range(30)])
+            for step in range(120):
+                operation = generator.random()
+                items = library.get_all_media()
+                if operation < 0.4 or not len(items):
+                    library.add_media(self.random_media(generator))
+                elif operation < 0.5:
+                    # Batches above REBUILD_SIZE drop the index instead of updating it.
+                    library.add_media_items([self.random_media(generator)
+                                             for _ in range(generator.choice((3, 25)))])
+                elif operation < 0.8:
+                    library.remove_media_by_id(items[generator.randrange(len(items))].get_media_id())
+                elif operation < 0.9:
+                    library.remove_media(generator.randrange(len(items)))
+                else:
+                    library.truncate(generator.randrange(len(items) + 1))
+                if step % 10 == 0:
+                    self.assert_searches_match(library, generator)
+            self.assert_searches_match(library, generator)
+
+    def test_background_build_matches_scan(self):
+        for seed in range(10):
+            generator = random.Random(seed)
+            library = Library()
+            library.add_media_items([self.random_media(generator) for _ in range(40)])
+            library.start_search_index()
+            # Changes made while the build runs leave it out of date, so it is not used.
+            for _ in range(generator.choice((0, 0, 1, 3))):
+                items = library.get_all_media()
+                if generator.random() < 0.5:
+                    library.add_media(self.random_media(generator))
+                else:
+                    library.remove_media_by_id(items[generator.randrange(len(items))].get_media_id())
+            self.assert_searches_match(library, generator)
+            # Starting another build once the index is built does nothing.
+            library.start_search_index()
+            self.assertIsNone(library._word_index._background)
+            self.assert_searches_match(library, generator)
+
+    def test_empty_text_finds_nothing(self):
+        library = Library()
+        library.add_media(Song("Bohemian Rhapsody", "MP3", "English", 100, ["Freddy Mercury"]))
+        self.assertEqual(list(library.search("  ")), [])
+
+if __name__ == "__main__":
+    unittest.main()